@@ -0,0 +1,371 @@
+# cache.py
+# Bounded in-process caches shared by every session of the server.
+#
+# Every shared cache registers with one CacheManager, which holds all of
+# them to a global memory budget (CACHE_BYTES). Each entry is accounted by its
+# size in bytes; when a cache goes over its own bounds, or all of them over the
+# budget, entries are evicted least recently used first (or least frequently
+# used, with DPWH_CACHE_POLICY=lfu). Pinned entries, such as the default view
+# every session starts on, are never evicted. Hit, miss and eviction counters
+# are shown in the sidebar with DPWH_CACHE_STATS=1.
+#
+# The datasets, indexes and sketches held by st.cache_resource (see
+# resource_cache) are accounted too, but never evicted by the manager: their
+# bytes count toward CACHE_BYTES, so the caches above shrink to make room,
+# and each stays bounded by its own max_entries.
+
+import functools
+import itertools
+import os
+import sys
+import threading
+
+import streamlit as st
+
+CACHE_BYTES = int(os.environ.get("DPWH_CACHE_BYTES", 512 * 1024 * 1024))
+CACHE_POLICY = os.environ.get("DPWH_CACHE_POLICY", "lru")
+SHOW_CACHE_STATS = os.environ.get("DPWH_CACHE_STATS") == "1"
+
+
+class _Entry:
+    __slots__ = ("value", "nbytes", "last_used", "uses")
+
+    def __init__(self, value, nbytes):
+        self.value = value
+        self.nbytes = nbytes
+        self.last_used = 0
+        self.uses = 0
+
+
+# Cache bounded by entry count and, optionally, by the total size in bytes of
+# its entries. Eviction order comes from the manager's policy.
+class ManagedCache:
+    def __init__(self, name, manager, max_entries, max_bytes=None):
+        self.name = name
+        self.manager = manager
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.nbytes = 0
+        self._data = {}
+        self._pins = {}  # pin slot -> key
+        self._lock = threading.Lock()
+        self._key_locks = {}
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._touch(entry)
+            return entry.value
+
+    # `pin` names a slot (e.g. "default"): the entry stays cached until another
+    # key is pinned to the same slot, which releases the previous one.
+    def put(self, key, value, nbytes=0, pin=None):
+        with self._lock:
+            old = self._data.get(key)
+            if old is not None:
+                self.nbytes -= old.nbytes
+            entry = self._data[key] = _Entry(value, nbytes)
+            self.nbytes += nbytes
+            self._touch(entry)
+            if pin is not None:
+                self._pins[pin] = key
+            while self._over_bounds() and self._evict_one():
+                pass
+        self.manager.enforce_budget()
+
+    # Sessions asking for the same missing key at the same time wait for one
+    # computation instead of each running their own.
+    def get_or_compute(self, key, compute, size_of=None, pin=None):
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            if pin is not None:
+                with self._lock:
+                    self._pins[pin] = key
+            return value
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            with self._lock:
+                entry = self._data.get(key)
+                if entry is not None:
+                    self._touch(entry)
+                    return entry.value
+            value = compute()
+            self.put(key, value, (size_of or estimate_size)(value), pin)
+        with self._lock:
+            self._key_locks.pop(key, None)
+        return value
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "cache": self.name,
+                "entries": len(self._data),
+                "pinned": len(set(self._pins.values()) & self._data.keys()),
+                "bytes": self.nbytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else None,
+            }
+
+    def __len__(self):
+        return len(self._data)
+
+    # The helpers below run with self._lock held
+    def _touch(self, entry):
+        entry.uses += 1
+        entry.last_used = self.manager.tick()
+
+    def _over_bounds(self):
+        return len(self._data) > self.max_entries or (
+            self.max_bytes is not None and self.nbytes > self.max_bytes
+        )
+
+    def _victim(self):
+        pinned = set(self._pins.values())
+        candidates = [(self.manager.score(e), k) for k, e in self._data.items() if k not in pinned]
+        return min(candidates, key=lambda c: c[0], default=None)
+
+    def _evict_one(self, key=None):
+        if key is None:
+            victim = self._victim()
+            if victim is None:
+                return False
+            key = victim[1]
+        entry = self._data.pop(key, None)
+        if entry is None:
+            return False
+        self.nbytes -= entry.nbytes
+        self.evictions += 1
+        return True
+
+
+# Holds every shared cache to one memory budget across caches.
+class CacheManager:
+    def __init__(self, max_bytes=CACHE_BYTES, policy=CACHE_POLICY):
+        if policy not in ("lru", "lfu"):
+            raise ValueError(f"Unknown cache policy {policy!r}; use 'lru' or 'lfu'")
+        self.max_bytes = max_bytes
+        self.policy = policy
+        self.caches = {}
+        self.resources = {}
+        self._clock = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def cache(self, name, max_entries, max_bytes=None):
+        with self._lock:
+            if name not in self.caches:
+                self.caches[name] = ManagedCache(name, self, max_entries, max_bytes)
+            return self.caches[name]
+
+    def resource(self, name, max_entries):
+        with self._lock:
+            if name not in self.resources:
+                self.resources[name] = ResourceAccount(name, max_entries)
+            return self.resources[name]
+
+    # Recency is one clock across caches, so global LRU can compare entries
+    def tick(self):
+        return next(self._clock)
+
+    def score(self, entry):
+        if self.policy == "lfu":
+            return entry.uses, entry.last_used
+        return entry.last_used
+
+    @property
+    def nbytes(self):
+        return (sum(cache.nbytes for cache in self.caches.values())
+                + sum(account.nbytes for account in self.resources.values()))
+
+    def enforce_budget(self):
+        with self._lock:
+            while self.nbytes > self.max_bytes:
+                victims = []
+                for cache in self.caches.values():
+                    with cache._lock:
+                        victim = cache._victim()
+                    if victim is not None:
+                        victims.append((victim[0], cache, victim[1]))
+                if not victims:
+                    return
+                _, cache, key = min(victims, key=lambda v: v[0])
+                with cache._lock:
+                    cache._evict_one(key)
+
+    def stats(self):
+        return ([cache.stats() for cache in self.caches.values()]
+                + [account.stats() for account in self.resources.values()])
+
+
+# Bytes held by one st.cache_resource function. Values are keyed by identity,
+# as on_release hands back the value and not its arguments; the cache keeps
+# each one alive, so its id is stable until it is released.
+class ResourceAccount:
+    def __init__(self, name, max_entries):
+        self.name = name
+        self.max_entries = max_entries
+        self.misses = 0
+        self.evictions = 0
+        self.nbytes = 0
+        self._sizes = {}  # id(value) -> [nbytes, entries holding it]
+        self._lock = threading.Lock()
+
+    def add(self, value, nbytes):
+        with self._lock:
+            self.misses += 1
+            held = self._sizes.setdefault(id(value), [nbytes, 0])
+            if not held[1]:
+                self.nbytes += nbytes
+            held[1] += 1
+
+    def release(self, value):
+        with self._lock:
+            held = self._sizes.get(id(value))
+            if held is None:
+                return
+            self.evictions += 1
+            held[1] -= 1
+            if not held[1]:
+                del self._sizes[id(value)]
+                self.nbytes -= held[0]
+
+    # Hits never reach the wrapped function, so only misses are counted
+    def stats(self):
+        with self._lock:
+            return {
+                "cache": self.name,
+                "entries": len(self._sizes),
+                "pinned": len(self._sizes),
+                "bytes": self.nbytes,
+                "max_entries": self.max_entries,
+                "max_bytes": None,
+                "hits": None,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": None,
+            }
+
+    def __len__(self):
+        return len(self._sizes)
+
+
+_MISSING = object()
+
+
+@st.cache_resource
+def cache_manager():
+    return CacheManager()
+
+
+def shared_cache(name, max_entries, max_bytes=None):
+    return cache_manager().cache(name, max_entries, max_bytes)
+
+
+# Wraps st.cache_resource(max_entries=...) and accounts each value it holds
+# with the manager, under `name`, until Streamlit releases it (max_entries
+# eviction or clear()). `size_of(value, *args)` replaces estimate_size for
+# values that share memory with another resource, so nothing is counted
+# twice. The ceiling of every resource cache is its max_entries times the
+# size of one value; they are listed with the other caches in the stats.
+def resource_cache(name, max_entries, size_of=None):
+    def release(value):
+        cache_manager().resource(name, max_entries).release(value)
+
+    def decorate(func):
+        @st.cache_resource(max_entries=max_entries, show_spinner=False, on_release=release)
+        @functools.wraps(func)
+        def cached(*args, **kwargs):
+            value = func(*args, **kwargs)
+            nbytes = size_of(value, *args, **kwargs) if size_of else estimate_size(value)
+            manager = cache_manager()
+            manager.resource(name, max_entries).add(value, nbytes)
+            manager.enforce_budget()
+            return value
+        return cached
+    return decorate
+
+
+# Approximate in-memory size of a cached value in bytes
+def estimate_size(value):
+    if hasattr(value, "memory_usage") and hasattr(value, "columns"):
+        return int(value.memory_usage(deep=True).sum())
+    if hasattr(value, "memory_usage"):
+        return int(value.memory_usage(deep=True))
+    if hasattr(value, "nbytes"):
+        if getattr(value, "dtype", None) == object:
+            return int(value.nbytes) + sum(sys.getsizeof(v) for v in value.flat)
+        return int(value.nbytes)
+    if hasattr(value, "to_plotly_json"):
+        return figure_size(value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in value)
+    # Sketches and indexes: their arrays and tables
+    if hasattr(value, "__dict__") and not callable(value):
+        return sys.getsizeof(value) + estimate_size(vars(value))
+    return sys.getsizeof(value)
+
+
+# Bytes of the columns of `df` that do not share memory with `base`: with
+# copy-on-write, a frame derived from the shared dataset holds only the
+# columns it added or changed.
+def unshared_size(df, base):
+    return sum(int(df[col].memory_usage(deep=True, index=False)) for col in df.columns
+               if col not in base.columns or not _buffers(df[col]) & _buffers(base[col]))
+
+
+# Addresses of the buffers holding a column's values
+def _buffers(series):
+    array = series.array
+    if hasattr(array, "__arrow_array__"):
+        chunked = array.__arrow_array__()
+        return {buffer.address for chunk in chunked.chunks for buffer in chunk.buffers() if buffer is not None}
+    if hasattr(array, "codes"):
+        return {array.codes.__array_interface__["data"][0]}
+    return {series.to_numpy(copy=False).__array_interface__["data"][0]}
+
+
+def render_cache_stats():
+    if not SHOW_CACHE_STATS:
+        return
+    manager = cache_manager()
+    with st.sidebar.expander("Cache statistics"):
+        st.caption(f"{manager.nbytes / 1e6:,.1f} MB of {manager.max_bytes / 1e6:,.0f} MB · "
+                   f"{manager.policy.upper()} eviction")
+        st.dataframe(manager.stats(), hide_index=True)
+
+
+# ---------------------------------------------------------
+# Figure cache
+# ---------------------------------------------------------
+FIGURE_CACHE_ENTRIES = 512
+FIGURE_CACHE_BYTES = 64 * 1024 * 1024
+
+
+# Memory held by a figure: its trace and layout properties (the dicts
+# Figure.to_dict deep-copies), with data arrays counted by their buffers
+def figure_size(fig):
+    return sys.getsizeof(fig) + estimate_size(fig._data) + estimate_size(fig._layout)
+
+
+# Returns the finished Plotly figure for one chart, building it only when
+# this (chart, data version, filter, theme) combination is not cached. Each
+# figure is sized once on insert (figure_size) against FIGURE_CACHE_BYTES.
+# Cached figures are shared: never update them in place.
+def cached_figure(chart_id, data_version, filter_key, build, theme="streamlit", pin=None):
+    cache = shared_cache("figures", FIGURE_CACHE_ENTRIES, FIGURE_CACHE_BYTES)
+    return cache.get_or_compute((chart_id, data_version, filter_key, theme), build, figure_size, pin)
@@ -0,0 +1,280 @@
+# contractor_sketch.py
+# Streaming sketches of contract concentration per Region x Year cell, for
+# exports too large to aggregate every contractor of every cell.
+#
+#   python apps/contractor_sketch.py            # sketch vs exact, per cell
+#   python apps/contractor_sketch.py export.csv
+#
+# Each cell keeps, per contractor name key (entities.normalize of the raw
+# Contractor value, so trivial spelling differences share a key):
+#   - a count-min sketch of projects and of contract cost: CMS_DEPTH rows of
+#     CMS_WIDTH counters, each key adding its weight to one counter per row.
+#     A key's estimate is its smallest counter, at most e / CMS_WIDTH of the
+#     cell's total above the true value with probability 1 - e**-CMS_DEPTH
+#     (0.27% of the total, 98%). The squared counters also estimate the sum
+#     of squared shares, i.e. the HHI, without listing the contractors.
+#   - heavy-hitter candidates: the HEAVY_HITTERS keys with the largest
+#     estimates by either measure, re-ranked after every merge, each with one
+#     raw spelling, so the leaderboard resolves just these names instead of
+#     every contractor of the export
+#   - a HyperLogLog distinct counter of keys: 2**HLL_PRECISION registers
+#     holding the longest run of leading zero bits seen, standard error
+#     1.04 / sqrt(2**HLL_PRECISION) (1.6%)
+# All three merge exactly (counters add, registers take the maximum,
+# candidates are re-estimated), so the store builds them chunk by chunk
+# during ingestion (store._fold_chunk) and a region or year selection
+# merges its cells at query time.
+
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from entities import normalize
+
+CMS_WIDTH = 1024
+CMS_DEPTH = 4
+HLL_PRECISION = 12
+HEAVY_HITTERS = 64
+SKETCH_METRICS = ["Projects", "ContractCost"]
+# hash_array keys (16 characters) of the count-min and HyperLogLog hashes
+_CMS_HASH_KEY = "dpwh-cms-hash-00"
+_HLL_HASH_KEY = "dpwh-hll-hash-00"
+
+
+def contractor_key(name):
+    return " ".join(normalize(str(name)))
+
+
+def _hash(keys, hash_key):
+    return pd.util.hash_array(np.asarray(keys, dtype=object), hash_key=hash_key)
+
+
+# Counter of each key in each row, by double hashing one 64-bit hash
+def _cms_columns(keys):
+    hashed = _hash(keys, _CMS_HASH_KEY)
+    low, high = hashed & np.uint64(0xFFFFFFFF), hashed >> np.uint64(32)
+    rows = np.arange(CMS_DEPTH, dtype=np.uint64)[:, None]
+    return ((low + rows * high) % np.uint64(CMS_WIDTH)).astype(np.int64)
+
+
+def _hll_update(registers, keys):
+    hashed = _hash(keys, _HLL_HASH_KEY)
+    buckets = (hashed >> np.uint64(64 - HLL_PRECISION)).astype(np.int64)
+    rest = hashed << np.uint64(HLL_PRECISION)
+    # Position of the first 1 bit of the remaining bits (all zero: the maximum)
+    bits = 64 - HLL_PRECISION
+    ranks = np.full(len(rest), bits + 1, dtype=np.uint8)
+    nonzero = rest != 0
+    # (float64 rounding can reach 2**64 for the largest values: rank 1 either way)
+    ranks[nonzero] = np.clip(64 - np.floor(np.log2(rest[nonzero].astype(np.float64))), 1, bits)
+    np.maximum.at(registers, buckets, ranks)
+
+
+def hll_estimate(registers):
+    m = len(registers)
+    alpha = 0.7213 / (1 + 1.079 / m)
+    estimate = alpha * m * m / np.sum(np.ldexp(1.0, -registers.astype(np.int64)))
+    zeros = int((registers == 0).sum())
+    # Small counts: linear counting over the empty registers
+    if estimate <= 2.5 * m and zeros:
+        return m * np.log(m / zeros)
+    return float(estimate)
+
+
+class ContractorSketch:
+    def __init__(self, counters=None, registers=None, candidates=None, names=None):
+        self.counters = np.zeros((len(SKETCH_METRICS), CMS_DEPTH, CMS_WIDTH)) if counters is None else counters
+        self.registers = np.zeros(2 ** HLL_PRECISION, dtype=np.uint8) if registers is None else registers
+        self.candidates = [] if candidates is None else candidates
+        # Raw Contractor spelling of each candidate key
+        self.names = {} if names is None else names
+
+    # `totals` holds one chunk's exact Projects and ContractCost per key,
+    # `names` a raw spelling of each key
+    def update(self, totals, names):
+        columns = _cms_columns(totals.index)
+        for m, metric in enumerate(SKETCH_METRICS):
+            weights = totals[metric].to_numpy(dtype=float)
+            for row in range(CMS_DEPTH):
+                np.add.at(self.counters[m, row], columns[row], weights)
+        _hll_update(self.registers, totals.index)
+        fresh = set()
+        for metric in SKETCH_METRICS:
+            fresh.update(totals[metric].nlargest(HEAVY_HITTERS).index)
+        self._keep_heavy(fresh, names)
+        return self
+
+    def merge(self, other):
+        self.counters = self.counters + other.counters
+        self.registers = np.maximum(self.registers, other.registers)
+        self._keep_heavy(other.candidates, other.names)
+        return self
+
+    def _keep_heavy(self, keys, names):
+        keys = list(dict.fromkeys(self.candidates + list(keys)))
+        if len(keys) > HEAVY_HITTERS:
+            kept = set()
+            for metric in SKETCH_METRICS:
+                estimates = self.estimate(keys, metric)
+                kept.update(np.argsort(-estimates, kind="stable")[:HEAVY_HITTERS].tolist())
+            keys = [keys[i] for i in sorted(kept)]
+        self.candidates = keys
+        self.names = {key: self.names.get(key) or names[key] for key in keys}
+
+    def estimate(self, keys, metric):
+        if len(keys) == 0:
+            return np.empty(0)
+        counters = self.counters[SKETCH_METRICS.index(metric)]
+        columns = _cms_columns(keys)
+        return counters[np.arange(CMS_DEPTH)[:, None], columns].min(axis=0)
+
+    # Every row of counters adds up to the exact total
+    def total(self, metric):
+        return float(self.counters[SKETCH_METRICS.index(metric), 0].sum())
+
+    # Sum of squared shares x 10,000. Per row, colliding keys inflate the
+    # sum of squared counters by (total² - F2) / width on average; that is
+    # subtracted, and the median of the rows is taken.
+    def hhi(self, metric):
+        counters = self.counters[SKETCH_METRICS.index(metric)]
+        total = counters[0].sum()
+        if not total:
+            return np.nan
+        squares = (counters ** 2).sum(axis=1)
+        f2 = (CMS_WIDTH * squares - total ** 2) / (CMS_WIDTH - 1)
+        return float(np.clip(np.median(f2) / total ** 2, 0, 1) * 10_000)
+
+    def distinct(self):
+        return hll_estimate(self.registers)
+
+    # (keys, estimates) of the n largest candidates by `metric`
+    def top(self, metric, n):
+        estimates = self.estimate(self.candidates, metric)
+        order = np.argsort(-estimates, kind="stable")[:n]
+        return [self.candidates[i] for i in order], estimates[order]
+
+
+def merge_contractor_sketches(sketches):
+    merged = ContractorSketch()
+    for sketch in sketches:
+        merged.merge(sketch)
+    return merged
+
+
+# ---------------------------------------------------------
+# Per Region x Year cell
+# ---------------------------------------------------------
+# {(Region, Year): sketch} of one chunk
+def build_cell_sketches(df):
+    codes, names = pd.factorize(df["Contractor"])
+    keys = np.array([contractor_key(name) for name in names], dtype=object)
+    frame = pd.DataFrame({
+        "Region": df["Region"].to_numpy(),
+        "Year": df["Year"].to_numpy(),
+        "Key": keys[codes],
+        "ContractCost": pd.to_numeric(df["ContractCost"], errors="coerce").fillna(0).to_numpy(dtype=float),
+    })[codes >= 0]
+    totals = frame.groupby(["Region", "Year", "Key"]).agg(Projects=("Key", "size"), ContractCost=("ContractCost", "sum"))
+    spellings = dict(zip(keys[::-1], names[::-1]))  # first spelling of each key
+    return {
+        cell: ContractorSketch().update(rows.droplevel(["Region", "Year"]), spellings)
+        for cell, rows in totals.groupby(level=["Region", "Year"])
+    }
+
+
+def merge_cell_sketches(a, b):
+    if a is None:
+        return b
+    merged = dict(a)
+    for cell, sketch in b.items():
+        merged[cell] = (ContractorSketch(a[cell].counters, a[cell].registers, list(a[cell].candidates),
+                                         dict(a[cell].names)).merge(sketch)
+                        if cell in a else sketch)
+    return merged
+
+
+def select_sketch(cells, region="All", year=None):
+    return merge_contractor_sketches(
+        sketch for (cell_region, cell_year), sketch in cells.items()
+        if (region == "All" or cell_region == region) and (year is None or cell_year == year)
+    )
+
+
+# contractors.npz: the cells' counters and registers stacked in cell order,
+# and the candidates as (cell, key, name) triples
+def save_cell_sketches(cells, path):
+    order = list(cells)
+    pairs = [(i, key) for i, cell in enumerate(order) for key in cells[cell].candidates]
+    tmp = path + ".tmp.npz"
+    np.savez_compressed(
+        tmp,
+        regions=np.array([str(region) for region, _ in order], dtype=str),
+        years=np.array([year for _, year in order], dtype=float),
+        counters=np.stack([cells[cell].counters for cell in order]) if order else np.empty((0,)),
+        registers=np.stack([cells[cell].registers for cell in order]) if order else np.empty((0,)),
+        candidate_cells=np.array([i for i, _ in pairs], dtype=np.int64),
+        candidate_keys=np.array([key for _, key in pairs], dtype=str),
+        candidate_names=np.array([cells[order[i]].names[key] for i, key in pairs], dtype=str),
+    )
+    os.replace(tmp, path)
+
+
+def load_cell_sketches(path):
+    with np.load(path) as data:
+        candidates, names = {}, {}
+        # Sketches saved before names were kept show the key itself
+        spellings = data["candidate_names"] if "candidate_names" in data else data["candidate_keys"]
+        for i, key, name in zip(data["candidate_cells"], data["candidate_keys"], spellings):
+            candidates.setdefault(int(i), []).append(str(key))
+            names.setdefault(int(i), {})[str(key)] = str(name)
+        return {
+            (str(region), float(year)): ContractorSketch(data["counters"][i].copy(), data["registers"][i].copy(),
+                                                         candidates.get(i, []), names.get(i, {}))
+            for i, (region, year) in enumerate(zip(data["regions"], data["years"]))
+        }
+
+
+# ---------------------------------------------------------
+# Accuracy check
+# ---------------------------------------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Compare contractor sketches with exact counts per cell.")
+    parser.add_argument("csv", nargs="?", help="CSV export (default: the bundled dataset)")
+    parser.add_argument("--chunk-rows", type=int, default=2_000, help="rows per sketched chunk")
+    args = parser.parse_args()
+
+    # The bundled dataset path is relative to the repository root
+    path = os.path.abspath(args.csv) if args.csv else None
+    os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from utils import DATA_PATH, clean_dataset
+
+    df = clean_dataset(pd.read_csv(path or DATA_PATH))
+    df = df[df["Region"].notna() & df["Year"].notna()]
+    cells = None
+    for start in range(0, len(df), args.chunk_rows):
+        cells = merge_cell_sketches(cells, build_cell_sketches(df.iloc[start:start + args.chunk_rows]))
+
+    exact = df.assign(Key=df["Contractor"].map(contractor_key)).groupby(["Region", "Year", "Key"]).agg(
+        Projects=("Key", "size"), ContractCost=("ContractCost", "sum"))
+    rows = []
+    for region in ["All"] + sorted(df["Region"].unique()):
+        sketch = select_sketch(cells, region)
+        truth = exact if region == "All" else exact.xs(region, level="Region", drop_level=False)
+        truth = truth.groupby(level="Key").sum()
+        shares = truth["Projects"] / truth["Projects"].sum()
+        keys, _ = sketch.top("Projects", 10)
+        rows.append({
+            "Region": region,
+            "Contractors": len(truth),
+            "Distinct (HLL)": round(sketch.distinct()),
+            "HHI": (shares ** 2).sum() * 10_000,
+            "HHI (sketch)": sketch.hhi("Projects"),
+            "Top-10 found": len(set(keys) & set(truth["Projects"].nlargest(10).index)),
+        })
+    print(pd.DataFrame(rows).to_string(index=False, float_format=lambda x: f"{x:,.1f}"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+# disk_cache.py
+# Persistent cache for expensive results, shared across restarts and by every
+# server process on the host.
+#
+# Entries are content-addressed: the file name is a hash of
+# (namespace, code version, dataset fingerprint, parameters), so a changed
+# dataset or a bumped code version simply misses and old entries age out.
+#
+#   .cache/results/<namespace>/<hash>.pkl
+#
+# Writers write a temporary file and rename it into place, so a reader never
+# sees a partial entry, and take a per-entry lock file while computing, so
+# several processes asking for the same missing entry compute it once.
+# Entries older than DISK_CACHE_TTL are recomputed; when the directory grows
+# past DISK_CACHE_BYTES the least recently read entries are removed, with
+# their lock files. A lock file is only removed while nobody holds it, and a
+# process that locked a file removed meanwhile locks the new one instead, so
+# an entry is still computed once.
+#
+# Eviction walks the whole directory, so it does not run on every write: only
+# when this process's estimate of the directory size (its last walk plus what
+# it wrote since) passes DISK_CACHE_BYTES, or every EVICT_EVERY writes, which
+# also catches what other processes wrote and expired entries.
+#
+# Values are pickled: only point DPWH_DISK_CACHE at a directory that nothing
+# but the app can write to.
+
+import hashlib
+import json
+import os
+import pickle
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to atomic renames only
+    fcntl = None
+
+DISK_CACHE_DIR = os.environ.get("DPWH_DISK_CACHE", ".cache/results")
+DISK_CACHE_TTL = 7 * 24 * 3600
+DISK_CACHE_BYTES = 2 * 1024 ** 3
+EVICT_EVERY = 100
+
+
+def entry_path(namespace, version, fingerprint, params):
+    key = json.dumps([namespace, version, fingerprint, params], default=str)
+    digest = hashlib.sha256(key.encode()).hexdigest()
+    return os.path.join(DISK_CACHE_DIR, namespace, f"{digest}.pkl")
+
+
+def _read(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return _MISSING
+    if time.time() - stat.st_mtime > DISK_CACHE_TTL:
+        _remove(path)
+        return _MISSING
+    try:
+        with open(path, "rb") as f:
+            value = pickle.load(f)
+    # A pickle written by older code may name a class or module that no
+    # longer exists; that is a miss, and the entry is overwritten
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+        return _MISSING
+    # The access time marks recency for eviction; mtime stays the write time
+    # the TTL is measured from.
+    os.utime(path, (time.time(), stat.st_mtime))
+    return value
+
+
+# Returns the bytes written
+def _write(path, value):
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        size = f.tell()
+    os.replace(tmp, path)
+    return size
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class _EntryLock:
+    def __init__(self, path):
+        self.path = path + ".lock"
+
+    def __enter__(self):
+        while True:
+            self.file = open(self.path, "a")
+            if fcntl is None:
+                return self
+            fcntl.flock(self.file, fcntl.LOCK_EX)
+            # evict() may have removed the file between open and flock
+            try:
+                if os.stat(self.path).st_ino == os.fstat(self.file.fileno()).st_ino:
+                    return self
+            except FileNotFoundError:
+                pass
+            self.file.close()
+
+    def __exit__(self, *exc):
+        if fcntl is not None:
+            fcntl.flock(self.file, fcntl.LOCK_UN)
+        self.file.close()
+
+
+# Removes an entry's lock file unless a process holds it
+def _remove_lock(path):
+    try:
+        f = open(path, "r+")
+    except FileNotFoundError:
+        return
+    with f:
+        if fcntl is not None:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return
+        _remove(path)
+
+
+# Writes since this process last evicted, and the directory size it found
+_evict_state = {"writes": 0, "bytes": 0, "total": None}
+_evict_lock = threading.Lock()
+
+
+def _evict_if_due(written):
+    with _evict_lock:
+        state = _evict_state
+        state["writes"] += 1
+        state["bytes"] += written
+        due = (state["total"] is None or state["writes"] >= EVICT_EVERY
+               or state["total"] + state["bytes"] > DISK_CACHE_BYTES)
+        if not due:
+            return
+        state["writes"] = state["bytes"] = 0
+    total = evict(DISK_CACHE_BYTES, DISK_CACHE_TTL)
+    with _evict_lock:
+        _evict_state["total"] = total
+
+
+# Returns the cached value for these arguments, computing and storing it on a
+# miss. Bump `version` whenever the code behind `compute` changes its result.
+def disk_cached(namespace, version, fingerprint, params, compute):
+    path = entry_path(namespace, version, fingerprint, params)
+    value = _read(path)
+    if value is not _MISSING:
+        return value
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    written = 0
+    with _EntryLock(path):
+        # Another process may have finished it while this one waited
+        value = _read(path)
+        if value is _MISSING:
+            value = compute()
+            written = _write(path, value)
+    if written:
+        _evict_if_due(written)
+    return value
+
+
+# Removes expired entries, then the least recently read ones until the
+# directory fits in max_bytes, and the lock files of entries that are gone.
+# Returns the bytes left. Safe to run from several processes at once.
+# `directory` and `suffix` select other file caches held to the same rules
+# (upload.py's parsed uploads).
+def evict(max_bytes=DISK_CACHE_BYTES, ttl=DISK_CACHE_TTL, directory=None, suffix=".pkl"):
+    now = time.time()
+    entries = []
+    locks = []
+    for root, _, files in os.walk(directory or DISK_CACHE_DIR):
+        for name in files:
+            path = os.path.join(root, name)
+            if name.endswith(suffix + ".lock"):
+                locks.append(path)
+                continue
+            if not name.endswith(suffix):
+                continue
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            if now - stat.st_mtime > ttl:
+                _remove(path)
+            else:
+                entries.append((stat.st_atime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        _remove(path)
+        total -= size
+
+    # Held locks (an entry being computed) are left alone
+    for lock in locks:
+        if not os.path.exists(lock[:-len(".lock")]):
+            _remove_lock(lock)
+    return total
+
+
+_MISSING = object()
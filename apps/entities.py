@@ -0,0 +1,292 @@
+# entities.py
+# Contractor entity resolution: maps the free-text Contractor names of the
+# export to one canonical contractor each.
+#
+#   python apps/entities.py                # list the merged name variants
+#   python apps/entities.py export.csv
+#
+# The same firm is spelled many ways ("TRIPLE 8 CONSTRUCTION & SUPPLY, INC."
+# and "TRIPLE 8 CONST. & SUPPLY"), renamed ("SUNWEST, INC. (FORMERLY: SUNWEST
+# CONSTRUCTION & DEVELOPMENT CORPORATION)") or listed with a trade suffix
+# ("... & CONCRETE PRODUCTS"). Resolution works on distinct names only:
+#   1. normalize: casefold, drop punctuation, expand abbreviations (CONST.,
+#      GEN., CORP., DEV'T ...); a closed "(FORMERLY ...)" / "(FOR: ...)"
+#      becomes an alias of its own
+#   2. reduce each name to its core: the words left after removing generic
+#      ones (construction, builders, supply, corporation, and ...). A
+#      single-word core ("5S", "MAC") is too weak to identify a firm alone,
+#      so it keeps the name's trade words as well: "MAC BUILDERS CORP." and
+#      "MAC CONSTRUCTION" stay apart, "MAC BUILDERS" and "MAC BUILDERS
+#      CORP." do not (legal forms like corporation do not count)
+#   3. block: only names sharing a distinctive core word are compared, so the
+#      work grows with the block sizes rather than with n²
+#   4. merge names whose cores have a character-trigram Jaccard similarity of
+#      at least SIMILARITY and the same trade words (equal cores always merge)
+# Joint ventures ("A / B") resolve member by member; the JV is its own entity
+# whose members are the resolved firms, so "A / B" and "B / A" are one JV.
+#
+# Ids are stable hashes of the entity's core: C<hash> for firms, J<hash> for
+# joint ventures.
+
+import argparse
+import hashlib
+import os
+import re
+
+import pandas as pd
+
+from cache import resource_cache
+from disk_cache import disk_cached
+from utils import dataset_fingerprint, load_store, shared_dataset
+
+# Bump when the rules below change, so resolutions cached on disk are redone
+ENTITY_VERSION = 2
+SIMILARITY = 0.75
+# Core words shared by more names than this do not form a block
+MAX_BLOCK = 200
+
+ABBREVIATIONS = {
+    "const": "construction", "constn": "construction", "constructions": "construction",
+    "gen": "general", "genl": "general",
+    "dev": "development", "devt": "development", "devlt": "development",
+    "corp": "corporation", "inc": "incorporated", "co": "company",
+    "ent": "enterprises", "enterprise": "enterprises",
+    "trdg": "trading", "bldrs": "builders", "builder": "builders",
+    "supplies": "supply", "mdse": "merchandise", "svcs": "services", "service": "services",
+    "developer": "developers", "contractors": "contractor",
+    "trader": "trading", "traders": "trading", "equipt": "equipment",
+}
+GENERIC = {
+    "construction", "builders", "development", "developers", "supply", "trading",
+    "services", "enterprises", "general", "contractor", "merchandise", "engineering",
+    "concrete", "products", "aggregates", "and", "corporation", "incorporated",
+    "company", "ltd", "limited", "opc",
+}
+# Generic words that say nothing about what a firm does
+LEGAL_FORMS = {"corporation", "incorporated", "company", "ltd", "limited", "opc", "and"}
+FORMER = re.compile(r"\(\s*(?:formerly|formely|for)\b[\s:.]*([^)]*)(\)?)", re.IGNORECASE)
+JOINT_VENTURE = re.compile(r"\s+/\s+")
+
+
+# ---------------------------------------------------------
+# Normalization
+# ---------------------------------------------------------
+# Returns (display name, former name or None) for one firm's name
+def split_former(name):
+    match = FORMER.search(name)
+    if match is None:
+        return name.strip(), None
+    # An unclosed "(FORMERLY ..." was cut off by the export: no usable alias
+    former = match.group(1).strip() if match.group(2) else None
+    return name[:match.start()].strip(" ,"), former or None
+
+
+def normalize(name):
+    words = re.findall(r"[0-9a-z]+", name.casefold().replace("'", ""))
+    return [ABBREVIATIONS.get(word, word) for word in words]
+
+
+# (core, trade): trade is empty for cores of several words, else the name's
+# other generic words
+def core(words):
+    kept = [word for word in words if word not in GENERIC]
+    if len(kept) > 1:
+        return " ".join(kept), ""
+    trade = sorted({word for word in words if word in GENERIC} - LEGAL_FORMS)
+    return " ".join(kept or words), " ".join(trade)
+
+
+def core_key(name_core):
+    return " ".join(part for part in name_core if part)
+
+
+def trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def similarity(a, b):
+    a, b = trigrams(a), trigrams(b)
+    return len(a & b) / len(a | b)
+
+
+def entity_id(prefix, key):
+    return prefix + hashlib.sha1(key.encode()).hexdigest()[:8]
+
+
+class _UnionFind:
+    def __init__(self):
+        self.parent = {}
+
+    def find(self, item):
+        root = self.parent.setdefault(item, item)
+        while root != self.parent[root]:
+            root = self.parent[root]
+        while item != root:
+            self.parent[item], item = root, self.parent[item]
+        return root
+
+    def union(self, a, b):
+        a, b = self.find(a), self.find(b)
+        if a != b:
+            self.parent[max(a, b)] = min(a, b)
+
+
+# ---------------------------------------------------------
+# Resolution
+# ---------------------------------------------------------
+# `counts` maps each raw Contractor value to its number of projects. Returns
+#   aliases:   raw Contractor value -> ContractorId, Contractor (canonical
+#              name), Members (ids of the firms in a joint venture, or the
+#              firm itself), Projects
+#   spellings: firm name as written (alone, in a JV or as a former name) ->
+#              ContractorId, Mentions (projects naming it)
+#   entities:  ContractorId -> Contractor, Kind ("firm" / "joint venture"),
+#              Spellings, Projects (rows resolved to it, JVs count separately)
+def resolve_contractors(counts):
+    counts = counts[counts > 0]
+    firms = {}      # firm name as written -> (core, display name)
+    mentions = {}   # firm name as written -> projects naming it, alone or in a JV
+    formers = []    # (current name, former name)
+    members = {}    # raw name -> firm names as written
+    for raw, projects in counts.items():
+        names = []
+        for part in JOINT_VENTURE.split(str(raw).strip()):
+            display, former = split_former(part)
+            if not display:
+                continue
+            names.append(part)
+            firms.setdefault(part, (core(normalize(display)), display))
+            mentions[part] = mentions.get(part, 0) + int(projects)
+            if former:
+                firms.setdefault(former, (core(normalize(former)), former))
+                mentions.setdefault(former, 0)
+                formers.append((part, former))
+        members[raw] = names
+
+    # Names with equal cores, renamed firms and similar cores in a block merge
+    groups = _UnionFind()
+    by_core = {}
+    for name, (name_core, _) in firms.items():
+        groups.union(by_core.setdefault(name_core, name), name)
+    for current, former in formers:
+        groups.union(current, former)
+
+    cores = sorted(by_core)
+    blocks = {}
+    for i, (name_core, _) in enumerate(cores):
+        for word in set(name_core.split()):
+            if len(word) >= 3:
+                blocks.setdefault(word, []).append(i)
+    for block in blocks.values():
+        if len(block) > MAX_BLOCK:
+            continue
+        for x, i in enumerate(block):
+            for j in block[x + 1:]:
+                if cores[i][1] == cores[j][1] and similarity(cores[i][0], cores[j][0]) >= SIMILARITY:
+                    groups.union(by_core[cores[i]], by_core[cores[j]])
+
+    # One id and display name per group: the id hashes the group's smallest
+    # core, the name is its most mentioned spelling
+    grouped = {}
+    for name in firms:
+        grouped.setdefault(groups.find(name), []).append(name)
+    firm_id, firm_name = {}, {}
+    for names in grouped.values():
+        ident = entity_id("C", min(core_key(firms[name][0]) for name in names))
+        display = firms[max(names, key=lambda name: (mentions[name], name))][1]
+        for name in names:
+            firm_id[name], firm_name[ident] = ident, display
+
+    rows = []
+    for raw, names in members.items():
+        ids = tuple(sorted(set(firm_id[name] for name in names)))
+        if not ids:
+            continue
+        ident = ids[0] if len(ids) == 1 else entity_id("J", "/".join(ids))
+        rows.append((raw, ident, " / ".join(sorted(firm_name[i] for i in ids)), ids, int(counts[raw])))
+    aliases = pd.DataFrame(rows, columns=["Alias", "ContractorId", "Contractor", "Members", "Projects"]).set_index("Alias")
+
+    spellings = pd.DataFrame({
+        "ContractorId": [firm_id[name] for name in firms],
+        "Mentions": [mentions[name] for name in firms],
+    }, index=pd.Index(list(firms), name="Spelling"))
+
+    # Every firm (also those named only inside joint ventures) and every JV
+    kinds = {ident: "firm" for ident in firm_name}
+    names = dict(firm_name)
+    variants = spellings.groupby("ContractorId").size().to_dict()
+    for ident, group in aliases.groupby("ContractorId"):
+        if ident.startswith("J"):
+            kinds[ident], names[ident], variants[ident] = "joint venture", group["Contractor"].iloc[0], len(group)
+    projects = aliases.groupby("ContractorId")["Projects"].sum()
+    entities = pd.DataFrame({
+        "Contractor": pd.Series(names),
+        "Kind": pd.Series(kinds),
+        "Spellings": pd.Series(variants),
+        "Projects": projects,
+    }).fillna({"Projects": 0}).astype({"Projects": "int64"})
+    entities.index.name = "ContractorId"
+    return {"aliases": aliases, "spellings": spellings, "entities": entities}
+
+
+# ---------------------------------------------------------
+# Cached per dataset version
+# ---------------------------------------------------------
+# Projects per raw Contractor value; in store mode over every stored row, not
+# just the sample, summed one part at a time
+def contractor_counts(key):
+    store = load_store() if key.startswith("store:") else None
+    if store is not None:
+        from store import iter_parts
+        counts = pd.Series(dtype="int64")
+        for part in iter_parts(store, ["Contractor"]):
+            counts = counts.add(part["Contractor"].value_counts(), fill_value=0)
+        return counts.astype("int64").sort_values(ascending=False).rename("count")
+    return shared_dataset(key)["Contractor"].value_counts()
+
+
+@resource_cache("contractor_entities", 4)
+def contractor_entities(key):
+    return disk_cached("contractors", ENTITY_VERSION, dataset_fingerprint(key), None,
+                       lambda: resolve_contractors(contractor_counts(key)))
+
+
+# Canonical ContractorId of every row of the shared dataset, as a categorical
+# aligned with it (missing where the Contractor is)
+@resource_cache("contractor_ids", 4)
+def contractor_ids(key):
+    contractors = shared_dataset(key)["Contractor"]
+    ids = contractors.map(contractor_entities(key)["aliases"]["ContractorId"])
+    return ids.astype("category")
+
+
+def with_contractor_ids(key, df):
+    return df.assign(ContractorId=contractor_ids(key))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="List contractor names merged by entity resolution.")
+    parser.add_argument("csv", nargs="?", help="CSV export (default: the bundled dataset)")
+    args = parser.parse_args()
+
+    # The bundled dataset path is relative to the repository root
+    path = os.path.abspath(args.csv) if args.csv else None
+    os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from utils import DATA_PATH
+
+    counts = pd.read_csv(path or DATA_PATH, usecols=["Contractor"])["Contractor"].value_counts()
+    resolved = resolve_contractors(counts)
+    spellings, entities = resolved["spellings"], resolved["entities"]
+    for ident, group in spellings.groupby("ContractorId"):
+        if len(group) > 1:
+            print(f"{ident}  {entities.loc[ident, 'Contractor']}")
+            for spelling, mentions in group["Mentions"].items():
+                print(f"    {mentions:>5}  {spelling}")
+    aliases = resolved["aliases"]
+    print(f"\n{len(spellings):,} spellings -> {(entities['Kind'] == 'firm').sum():,} firms; "
+          f"{len(aliases):,} Contractor values -> {aliases['ContractorId'].nunique():,} contractors "
+          f"(firms or joint ventures)")
+
+if __name__ == "__main__":
+    main()
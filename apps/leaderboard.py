@@ -0,0 +1,222 @@
+# leaderboard.py
+# Top contractors and contract concentration, from a (contractor, Region,
+# Year) aggregate built once per dataset version.
+#
+# Contractors are the canonical entities of entities.py, so a firm's name
+# variants count together; a joint venture counts as a contractor of its own.
+# The aggregate is built by partial aggregation: per store part (or over the
+# whole frame) into (ContractorId, Region, Year) rows, which are merged by
+# summing. Every leaderboard and concentration query then runs on that
+# aggregate, which is far smaller than the rows, and a top-N list is picked
+# with a partial selection (np.argpartition) rather than a full sort.
+#
+# Concentration is the Herfindahl-Hirschman index: the sum of the squared
+# market shares in percent, from near 0 (many small contractors) to 10,000
+# (one contractor has everything).
+#
+# Stores of at least SKETCH_MIN_ROWS rows skip the aggregate: the view is
+# answered from the per-cell sketches kept during ingestion
+# (contractor_sketch.py), merged over the selected cells. Leaderboard totals
+# are count-min estimates of the heavy hitters, the HHI comes from the
+# squared counters and the contractor count from HyperLogLog, so nothing
+# grows with the number of contractors or rows.
+
+import os
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from cache import resource_cache
+from disk_cache import disk_cached
+from entities import ENTITY_VERSION, contractor_entities, contractor_ids, resolve_contractors
+from utils import dataset_fingerprint, load_store, shared_dataset
+
+# Bump when build_contractor_cube changes its output
+LEADERBOARD_VERSION = 1
+CONTRACTOR_KEYS = ["ContractorId", "Region", "Year"]
+TOP_CONTRACTORS = 10
+METRICS = {"Projects": "Number of projects", "ContractCost": "Total contract cost"}
+
+# HHI bands used by competition authorities
+HHI_MODERATE = 1500
+HHI_HIGH = 2500
+
+SKETCH_MIN_ROWS = int(os.environ.get("DPWH_SKETCH_ROWS", 1_000_000))
+
+
+# ---------------------------------------------------------
+# Aggregate
+# ---------------------------------------------------------
+def build_contractor_cube(df, ids):
+    frame = pd.DataFrame({
+        "ContractorId": ids,
+        "Region": df["Region"],
+        "Year": df["Year"],
+        "ContractCost": df["ContractCost"].astype("float64"),
+    })
+    grouped = frame.groupby(CONTRACTOR_KEYS, observed=True)
+    return grouped.agg(Projects=("ContractorId", "size"), ContractCost=("ContractCost", "sum")).reset_index()
+
+
+def merge_contractor_cubes(cubes):
+    merged = pd.concat(cubes, ignore_index=True)
+    return merged.groupby(CONTRACTOR_KEYS, observed=True, as_index=False)[["Projects", "ContractCost"]].sum()
+
+
+def compute_contractor_cube(key):
+    store = load_store() if key.startswith("store:") else None
+    if store is None:
+        return build_contractor_cube(shared_dataset(key), contractor_ids(key))
+
+    # Store mode covers every stored row, one part at a time
+    from store import iter_parts
+    alias_ids = contractor_entities(key)["aliases"]["ContractorId"]
+    return merge_contractor_cubes([
+        build_contractor_cube(part, part["Contractor"].map(alias_ids))
+        for part in iter_parts(store, ["Contractor", "Region", "Year", "ContractCost"])
+    ])
+
+
+@resource_cache("contractor_cube", 4)
+def contractor_cube(key):
+    # Ids come from entity resolution, so a change of its rules misses too
+    return disk_cached("contractor_cube", LEADERBOARD_VERSION, dataset_fingerprint(key), ENTITY_VERSION,
+                       lambda: compute_contractor_cube(key))
+
+
+# ---------------------------------------------------------
+# Queries
+# ---------------------------------------------------------
+# Positions of the n largest values, largest first
+def top_k(values, n):
+    if len(values) > n:
+        candidates = np.argpartition(-values, n - 1)[:n]
+    else:
+        candidates = np.arange(len(values))
+    return candidates[np.argsort(-values[candidates], kind="stable")]
+
+
+def select_cells(cube, region="All", year=None):
+    mask = pd.Series(True, index=cube.index)
+    if region != "All":
+        mask &= cube["Region"] == region
+    if year is not None:
+        mask &= cube["Year"] == year
+    return cube[mask]
+
+
+# Top contractors of one selection by `metric`, with both metrics and the
+# market share of the ranking metric
+def leaderboard(cube, entities, metric="Projects", n=TOP_CONTRACTORS, region="All", year=None):
+    totals = select_cells(cube, region, year).groupby("ContractorId", observed=True)[["Projects", "ContractCost"]].sum()
+    if totals.empty:
+        return pd.DataFrame(columns=["Contractor", "Projects", "ContractCost", "Share"])
+    top = totals.iloc[top_k(totals[metric].to_numpy(dtype=float), n)]
+    table = pd.DataFrame({
+        "Contractor": entities.loc[top.index, "Contractor"].to_numpy(),
+        "Projects": top["Projects"].to_numpy(),
+        "ContractCost": top["ContractCost"].to_numpy(),
+        "Share": top[metric].to_numpy() / totals[metric].sum(),
+    }, index=pd.RangeIndex(1, len(top) + 1, name="Rank"))
+    return table
+
+
+def hhi(values):
+    total = values.sum()
+    return float(((values / total) ** 2).sum() * 10_000) if total else np.nan
+
+
+# HHI of every Region x Year cell by `metric` (regions as rows, years as
+# columns); the cube holds one row per contractor and cell, so the shares
+# are contractor shares
+def concentration_table(cube, metric="Projects"):
+    cells = cube.groupby(["Region", "Year"], observed=True)[metric]
+    shares = cube[metric] / cells.transform("sum")
+    index = (shares ** 2 * 10_000).groupby([cube["Region"], cube["Year"]], observed=True).sum()
+    table = index.unstack("Year")
+    table.columns = [int(year) for year in table.columns]
+    return table
+
+
+def concentration_level(value):
+    if np.isnan(value):
+        return "no data"
+    if value >= HHI_HIGH:
+        return "highly concentrated"
+    if value >= HHI_MODERATE:
+        return "moderately concentrated"
+    return "unconcentrated"
+
+
+# ---------------------------------------------------------
+# Concentration view (exact or sketched)
+# ---------------------------------------------------------
+# The store's contractor sketches when the view should use them, else None
+def contractor_sketches(key):
+    store = load_store() if key.startswith("store:") else None
+    if store is None or store.get("contractors") is None or store["manifest"]["rows"] < SKETCH_MIN_ROWS:
+        return None
+    return store["contractors"]
+
+
+def concentration_regions(key):
+    cells = contractor_sketches(key)
+    if cells is not None:
+        return sorted({region for region, _ in cells})
+    return sorted(contractor_cube(key)["Region"].dropna().unique().tolist())
+
+
+# (HHI, number of contractors, approximate?) of one selection
+@st.cache_data(max_entries=64, show_spinner=False)
+def concentration_summary(key, metric, region="All"):
+    cells = contractor_sketches(key)
+    if cells is not None:
+        from contractor_sketch import select_sketch
+        sketch = select_sketch(cells, region)
+        return sketch.hhi(metric), round(sketch.distinct()), True
+    totals = select_cells(contractor_cube(key), region).groupby("ContractorId", observed=True)[metric].sum()
+    return hhi(totals.to_numpy(dtype=float)), len(totals), False
+
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def top_contractors(key, metric, region="All", n=TOP_CONTRACTORS):
+    cells = contractor_sketches(key)
+    if cells is None:
+        return leaderboard(contractor_cube(key), contractor_entities(key)["entities"], metric, n, region)
+
+    from contractor_sketch import select_sketch
+    sketch = select_sketch(cells, region)
+    keys = sketch.candidates
+    # Only the heavy-hitter spellings are resolved; those of one contractor
+    # (variants the key does not merge) are added up before ranking
+    spellings = [sketch.names[k] for k in keys]
+    projects = sketch.estimate(keys, "Projects")
+    resolved = resolve_contractors(pd.Series(np.maximum(projects, 1).astype("int64"), index=spellings))
+    alias_ids = resolved["aliases"]["ContractorId"]
+    totals = pd.DataFrame({
+        "ContractorId": [alias_ids.get(name, name) for name in spellings],
+        "Projects": projects,
+        "ContractCost": sketch.estimate(keys, "ContractCost"),
+    }).groupby("ContractorId", sort=False).sum()
+    top = totals.iloc[top_k(totals[metric].to_numpy(dtype=float), n)]
+    names = resolved["entities"]["Contractor"]
+    return pd.DataFrame({
+        "Contractor": [names.get(ident, ident) for ident in top.index],
+        "Projects": top["Projects"].round().astype("int64").to_numpy(),
+        "ContractCost": top["ContractCost"].to_numpy(),
+        "Share": top[metric].to_numpy() / sketch.total(metric),
+    }, index=pd.RangeIndex(1, len(top) + 1, name="Rank"))
+
+
+# Region x Year HHI table of concentration_table, from the cube or per
+# sketched cell
+@st.cache_data(max_entries=8, show_spinner=False)
+def concentration_heatmap(key, metric):
+    cells = contractor_sketches(key)
+    if cells is None:
+        return concentration_table(contractor_cube(key), metric)
+    index = pd.Series({cell: sketch.hhi(metric) for cell, sketch in cells.items()})
+    table = index.rename_axis(["Region", "Year"]).unstack("Year").sort_index()
+    table.columns = [int(year) for year in table.columns]
+    return table
@@ -0,0 +1,287 @@
+# loadtest.py
+# Load test against the real app: starts a headless Streamlit server and
+# drives N simulated browser sessions through scripted interactions over
+# Streamlit's websocket protocol, at rising concurrency.
+#
+#   python apps/loadtest.py                              # 1, 2, 4 and 8 sessions
+#   python apps/loadtest.py --sessions 1,4,16 --iterations 5
+#   DPWH_STORE=data/store python apps/loadtest.py        # any dataset mode works
+#   python apps/loadtest.py --url ws://host:8501         # an already running server
+#
+# Each session opens the app, then repeats: move the funding-year and budget
+# sliders and pick a region on Data Exploration, change k on Analysis and
+# pick another column on Overview. Like a browser, a change to a widget inside
+# a fragment reruns only that fragment. Switching tabs never reaches the
+# server (every tab renders on every full run), so these widget changes are
+# the server work behind moving around the dashboard.
+#
+# For each concurrency level it reports p50/p95/p99 latency per interaction,
+# reruns per second and the server's resident memory (peak while the level
+# ran, Linux only).
+
+import argparse
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+
+import numpy as np
+from websockets.sync.client import connect
+
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+MAIN_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+PORT = 8599
+TIMEOUT = 300
+WIDGET_TYPES = ("slider", "selectbox", "multiselect", "checkbox")
+
+
+# ---------------------------------------------------------
+# One simulated browser session
+# ---------------------------------------------------------
+class Session:
+    def __init__(self, ws):
+        self.ws = ws
+        self.widgets = {}  # widget id -> (element type, proto, fragment id)
+        self.states = {}   # widget id -> WidgetState this session has set
+        self.errors = []
+
+    # Sends a rerun (of one fragment, when given) with every widget value this
+    # session has set, and waits until the server reports the run finished.
+    def rerun(self, fragment_id=""):
+        msg = BackMsg()
+        msg.rerun_script.query_string = ""
+        msg.rerun_script.fragment_id = fragment_id
+        msg.rerun_script.widget_states.widgets.extend(self.states.values())
+        self.ws.send(msg.SerializeToString())
+
+        while True:
+            reply = ForwardMsg()
+            reply.ParseFromString(self.ws.recv(timeout=TIMEOUT))
+            kind = reply.WhichOneof("type")
+            if kind == "delta" and reply.delta.WhichOneof("type") == "new_element":
+                self._record(reply.delta.new_element, reply.delta.fragment_id)
+            elif kind == "script_finished":
+                if reply.script_finished != ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                    return
+
+    def _record(self, element, fragment_id):
+        kind = element.WhichOneof("type")
+        if kind in WIDGET_TYPES:
+            widget = getattr(element, kind)
+            self.widgets[widget.id] = (kind, widget, fragment_id)
+        elif kind == "exception":
+            self.errors.append(f"{element.exception.type}: {element.exception.message}")
+
+    def widget(self, label=None, key=None):
+        for widget_id, (_, widget, fragment_id) in self.widgets.items():
+            if (key is not None and widget_id.endswith(f"-{key}")) or widget.label == label:
+                return widget, fragment_id
+        raise LookupError(f"No widget {key or label!r} on the page")
+
+    def set_slider(self, widget, values):
+        state = self.states[widget.id] = self.states.get(widget.id) or _new_state(widget.id)
+        del state.double_array_value.data[:]
+        state.double_array_value.data.extend(float(v) for v in values)
+
+    def set_select(self, widget, option):
+        state = self.states[widget.id] = _new_state(widget.id)
+        state.string_value = option
+
+
+def _new_state(widget_id):
+    return WidgetState(id=widget_id)
+
+
+def interactions(session, rng):
+    def move_range(key, cast):
+        def interact():
+            slider, fragment_id = session.widget(key=key)
+            low, high = sorted(rng.uniform(slider.min, slider.max) for _ in range(2))
+            session.set_slider(slider, (cast(low), cast(high)))
+            return fragment_id
+        return interact
+
+    def pick(label=None, key=None):
+        def interact():
+            select, fragment_id = session.widget(label=label, key=key)
+            session.set_select(select, rng.choice(list(select.options)))
+            return fragment_id
+        return interact
+
+    def change_k():
+        slider, fragment_id = session.widget(label="Number of Clusters (k):")
+        session.set_slider(slider, (rng.randint(int(slider.min), int(slider.max)),))
+        return fragment_id
+
+    return [
+        ("explore: year slider", move_range("explore_years", round)),
+        ("explore: budget slider", move_range("explore_budget", float)),
+        ("explore: region", pick(key="explore_region")),
+        ("analysis: k", change_k),
+        ("overview: column", pick(label="Select column to filter:")),
+    ]
+
+
+def run_session(url, seed, iterations, timings, errors):
+    rng = random.Random(seed)
+    try:
+        started = time.perf_counter()
+        with connect(f"{url}/_stcore/stream", subprotocols=["streamlit"], max_size=None,
+                     open_timeout=TIMEOUT) as ws:
+            session = Session(ws)
+            session.rerun()
+            timings.append(("open app", time.perf_counter() - started))
+
+            steps = interactions(session, rng)
+            for _ in range(iterations):
+                for name, interact in steps:
+                    fragment_id = interact()
+                    started = time.perf_counter()
+                    session.rerun(fragment_id)
+                    timings.append((name, time.perf_counter() - started))
+        errors.extend(session.errors)
+    except Exception as error:
+        errors.append(repr(error))
+
+
+# ---------------------------------------------------------
+# Server
+# ---------------------------------------------------------
+def start_server(port):
+    server = subprocess.Popen(
+        [sys.executable, "-m", "streamlit", "run", MAIN_SCRIPT,
+         "--server.headless", "true", "--server.port", str(port),
+         "--browser.gatherUsageStats", "false"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f"http://localhost:{port}/_stcore/health", timeout=1)
+            return server
+        except OSError:
+            if server.poll() is not None:
+                break
+            time.sleep(0.5)
+    server.kill()
+    raise RuntimeError("Streamlit server did not start")
+
+
+def rss_mb(pid):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+class MemorySampler(threading.Thread):
+    def __init__(self, pid, interval=0.2):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.peak = None
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.is_set():
+            rss = rss_mb(self.pid)
+            if rss is not None:
+                self.peak = max(self.peak or 0, rss)
+            self.stopped.wait(self.interval)
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+        return self.peak
+
+
+# ---------------------------------------------------------
+# Load levels
+# ---------------------------------------------------------
+def run_level(url, pid, sessions, iterations, seed):
+    timings, errors = [], []
+    sampler = MemorySampler(pid) if pid else None
+    if sampler:
+        sampler.start()
+
+    threads = [
+        threading.Thread(target=run_session, args=(url, seed + i, iterations, timings, errors))
+        for i in range(sessions)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    return {
+        "sessions": sessions,
+        "elapsed": elapsed,
+        "timings": timings,
+        "errors": errors,
+        "rss_peak_mb": sampler.stop() if sampler else None,
+    }
+
+
+def report(level):
+    timings = level["timings"]
+    print(f"\n=== {level['sessions']} concurrent session(s): {len(timings)} runs in "
+          f"{level['elapsed']:.1f}s, {len(timings) / level['elapsed']:.2f} runs/s ===")
+    if level["rss_peak_mb"] is not None:
+        print(f"Server memory: {level['rss_peak_mb']:,.0f} MB peak RSS")
+
+    print(f"{'interaction':<26}{'runs':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name in dict.fromkeys(name for name, _ in timings):
+        millis = np.array([t for n, t in timings if n == name]) * 1000
+        p50, p95, p99 = np.percentile(millis, [50, 95, 99])
+        print(f"{name:<26}{len(millis):>6}{p50:>10.0f}{p95:>10.0f}{p99:>10.0f}")
+
+    for error in level["errors"][:5]:
+        print(f"  error: {error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drive concurrent sessions through the dashboard.")
+    parser.add_argument("--sessions", default="1,2,4,8", help="comma-separated concurrency levels")
+    parser.add_argument("--iterations", type=int, default=3, help="interaction rounds per session")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--url", help="websocket URL of a running server (default: start one)")
+    parser.add_argument("--port", type=int, default=PORT, help="port for the server this tool starts")
+    args = parser.parse_args()
+
+    server = None
+    if args.url:
+        url, pid = args.url.rstrip("/"), None
+    else:
+        # Relative data paths in the app resolve from the repository root
+        os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        server = start_server(args.port)
+        url, pid = f"ws://localhost:{args.port}", server.pid
+        print(f"Started a Streamlit server on port {args.port} (pid {pid})")
+
+    failed = False
+    try:
+        for sessions in (int(n) for n in args.sessions.split(",")):
+            level = run_level(url, pid, sessions, args.iterations, args.seed)
+            report(level)
+            failed |= bool(level["errors"])
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -10,6 +10,9 @@ import tab_overview
 import tab_dataexploration
 import tab_analysis
 import tab_insights
+import upload
+import warmup
+from cache import render_cache_stats
 
 
 # Page configuration
@@ -21,6 +24,10 @@ st.set_page_config(
 
 st.title("DPWH Flood Control Projects - Data Analysis Dashboard")
 
+# Fills the shared caches in the background once per dataset version, so the
+# next visitor finds them warm (see warmup.py)
+warmup.start()
+
 def load_dataset():
     df = pd.read_csv("data/dpwhfloodcontrol.csv")
     df = df.loc[:, ~df.columns.str.startswith("Unnamed")]
@@ -38,15 +45,14 @@ def load_dataset():
 
 
 # Dataset | to reuse in all tabs
+# An uploaded CSV replaces the bundled dataset once it has been parsed
+upload.render_sidebar()
 
-#st.sidebar.header("Upload Your Dataset")
-#uploaded_file = st.sidebar.file_uploader("Upload CSV file", type=["csv"])
-
-#if uploaded_file:
-#    df = pd.read_csv(uploaded_file)
-# else:
-#    df = None
-#    st.sidebar.warning("Please upload a CSV file to continue.")
+st.sidebar.toggle(
+    "Apply filters on submit",
+    key="batch_filters",
+    help="Collect filter changes and apply them together with one click instead of on every change.",
+)
 
 st.markdown("""
     <style>
@@ -104,3 +110,8 @@ with st.container(horizontal_alignment="center"):
 
         with tab4:
             tab_insights.render()
+
+
+# Cache sizes and hit rates, for sizing DPWH_CACHE_BYTES (set DPWH_CACHE_STATS=1).
+# Drawn last so the counters include this run.
+render_cache_stats()
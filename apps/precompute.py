@@ -0,0 +1,169 @@
+# precompute.py
+# Offline build of every heavy artifact the dashboard needs.
+#
+#   python apps/precompute.py data/dpwhfloodcontrol.csv --out artifacts
+#   DPWH_BUNDLE=artifacts streamlit run apps/main.py
+#
+# Writes artifacts/<version>/ and points artifacts/current at it:
+#   store/            cleaned columnar data, aggregate cube and sketches (store.py)
+#   regressions.json  the three Analysis-tab regressions
+#   clusters/         KMeans labels/centroids and PCA coordinates per feature set and k
+#   clusters.json     index of the cluster results
+#   histograms.json   ContractCost/Budget histogram bins for the Insights tab
+#   bundle.json       version, store version, source and build time
+#
+# The app only reads the bundle; nothing under it is written while serving.
+# Its results hold for the store version it was built on: once a batch is
+# appended (or DPWH_STORE points at another store) utils.load_bundle stops
+# serving it and the app fits live until the bundle is rebuilt.
+
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+
+import store
+from tab_analysis import REGRESSIONS, fit_regression, numeric_columns, prepare_dataset, run_clustering
+
+# Bump when the cleaning, clustering or regression code changes what a bundle
+# contains, so old bundles are never mistaken for current ones.
+CODE_VERSION = 2
+
+CLUSTER_KS = range(2, 11)
+HIST_BINS = 50
+HIST_COLS = ["ContractCost", "Budget"]
+
+
+def feature_sets(numeric_cols):
+    # The Analysis tab defaults to all numeric columns; every pair covers the
+    # CLUSTER_PROFILES combinations described on the Insights tab.
+    return [list(numeric_cols)] + [list(pair) for pair in itertools.combinations(numeric_cols, 2)]
+
+
+def cluster_key(features, n_clusters, scale_data):
+    name = ",".join(features)
+    return f"{'scaled' if scale_data else 'raw'}-k{n_clusters}-{hashlib.sha1(name.encode()).hexdigest()[:10]}"
+
+
+def histogram_bins(values, bins=HIST_BINS):
+    counts, edges = np.histogram(values[np.isfinite(values)], bins=bins)
+    return {"edges": edges.tolist(), "counts": counts.tolist()}
+
+
+def build_bundle(csv_path, out, progress=print):
+    staging = os.path.join(out, ".staging")
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(os.path.join(staging, "clusters"))
+
+    progress("Ingesting dataset...")
+    manifest = store.ingest_csv(csv_path, os.path.join(staging, "store"))
+    data = store.open_store(os.path.join(staging, "store"))
+
+    # Row-level artifacts are computed on the same rows the app shows: the
+    # store sample, which is the full dataset below store.SAMPLE_ROWS rows.
+    df = prepare_dataset(data["sample"].copy())
+
+    progress("Fitting regressions...")
+    regressions = [fit_regression(df, x, y) for x, y in REGRESSIONS]
+    _write_json(os.path.join(staging, "regressions.json"), regressions)
+
+    progress("Building histograms...")
+    histograms = {}
+    for col in HIST_COLS:
+        values = store.scan_rows(data, [col])[col].to_numpy(dtype=float)
+        histograms[col] = histogram_bins(values)
+    _write_json(os.path.join(staging, "histograms.json"), histograms)
+
+    numeric_cols = numeric_columns(df)
+    index = []
+    sets = feature_sets(numeric_cols)
+    for i, features in enumerate(sets):
+        progress(f"Clustering feature set {i + 1}/{len(sets)}: {', '.join(features)}")
+        for scale_data in (True, False):
+            for n_clusters in CLUSTER_KS:
+                result = run_clustering(df, features, n_clusters, scale_data)
+                key = cluster_key(features, n_clusters, scale_data)
+                np.savez(
+                    os.path.join(staging, "clusters", f"{key}.npz"),
+                    labels=result["labels"].astype(np.int8),
+                    centers=result["centers"],
+                    pca=result["pca"].astype(np.float32),
+                )
+                index.append({"features": features, "k": n_clusters, "scaled": scale_data, "key": key})
+    _write_json(os.path.join(staging, "clusters.json"), index)
+
+    version = f"{manifest['version']}-c{CODE_VERSION}"
+    _write_json(os.path.join(staging, "bundle.json"), {
+        "version": version,
+        "code_version": CODE_VERSION,
+        "store_version": manifest["version"],
+        "source": os.path.abspath(csv_path),
+        "rows": manifest["rows"],
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    })
+
+    final = os.path.join(out, version)
+    shutil.rmtree(final, ignore_errors=True)
+    os.replace(staging, final)
+    with open(os.path.join(out, "current.tmp"), "w") as f:
+        f.write(version)
+    os.replace(os.path.join(out, "current.tmp"), os.path.join(out, "current"))
+    return final
+
+
+# ---------------------------------------------------------
+# Reading (used by the app)
+# ---------------------------------------------------------
+def resolve_bundle(root):
+    with open(os.path.join(root, "current")) as f:
+        return os.path.join(root, f.read().strip())
+
+
+def open_bundle(path):
+    clusters = _read_json(os.path.join(path, "clusters.json"))
+    return {
+        "path": path,
+        "manifest": _read_json(os.path.join(path, "bundle.json")),
+        "regressions": _read_json(os.path.join(path, "regressions.json")),
+        "histograms": _read_json(os.path.join(path, "histograms.json")),
+        "clusters": {(tuple(c["features"]), c["k"], c["scaled"]): c["key"] for c in clusters},
+    }
+
+
+def bundle_clustering(bundle, features, n_clusters, scale_data):
+    key = bundle["clusters"].get((tuple(features), n_clusters, scale_data))
+    if key is None:
+        return None
+    with np.load(os.path.join(bundle["path"], "clusters", f"{key}.npz")) as data:
+        return {"labels": data["labels"], "centers": data["centers"], "pca": data["pca"]}
+
+
+def _write_json(path, data):
+    with open(path, "w") as f:
+        json.dump(data, f, indent=1)
+
+
+def _read_json(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute the dashboard artifact bundle.")
+    parser.add_argument("csv", nargs="?", default="data/dpwhfloodcontrol.csv")
+    parser.add_argument("--out", default="artifacts")
+    args = parser.parse_args()
+
+    started = time.time()
+    path = build_bundle(args.csv, args.out, progress=lambda msg: print(msg, flush=True))
+    print(f"Wrote {path} in {time.time() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
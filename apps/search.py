@@ -0,0 +1,208 @@
+# search.py
+# Value lookups over the shared dataset's text columns, built once per
+# dataset version and shared by every session.
+#
+# PrefixIndex backs the Overview's search-as-you-type value picker: a column's
+# distinct values sorted case-insensitively, so the values starting with what
+# was typed are one binary search away and only the top TYPEAHEAD_MATCHES
+# (most projects first) are sent to the browser, however many values the
+# column has.
+#
+# TokenIndex backs the Overview's project search: an inverted index from
+# every word (token) of SEARCH_COLUMNS to the rows containing it. Each query
+# word matches the tokens it starts, so "leg const" finds LEGACY CONSTRUCTION;
+# rows must match every word and are ranked by how rare the matched tokens
+# are (idf) and how much of each token was typed.
+
+import re
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from cache import resource_cache
+from utils import shared_dataset
+
+TYPEAHEAD_MATCHES = 20
+# Columns with fewer distinct values keep a plain multiselect of all of them
+TYPEAHEAD_MIN_VALUES = 200
+
+SEARCH_COLUMNS = ["Contractor", "TypeOfWork", "Province", "ContractId", "ProjectId"]
+SEARCH_PREVIEW = 5
+TOKEN_PATTERN = re.compile(r"[0-9a-z]+")
+
+
+class PrefixIndex:
+    def __init__(self, series):
+        counts = series.dropna().value_counts()
+        counts = counts[counts > 0]  # categoricals also list unused categories
+        values = counts.index.astype(str).to_numpy(dtype=object)
+        keys = np.array([value.casefold() for value in values], dtype=object)
+        order = np.argsort(keys, kind="stable")
+        self.keys = keys[order]
+        self.values = values[order]
+        self.counts = counts.to_numpy()[order]
+        self._count_of = dict(zip(self.values, self.counts.tolist()))
+        # Stable sort keeps equally frequent values in alphabetical order
+        self._by_count = np.argsort(-self.counts, kind="stable")
+
+    def __len__(self):
+        return len(self.values)
+
+    def count(self, value):
+        return self._count_of.get(value, 0)
+
+    # Positions of the values starting with `prefix` (case-insensitive)
+    def _range(self, prefix):
+        prefix = prefix.strip().casefold()
+        low = np.searchsorted(self.keys, prefix, side="left")
+        high = np.searchsorted(self.keys, prefix + "\U0010ffff", side="left")
+        return low, high
+
+    # Returns (matches, total): up to `limit` (value, count) pairs starting
+    # with `prefix`, most frequent first, and how many values match in all.
+    def matches(self, prefix, limit=TYPEAHEAD_MATCHES):
+        low, high = self._range(prefix)
+        if high - low == len(self):  # nothing typed yet
+            positions = self._by_count[:limit]
+        else:
+            positions = np.arange(low, high)
+            positions = positions[np.argsort(-self.counts[positions], kind="stable")[:limit]]
+        return [(self.values[i], int(self.counts[i])) for i in positions], int(high - low)
+
+
+@resource_cache("value_index", 32)
+def value_index(key, col):
+    return PrefixIndex(shared_dataset(key)[col])
+
+
+# Multiselect over a text column. Columns with many distinct values get a
+# search box: only the values matching what was typed (plus those already
+# picked) become options, each shown with its project count. Inside a batch
+# mode form (utils.filter_form) the box would only update on submit, so the
+# caller passes `search_area`, a container outside the form, to hold it.
+def value_picker(key, col, search_area=None):
+    index = value_index(key, col)
+    if len(index) < TYPEAHEAD_MIN_VALUES:
+        return st.multiselect(f"Select values for `{col}`:", index.values.tolist())
+
+    query = (search_area or st).text_input(f"Search `{col}`:", key=f"typeahead_query_{col}",
+                                           placeholder="Type the first characters")
+    if search_area is not None:
+        search_area.caption("Matching values update as you search; the values you pick apply on submit.")
+    picked = st.session_state.get(f"typeahead_values_{col}", [])
+    matches, total = index.matches(query)
+    options = list(dict.fromkeys(picked + [value for value, _ in matches]))
+    selected = st.multiselect(
+        f"Select values for `{col}`:", options, key=f"typeahead_values_{col}",
+        format_func=lambda value: f"{value} ({index.count(value):,})",
+    )
+    st.caption(f"{len(matches):,} of {total:,} matching values (of {len(index):,}), most projects first")
+    return selected
+
+
+# ---------------------------------------------------------
+# Full-text search
+# ---------------------------------------------------------
+def tokenize(text):
+    return TOKEN_PATTERN.findall(str(text).casefold())
+
+
+class TokenIndex:
+    def __init__(self, df, columns=SEARCH_COLUMNS):
+        self.rows = len(df)
+        # Each distinct value is tokenized once and its tokens spread to its
+        # rows by factorize code
+        columns = [pd.factorize(df[col]) for col in columns if col in df.columns]
+        value_tokens = [[set(tokenize(value)) for value in uniques] for _, uniques in columns]
+        self.vocab = np.array(sorted(set().union(*(t for tokens in value_tokens for t in tokens))), dtype=object)
+        token_id = {token: i for i, token in enumerate(self.vocab)}
+
+        keys = []
+        for (codes, _), tokens in zip(columns, value_tokens):
+            offsets = np.cumsum([0] + [len(t) for t in tokens])
+            ids = np.fromiter((token_id[t] for value in tokens for t in value), dtype=np.int64, count=offsets[-1])
+            rows = np.flatnonzero(codes >= 0)
+            codes = codes[rows]
+            lengths = offsets[codes + 1] - offsets[codes]
+            starts = np.repeat(offsets[codes] - np.cumsum(lengths) + lengths, lengths)
+            keys.append(ids[starts + np.arange(lengths.sum())] * self.rows + np.repeat(rows, lengths))
+
+        # Postings: one array sorted by token (in vocabulary order, so a
+        # prefix range is one contiguous slice) then row; a token found in
+        # several columns of a row counts once.
+        keys = np.sort(np.concatenate(keys)) if keys else np.empty(0, dtype=np.int64)
+        keys = keys[np.concatenate([[True], keys[1:] != keys[:-1]])] if len(keys) else keys
+        token, self.postings = np.divmod(keys, max(self.rows, 1))
+        self.offsets = np.searchsorted(token, np.arange(len(self.vocab) + 1))
+        self.idf = np.log1p(self.rows / np.maximum(np.diff(self.offsets), 1))
+        self.lengths = np.array([len(t) for t in self.vocab])
+
+    # Returns (rows, scores) of the rows matching every query word, best first
+    def search(self, query):
+        terms = tokenize(query)
+        if not terms:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        total = np.zeros(self.rows)
+        matched = np.ones(self.rows, dtype=bool)
+        for term in dict.fromkeys(terms):
+            low = np.searchsorted(self.vocab, term, side="left")
+            high = np.searchsorted(self.vocab, term + "\U0010ffff", side="left")
+            rows = self.postings[self.offsets[low]:self.offsets[high]]
+            # Full idf for a whole token, less the more of it is left untyped
+            weights = self.idf[low:high] * len(term) / self.lengths[low:high]
+            score = np.zeros(self.rows)
+            np.maximum.at(score, rows, np.repeat(weights, np.diff(self.offsets[low:high + 1])))
+            matched &= score > 0
+            total += score
+        rows = np.flatnonzero(matched)
+        order = np.argsort(-total[rows], kind="stable")
+        return rows[order], total[rows][order]
+
+
+@resource_cache("token_index", 4)
+def token_index(key):
+    return TokenIndex(shared_dataset(key))
+
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def search_rows(key, query):
+    return token_index(key).search(query)[0]
+
+
+_MARKDOWN_SPECIAL = re.compile(r"([\\`*_{}\[\]()#+\-.!|:~<>$])")
+
+
+def _escape(text):
+    return _MARKDOWN_SPECIAL.sub(r"\\\1", text)
+
+
+# Markdown for `text` with the typed start of every matching word highlighted
+def highlight(text, query):
+    text = str(text)
+    terms = sorted(set(tokenize(query)), key=len, reverse=True)
+    if not terms:
+        return _escape(text)
+    pattern = re.compile(r"(?<![0-9a-z])(" + "|".join(map(re.escape, terms)) + ")", re.IGNORECASE)
+    # split() with one group alternates unmatched text and matches
+    parts = pattern.split(text)
+    return "".join(f":orange-background[{_escape(part)}]" if i % 2 else _escape(part)
+                   for i, part in enumerate(parts) if part)
+
+
+# Search box over SEARCH_COLUMNS. Returns the matching row positions, best
+# match first, or None when nothing was typed; the best matches are listed
+# below the box with the matched words highlighted.
+def project_search(key, df):
+    query = st.text_input("Search projects:", key="project_search",
+                          placeholder="Contractor, type of work, province or ID")
+    if not tokenize(query):
+        return None
+
+    rows = search_rows(key, query)
+    st.caption(f"{len(rows):,} projects match")
+    for row in rows[:SEARCH_PREVIEW]:
+        record = df.iloc[row]
+        fields = [highlight(record[col], query) for col in SEARCH_COLUMNS if col in df.columns and pd.notna(record[col])]
+        st.markdown(" · ".join(fields))
+    return rows
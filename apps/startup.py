@@ -0,0 +1,103 @@
+# startup.py
+# Import-cost report for the app's modules, measured in a fresh interpreter.
+#
+#   python apps/startup.py            # per-module import cost at app start
+#   python apps/startup.py --top 25   # show more of the heaviest imports
+#
+# Uses `python -X importtime` on the module-level imports of main.py, read
+# from its source, so the numbers are what a new server worker pays before the
+# first byte renders. Every module of apps/ is reported wherever it is first
+# imported. Heavy modules that should load lazily (DEFERRED) are flagged if
+# anything pulls them in at import time; Streamlit itself already imports
+# pyarrow and the bare plotly package.
+
+import argparse
+import ast
+import os
+import subprocess
+import sys
+
+APPS_DIR = os.path.dirname(os.path.abspath(__file__))
+MAIN_SCRIPT = os.path.join(APPS_DIR, "main.py")
+APP_MODULES = sorted(name[:-len(".py")] for name in os.listdir(APPS_DIR) if name.endswith(".py"))
+DEFERRED = ["sklearn", "plotly.express", "scipy"]
+
+
+# Modules main.py imports at module level, in order
+def main_imports(path=MAIN_SCRIPT):
+    with open(path) as f:
+        tree = ast.parse(f.read())
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            modules.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.level == 0:
+            modules.append(node.module)
+    return list(dict.fromkeys(modules))
+
+
+def measure_imports(modules=None):
+    code = "; ".join(f"import {m}" for m in modules or main_imports())
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=APPS_DIR, capture_output=True, text=True, check=True,
+    )
+
+    # Lines look like "import time:  self [us] | cumulative | imported package"
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return rows
+
+
+# -X importtime lists a module after everything it imports; this puts every
+# module ahead of its imports instead, keeping import order among siblings
+def import_tree(rows):
+    pending = {}  # depth -> subtrees still waiting for their importer
+    for row in rows:
+        children = pending.pop(row[3] + 1, [])
+        pending.setdefault(row[3], []).append([row] + [r for child in children for r in child])
+    return [r for tree in pending.get(0, []) for r in tree]
+
+
+def report(rows, top=15):
+    top_level = [r for r in rows if r[3] == 0]
+    total = sum(r[2] for r in top_level)
+    print(f"Total import time: {total / 1e6:.2f}s\n")
+
+    # Nested ones are indented under the module that first imports them
+    print("App modules (cumulative, including what they pull in):")
+    app_rows = [r for r in import_tree(rows) if r[0] in APP_MODULES]
+    shallowest = min((r[3] for r in app_rows), default=0)
+    for name, _, cumulative, depth in app_rows:
+        indent = "  " * (depth - shallowest)
+        print(f"  {indent + name:<24}{cumulative / 1e3:>10.1f} ms")
+
+    print("\nHeaviest top-level imports:")
+    for name, _, cumulative, _ in sorted(top_level, key=lambda r: r[2], reverse=True)[:top]:
+        print(f"  {name:<24}{cumulative / 1e3:>10.1f} ms")
+
+    loaded = {r[0] for r in rows}
+    eager = [lib for lib in DEFERRED if lib in loaded]
+    print()
+    if eager:
+        print(f"Loaded at startup but meant to be deferred: {', '.join(eager)}")
+    else:
+        print(f"Deferred until first use: {', '.join(DEFERRED)}")
+    return eager
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report per-module import cost at app start.")
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+    eager = report(measure_imports(), args.top)
+    sys.exit(1 if eager else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,639 @@
+# store.py
+# Chunked, on-disk columnar store for very large DPWH exports.
+#
+#   python apps/store.py ingest data/dpwhfloodcontrol.csv --out data/store
+#   DPWH_STORE=data/store streamlit run apps/main.py
+#
+# The CSV is read CHUNK_ROWS rows at a time. Each chunk is cleaned with
+# utils.clean_dataset, written as one parquet part and folded into the
+# running aggregates, so memory is bounded by the chunk size, not the file:
+#   parts/         cleaned rows, one parquet file per chunk
+#   ids/           sorted row-key hashes per part, for deduplication
+#   state-<version>/  the aggregates of one dataset version:
+#   cube.parquet   Region x Year totals (projects, budget, cost, duration)
+#   stats.json     mergeable per-column statistics sketches
+#   quantiles.parquet  per-group quantile sketches (quantiles.py)
+#   contractors.npz    per-cell contractor concentration sketches (contractor_sketch.py)
+#   quality.json   data-quality profile of every stored row (utils.quality_profile)
+#   zones.parquet  per-part Region x Year row counts and budget bounds (filter index)
+#   sample.parquet uniform bottom-k row sample for row-level charts
+#   manifest.json  row count, part list, dataset version, per-cell versions
+#                  and the state directory of the version
+#
+# New batches are merged with `python apps/store.py append batch.csv`. An
+# append writes its part and a new state directory, then replaces
+# manifest.json, so a reader (or a crash) sees either the old version or the
+# new one, never aggregates counting a part the manifest does not list. The
+# previous state directory is kept for readers still opening it. Appends
+# hold append.lock (flock) throughout, so concurrent appends run one at a
+# time.
+#
+# Ingestion and appends drop the same duplicates: rows repeating the
+# (ContractId, ProjectId, Year) of a stored row or of an earlier row of the
+# batch. ContractId alone is not unique in the DPWH export (multi-year
+# funding tranches, Excel-mangled IDs like "2.10E+77" shared by different
+# projects), and rows without a ContractId are never treated as duplicates.
+
+import argparse
+import contextlib
+import hashlib
+import json
+import os
+import shutil
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: appends are not serialized
+    fcntl = None
+
+import numpy as np
+import pandas as pd
+
+from contractor_sketch import build_cell_sketches, load_cell_sketches, merge_cell_sketches, save_cell_sketches
+from quantiles import build_group_sketches, merge_group_sketches, sketches_from_frame, sketches_to_frame
+from utils import clean_dataset, merge_quality
+
+CHUNK_ROWS = 200_000
+SAMPLE_ROWS = 50_000
+TOP_VALUES = 1_000
+
+CUBE_KEYS = ["Region", "Year"]
+TEXT_COLS = ["Region", "Province", "TypeOfWork", "Contractor", "ContractId", "ProjectId"]
+NUMERIC_COLS = ["Year", "Budget", "ContractCost", "DurationDays"]
+STAT_COLS = ["Budget", "ContractCost", "DurationDays"]
+ROW_KEY = ["ContractId", "ProjectId", "Year"]
+# Recorded in the manifest; stores whose ids/ hold another key are rehashed
+ROW_KEY_VERSION = 1
+
+# Fixed histogram edges so sketches from different chunks line up bin for bin.
+# Peso columns use log bins (~2.3% wide) from ₱1k to ₱100B, durations 1-day bins.
+_PESO_EDGES = np.concatenate([[0.0], np.logspace(3, 11, 801)])
+HIST_EDGES = {
+    "Budget": _PESO_EDGES,
+    "ContractCost": _PESO_EDGES,
+    "DurationDays": np.arange(-1000.0, 5001.0),
+}
+
+
+# ---------------------------------------------------------
+# Aggregate cube
+# ---------------------------------------------------------
+def build_cube(df):
+    # Totals are summed in float64 even when df holds compact float32 columns
+    df = df.astype({col: "float64" for col in ["Budget", "ContractCost", "DurationDays"] if col in df.columns})
+    grouped = df.groupby(CUBE_KEYS, dropna=False)
+    cube = grouped.agg(
+        Projects=("Region", "size"),
+        Budget=("Budget", "sum"),
+        ContractCost=("ContractCost", "sum"),
+        DurationSum=("DurationDays", "sum"),
+        DurationCount=("DurationDays", "count"),
+    )
+    return cube.reset_index()
+
+
+def merge_cubes(*cubes):
+    cubes = [c for c in cubes if c is not None and not c.empty]
+    if not cubes:
+        return None
+    merged = pd.concat(cubes, ignore_index=True)
+    return merged.groupby(CUBE_KEYS, dropna=False, as_index=False).sum()
+
+
+def filter_cube(cube, region="All", year_range=(None, None)):
+    mask = pd.Series(True, index=cube.index)
+    if region != "All":
+        mask &= cube["Region"] == region
+    if year_range[0] is not None:
+        mask &= cube["Year"].between(year_range[0], year_range[1])
+    return cube[mask]
+
+
+# ---------------------------------------------------------
+# Statistics sketches
+# ---------------------------------------------------------
+# Per column: count/mean/m2 (merged with Chan's parallel formula), min, max,
+# a fixed-edge histogram for quantiles and a truncated value count for the mode.
+def new_stats():
+    return {
+        col: {
+            "count": 0, "mean": 0.0, "m2": 0.0,
+            "min": None, "max": None,
+            "hist": [0] * (len(HIST_EDGES[col]) - 1),
+            "top": {},
+        }
+        for col in STAT_COLS
+    }
+
+
+def _sketch_column(col, values):
+    edges = HIST_EDGES[col]
+    hist, _ = np.histogram(np.clip(values, edges[0], edges[-1]), bins=edges)
+    counts = pd.Series(values).value_counts().head(TOP_VALUES)
+    return {
+        "count": int(len(values)),
+        "mean": float(values.mean()) if len(values) else 0.0,
+        "m2": float(((values - values.mean()) ** 2).sum()) if len(values) else 0.0,
+        "min": float(values.min()) if len(values) else None,
+        "max": float(values.max()) if len(values) else None,
+        "hist": hist.tolist(),
+        "top": {repr(float(k)): int(v) for k, v in counts.items()},
+    }
+
+
+def _merge_sketch(a, b):
+    n = a["count"] + b["count"]
+    if n == 0:
+        return a
+    delta = b["mean"] - a["mean"]
+    top = dict(a["top"])
+    for k, v in b["top"].items():
+        top[k] = top.get(k, 0) + v
+    top = dict(sorted(top.items(), key=lambda kv: kv[1], reverse=True)[:TOP_VALUES])
+    bounds = [x for x in (a["min"], b["min"]) if x is not None]
+    upper = [x for x in (a["max"], b["max"]) if x is not None]
+    return {
+        "count": n,
+        "mean": a["mean"] + delta * b["count"] / n,
+        "m2": a["m2"] + b["m2"] + delta ** 2 * a["count"] * b["count"] / n,
+        "min": min(bounds),
+        "max": max(upper),
+        "hist": [x + y for x, y in zip(a["hist"], b["hist"])],
+        "top": top,
+    }
+
+
+def update_stats(stats, df):
+    for col in STAT_COLS:
+        values = pd.to_numeric(df[col], errors="coerce").dropna().to_numpy(dtype=float)
+        stats[col] = _merge_sketch(stats[col], _sketch_column(col, values))
+    return stats
+
+
+def merge_stats(a, b):
+    return {col: _merge_sketch(a[col], b[col]) for col in STAT_COLS}
+
+
+def _hist_quantile(sketch, col, q):
+    counts = np.asarray(sketch["hist"], dtype=float)
+    total = counts.sum()
+    if total == 0:
+        return np.nan
+    edges = HIST_EDGES[col]
+    cum = np.cumsum(counts)
+    i = int(np.searchsorted(cum, q * total))
+    before = cum[i - 1] if i > 0 else 0.0
+    frac = (q * total - before) / counts[i] if counts[i] else 0.0
+    value = edges[i] + frac * (edges[i + 1] - edges[i])
+    return float(np.clip(value, sketch["min"], sketch["max"]))
+
+
+# Same keys as tab_dataexploration.summarize_column, answered from the sketch.
+# Quantiles are accurate to one histogram bin; the mode is exact unless the
+# most common value was truncated out of a chunk's top TOP_VALUES.
+def column_summary(stats, col):
+    s = stats[col]
+    var = s["m2"] / (s["count"] - 1) if s["count"] > 1 else np.nan
+    mode = max(s["top"].items(), key=lambda kv: kv[1])[0] if s["top"] else np.nan
+    return {
+        "mean": s["mean"] if s["count"] else np.nan,
+        "mode": float(mode),
+        "std": float(np.sqrt(var)),
+        "var": var,
+        "min": s["min"] if s["min"] is not None else np.nan,
+        "max": s["max"] if s["max"] is not None else np.nan,
+        "q1": _hist_quantile(s, col, 0.25),
+        "median": _hist_quantile(s, col, 0.50),
+        "q3": _hist_quantile(s, col, 0.75),
+    }
+
+
+# ---------------------------------------------------------
+# Filter index and sample
+# ---------------------------------------------------------
+def build_zones(df, part):
+    zones = df.groupby(CUBE_KEYS, dropna=False).agg(
+        Rows=("Region", "size"),
+        BudgetMin=("Budget", "min"),
+        BudgetMax=("Budget", "max"),
+    ).reset_index()
+    zones.insert(0, "Part", part)
+    return zones
+
+
+# Bottom-k sampling: every row gets a random key and the k smallest keys are
+# kept, which stays a uniform sample when chunks are merged in any order.
+def update_sample(sample, df, rng, k=SAMPLE_ROWS):
+    df = df.assign(_SampleKey=rng.random(len(df)))
+    if sample is not None:
+        df = pd.concat([sample, df], ignore_index=True)
+    return df.nsmallest(k, "_SampleKey").reset_index(drop=True)
+
+
+# ---------------------------------------------------------
+# Ingestion
+# ---------------------------------------------------------
+def prepare_chunk(raw):
+    df = clean_dataset(raw)
+    # Parquet parts must share one schema even when a chunk happens to be
+    # all-null or all-integer in a column.
+    for col in TEXT_COLS:
+        if col in df.columns:
+            df[col] = df[col].astype("string")
+    for col in NUMERIC_COLS:
+        if col in df.columns:
+            df[col] = df[col].astype("float64")
+    return df
+
+
+def _write_json(path, data):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f, indent=1)
+    os.replace(tmp, path)
+
+
+def _read_json(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def _write_parquet(df, path):
+    tmp = path + ".tmp"
+    df.to_parquet(tmp, index=False)
+    os.replace(tmp, path)
+
+
+# Hash of each row's ROW_KEY, and whether the row has a ContractId to match on
+def row_keys(df):
+    hashes = pd.util.hash_pandas_object(df[ROW_KEY], index=False).to_numpy()
+    return hashes, df["ContractId"].notna().to_numpy()
+
+
+def _write_ids(root, part, df):
+    hashes, has_id = row_keys(df)
+    np.save(os.path.join(root, "ids", part.replace(".parquet", ".npy")), np.sort(hashes[has_id]))
+
+
+def cell_key(region, year):
+    return f"{region}|{year}"
+
+
+# Folds one cleaned, deduplicated chunk into the running state: writes its
+# parquet part and sorted row-key hashes, then merges it into every
+# aggregate. Used by both ingest_csv and append_batch, which also drop the
+# same duplicates (new_rows), so a store built in one pass holds the same
+# rows and aggregates as one built by appends.
+def _fold_chunk(root, state, df, part, rng, version):
+    df.to_parquet(os.path.join(root, "parts", part), index=False)
+    _write_ids(root, part, df)
+    state["parts"].append(part)
+
+    cube = build_cube(df)
+    state["cube"] = merge_cubes(state["cube"], cube)
+    state["stats"] = update_stats(state["stats"], df)
+    state["quantiles"] = merge_group_sketches(state["quantiles"], build_group_sketches(df))
+    state["contractors"] = merge_cell_sketches(state["contractors"], build_cell_sketches(df))
+    state["quality"] = merge_quality(state["quality"], df.attrs["quality"])
+    state["zones"] = pd.concat([state["zones"], build_zones(df, part)], ignore_index=True)
+    state["sample"] = update_sample(state["sample"], df, rng)
+    state["rows"] += len(df)
+    for region, year in zip(cube["Region"], cube["Year"]):
+        state["cell_versions"][cell_key(region, year)] = version
+
+
+STATE_FILES = ["cube.parquet", "zones.parquet", "sample.parquet", "stats.json",
+               "quantiles.parquet", "contractors.npz", "quality.json"]
+
+
+# Stores written before state directories keep their aggregates in the root
+def state_dir(root, manifest):
+    return os.path.join(root, manifest.get("state", ""))
+
+
+# Writes the aggregates into state-<version>/ and then switches the manifest
+# to it and to the new parts. Older state directories than the one the
+# manifest listed before are removed.
+def _save_state(root, state, manifest):
+    previous = manifest.get("state", "")
+    name = f"state-{manifest['version']}"
+    out, tmp = os.path.join(root, name), os.path.join(root, name + ".tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    _write_parquet(state["cube"], os.path.join(tmp, "cube.parquet"))
+    _write_parquet(state["zones"], os.path.join(tmp, "zones.parquet"))
+    _write_parquet(state["sample"], os.path.join(tmp, "sample.parquet"))
+    _write_json(os.path.join(tmp, "stats.json"), state["stats"])
+    _write_parquet(sketches_to_frame(state["quantiles"]), os.path.join(tmp, "quantiles.parquet"))
+    save_cell_sketches(state["contractors"], os.path.join(tmp, "contractors.npz"))
+    _write_json(os.path.join(tmp, "quality.json"), state["quality"])
+    shutil.rmtree(out, ignore_errors=True)
+    os.replace(tmp, out)
+
+    manifest.update(
+        rows=state["rows"],
+        parts=state["parts"],
+        cell_versions=state["cell_versions"],
+        state=name,
+    )
+    # Written last: readers see the new parts and aggregates together.
+    _write_json(os.path.join(root, "manifest.json"), manifest)
+    _prune_states(root, keep={name, previous})
+    return manifest
+
+
+def _prune_states(root, keep):
+    for entry in os.listdir(root):
+        if entry.startswith("state-") and entry not in keep:
+            shutil.rmtree(os.path.join(root, entry), ignore_errors=True)
+    if "" not in keep:
+        for entry in STATE_FILES:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(os.path.join(root, entry))
+
+
+def ingest_csv(path, out, chunk_rows=CHUNK_ROWS, progress=None, seed=42):
+    if os.path.exists(out) and os.listdir(out) and not os.path.exists(os.path.join(out, "manifest.json")):
+        raise ValueError(f"{out} exists and is not a dataset store.")
+
+    tmp = out + ".tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(os.path.join(tmp, "parts"))
+    os.makedirs(os.path.join(tmp, "ids"))
+
+    rng = np.random.default_rng(seed)
+    digest = hashlib.sha1()
+    state = {
+        "cube": None, "stats": new_stats(), "quantiles": None, "contractors": None,
+        "quality": None, "zones": None, "sample": None,
+        "parts": [], "rows": 0, "cell_versions": {},
+    }
+    started = time.time()
+    duplicates = 0
+
+    for i, raw in enumerate(pd.read_csv(path, chunksize=chunk_rows)):
+        df, dropped = dedupe_chunk(tmp, state["parts"], raw)
+        # The version covers the kept rows, as in append_batch, so a rebuild
+        # that drops different duplicates never reuses caches of the old one
+        digest.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+        duplicates += dropped
+        if len(df):
+            _fold_chunk(tmp, state, df, f"part-{i:05d}.parquet", rng, "initial")
+        if progress:
+            progress(state["rows"], time.time() - started)
+
+    version = digest.hexdigest()[:12]
+    state["cell_versions"] = {k: version for k in state["cell_versions"]}
+    manifest = _save_state(tmp, state, {
+        "source": os.path.abspath(path),
+        "chunk_rows": chunk_rows,
+        "version": version,
+        "row_key": ROW_KEY_VERSION,
+        "duplicates": duplicates,
+        "batches": [],
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    })
+
+    shutil.rmtree(out, ignore_errors=True)
+    os.replace(tmp, out)
+    return manifest
+
+
+# ---------------------------------------------------------
+# Incremental append
+# ---------------------------------------------------------
+def known_rows(root, parts, hashes):
+    seen = np.zeros(len(hashes), dtype=bool)
+    for part in parts:
+        stored = np.load(os.path.join(root, "ids", part.replace(".parquet", ".npy")), mmap_mode="r")
+        if len(stored) == 0:
+            continue
+        pos = np.minimum(np.searchsorted(stored, hashes), len(stored) - 1)
+        seen |= stored[pos] == hashes
+    return seen
+
+
+# Rows of `df` to keep: the first of each row key, unless already stored in
+# `parts`. Rows without a ContractId are always kept.
+def new_rows(root, parts, df):
+    hashes, has_id = row_keys(df)
+    repeated = pd.Series(hashes).duplicated(keep="first").to_numpy() | known_rows(root, parts, hashes)
+    return ~(repeated & has_id)
+
+
+# Cleans a raw chunk and drops its duplicates; returns (rows, dropped)
+def dedupe_chunk(root, parts, raw):
+    df = prepare_chunk(raw)
+    keep = new_rows(root, parts, df)
+    if keep.all():
+        return df, 0
+    # Cleaned again so the chunk's quality profile counts only kept rows
+    return prepare_chunk(raw[keep].reset_index(drop=True)), int((~keep).sum())
+
+
+# Stores written before ROW_KEY_VERSION hashed ContractId alone
+def _rehash_ids(root, manifest):
+    if manifest.get("row_key") == ROW_KEY_VERSION:
+        return
+    for part in manifest["parts"]:
+        _write_ids(root, part, pd.read_parquet(os.path.join(root, "parts", part), columns=ROW_KEY))
+    manifest["row_key"] = ROW_KEY_VERSION
+
+
+def _next_part(parts):
+    numbers = [int(part[len("part-"):-len(".parquet")]) for part in parts]
+    return f"part-{max(numbers, default=-1) + 1:05d}.parquet"
+
+
+# Sketches a store was ingested without are built from its parts once, on
+# the first append, so the appended batch merges into the full history
+def _backfill_sketches(root, state):
+    for name, build, merge in [("quantiles", build_group_sketches, merge_group_sketches),
+                               ("contractors", build_cell_sketches, merge_cell_sketches)]:
+        if state[name] is not None:
+            continue
+        for part in state["parts"]:
+            state[name] = merge(state[name], build(pd.read_parquet(os.path.join(root, "parts", part))))
+
+
+# Held for a whole append; the lock file is never removed, so every appender
+# locks the same inode
+@contextlib.contextmanager
+def _append_lock(root):
+    with open(os.path.join(root, "append.lock"), "a") as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+# Merges a batch of raw (CSV-shaped) rows into an existing store and returns
+# (manifest, rows added, duplicates dropped). Duplicates are dropped as in
+# ingest_csv. The batch becomes one new part; every aggregate is merged rather than
+# rebuilt, so the cost follows the batch size (plus one sorted-id lookup per
+# part) instead of the stored history. Only Region x Year cells the batch
+# touches get a new entry in manifest["cell_versions"], so caches keyed with
+# cell_version() stay valid for untouched filters.
+def append_batch(root, raw):
+    with _append_lock(root):
+        return _append_batch(root, raw)
+
+
+def _append_batch(root, raw):
+    manifest = _read_json(os.path.join(root, "manifest.json"))
+    _rehash_ids(root, manifest)
+    df, dropped = dedupe_chunk(root, manifest["parts"], raw)
+    if not len(df):
+        return manifest, 0, dropped
+
+    digest = hashlib.sha1(manifest["version"].encode())
+    digest.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    version = digest.hexdigest()[:12]
+
+    current = state_dir(root, manifest)
+    state = {
+        "cube": pd.read_parquet(os.path.join(current, "cube.parquet")),
+        "stats": _read_json(os.path.join(current, "stats.json")),
+        "quantiles": _read_quantiles(current),
+        "contractors": _read_contractor_sketches(current),
+        "quality": _read_quality(current),
+        "zones": pd.read_parquet(os.path.join(current, "zones.parquet")),
+        "sample": pd.read_parquet(os.path.join(current, "sample.parquet")),
+        "parts": list(manifest["parts"]),
+        "rows": manifest["rows"],
+        "cell_versions": dict(manifest["cell_versions"]),
+    }
+    _backfill_sketches(root, state)
+    rng = np.random.default_rng(int(version, 16))
+    _fold_chunk(root, state, df, _next_part(state["parts"]), rng, version)
+
+    manifest["version"] = version
+    manifest["batches"].append({"version": version, "rows": len(df), "duplicates": dropped,
+                                "appended": time.strftime("%Y-%m-%dT%H:%M:%S")})
+    return _save_state(root, state, manifest), len(df), dropped
+
+
+# ---------------------------------------------------------
+# Reading
+# ---------------------------------------------------------
+def store_version(path):
+    return _read_json(os.path.join(path, "manifest.json"))["version"]
+
+
+# Version token for one filter: changes only when a batch touched one of the
+# Region x Year cells the filter covers.
+def cell_version(store, region="All", year_range=(None, None)):
+    cells = filter_cube(store["cube"], region, year_range)
+    versions = store["manifest"]["cell_versions"]
+    keys = sorted(cell_key(r, y) for r, y in zip(cells["Region"], cells["Year"]))
+    digest = hashlib.sha1()
+    for key in keys:
+        digest.update(f"{key}={versions.get(key)};".encode())
+    return digest.hexdigest()[:12]
+
+
+# Stores ingested before quality.json existed have no profile
+def _read_quality(path):
+    quality_path = os.path.join(path, "quality.json")
+    return _read_json(quality_path) if os.path.exists(quality_path) else None
+
+
+# Stores ingested before quantiles.parquet existed have no quantile sketches
+def _read_quantiles(path):
+    quantiles_path = os.path.join(path, "quantiles.parquet")
+    return sketches_from_frame(pd.read_parquet(quantiles_path)) if os.path.exists(quantiles_path) else None
+
+
+# Nor contractor sketches before contractors.npz
+def _read_contractor_sketches(path):
+    sketch_path = os.path.join(path, "contractors.npz")
+    return load_cell_sketches(sketch_path) if os.path.exists(sketch_path) else None
+
+
+# Reads the manifest once and every aggregate from the state directory it
+# lists, so an append finishing meanwhile cannot mix two versions
+def open_store(path):
+    manifest = _read_json(os.path.join(path, "manifest.json"))
+    current = state_dir(path, manifest)
+    return {
+        "path": path,
+        "manifest": manifest,
+        "cube": pd.read_parquet(os.path.join(current, "cube.parquet")),
+        "zones": pd.read_parquet(os.path.join(current, "zones.parquet")),
+        "stats": _read_json(os.path.join(current, "stats.json")),
+        "quality": _read_quality(current),
+        "quantiles": _read_quantiles(current),
+        "contractors": _read_contractor_sketches(current),
+        "sample": pd.read_parquet(os.path.join(current, "sample.parquet")).drop(columns="_SampleKey"),
+    }
+
+
+# Reads only `columns` of the rows matching the filters. The zone index is
+# used first to skip every part that cannot contain a match.
+def scan_rows(store, columns, region="All", year_range=(None, None), budget_range=(None, None)):
+    import pyarrow.dataset as ds
+
+    zones = store["zones"]
+    mask = pd.Series(True, index=zones.index)
+    expr = None
+
+    def _and(a, b):
+        return b if a is None else a & b
+
+    if region != "All":
+        mask &= zones["Region"] == region
+        expr = _and(expr, ds.field("Region") == region)
+    if year_range[0] is not None:
+        mask &= zones["Year"].between(year_range[0], year_range[1])
+        expr = _and(expr, (ds.field("Year") >= year_range[0]) & (ds.field("Year") <= year_range[1]))
+    if budget_range[0] is not None:
+        mask &= (zones["BudgetMax"] >= budget_range[0]) & (zones["BudgetMin"] <= budget_range[1])
+        expr = _and(expr, (ds.field("Budget") >= budget_range[0]) & (ds.field("Budget") <= budget_range[1]))
+
+    parts = sorted(zones.loc[mask, "Part"].unique())
+    if not parts:
+        return pd.DataFrame(columns=columns)
+    files = [os.path.join(store["path"], "parts", p) for p in parts]
+    return ds.dataset(files, format="parquet").to_table(columns=columns, filter=expr).to_pandas()
+
+
+# Yields `columns` of every stored row one part at a time, for aggregates
+# that are built per part and merged (memory bounded by the part size)
+def iter_parts(store, columns):
+    for part in store["manifest"]["parts"]:
+        yield pd.read_parquet(os.path.join(store["path"], "parts", part), columns=columns)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the chunked DPWH dataset store.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    ingest = sub.add_parser("ingest", help="Stream a CSV export into a new store.")
+    ingest.add_argument("csv")
+    ingest.add_argument("--out", default="data/store")
+    ingest.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+
+    append = sub.add_parser("append", help="Merge a CSV batch of new projects into a store.")
+    append.add_argument("csv")
+    append.add_argument("--store", default="data/store")
+
+    args = parser.parse_args()
+    if args.command == "ingest":
+        manifest = ingest_csv(
+            args.csv, args.out, args.chunk_rows,
+            progress=lambda rows, secs: print(f"{rows:,} rows ({secs:.1f}s)", flush=True),
+        )
+        print(f"Wrote {manifest['rows']:,} rows to {args.out} (version {manifest['version']}); "
+              f"dropped {manifest['duplicates']:,} duplicate rows")
+    elif args.command == "append":
+        manifest, added, dropped = append_batch(args.store, pd.read_csv(args.csv))
+        print(f"Appended {added:,} new rows, dropped {dropped:,} duplicates; store has {manifest['rows']:,} rows "
+              f"(version {manifest['version']})")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,14 +3,22 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-from sklearn.cluster import KMeans
-from sklearn.preprocessing import StandardScaler
-from sklearn.impute import SimpleImputer
-from sklearn.decomposition import PCA
-import plotly.express as px
-from streamlit import container
-
+# scikit-learn and plotly are imported where they are first used: together
+# they take longer to import than the rest of the app, and the Overview tab
+# is drawn before either is needed.
 from style_manager import inject_global_css
+from cache import resource_cache, shared_cache, unshared_size
+from disk_cache import disk_cached
+from utils import dataset_key, dataset_fingerprint, shared_dataset, load_bundle, parse_dates
+
+# Defaults of the K-Means settings, also what warmup.py precomputes
+DEFAULT_CLUSTERS = 3
+DEFAULT_SCALED = True
+CLUSTER_CACHE_ENTRIES = 64
+
+# Bump when prepare_dataset or run_clustering change their results, so fits
+# persisted by disk_cache.py are recomputed.
+CLUSTER_VERSION = 1
 
 
 # ---------------------------------------------------------
@@ -22,15 +30,20 @@ def safe_to_numeric(series):
 def parse_dates_safe(df, col):
     if col not in df.columns:
         return pd.NaT
-    return pd.to_datetime(df[col], errors="coerce")
+    return parse_dates(df[col])[0]
 
 # ---------------------------------------------------------
 # Load dataset
 # ---------------------------------------------------------
-@st.cache_data
-def load_dataset(path="data/dpwhfloodcontrol.csv"):
-    df = pd.read_csv(path)
+# Built once per process on top of the shared cleaned frame; with
+# copy-on-write only the derived columns take new memory, and only those are
+# accounted.
+@resource_cache("analysis_dataset", 4, lambda df, key: unshared_size(df, shared_dataset(key)))
+def load_dataset(key):
+    return prepare_dataset(shared_dataset(key))
 
+
+def prepare_dataset(df):
     # Remove unnamed index-like columns
     df = df.loc[:, ~df.columns.str.contains("^Unnamed")]
 
@@ -66,8 +79,9 @@ def load_dataset(path="data/dpwhfloodcontrol.csv"):
     df["DurationDays"] = (df["_parsed_end"] - df["_parsed_start"]).dt.days
 
     # Budget metrics
+    # In float64: the difference of two compact float32 amounts loses pesos
     if "Budget" in df.columns and "ContractCost" in df.columns:
-        df["CostDifference"] = df["Budget"] - df["ContractCost"]
+        df["CostDifference"] = df["Budget"].astype("float64") - df["ContractCost"].astype("float64")
         df["PercentSavings"] = np.where(
             (df["Budget"].notna()) & (df["Budget"] != 0),
             (df["CostDifference"] / df["Budget"]) * 100,
@@ -79,6 +93,109 @@ def load_dataset(path="data/dpwhfloodcontrol.csv"):
 
     return df
 
+# ---------------------------------------------------------
+# Clustering and regression (also used by precompute.py)
+# ---------------------------------------------------------
+def run_clustering(df, features, n_clusters, scale_data):
+    from sklearn.cluster import KMeans
+    from sklearn.decomposition import PCA
+    from sklearn.impute import SimpleImputer
+    from sklearn.preprocessing import StandardScaler
+
+    # Fitted in float64 whatever the frame's dtypes (see compact.py)
+    df_num = df[features].astype("float64")
+
+    # Handle NaN
+    imputer = SimpleImputer(strategy="mean")
+    df_num_imputed = pd.DataFrame(imputer.fit_transform(df_num), columns=features)
+
+    # Scale
+    if scale_data:
+        scaler = StandardScaler()
+        X = scaler.fit_transform(df_num_imputed)
+    else:
+        X = df_num_imputed.values
+
+    # K-Means
+    kmeans = KMeans(n_clusters=n_clusters, n_init=20, random_state=42)
+    labels = kmeans.fit_predict(X)
+
+    # PCA for visualization
+    pca = PCA(n_components=2)
+    pca_coords = pca.fit_transform(X)
+
+    return {"labels": labels, "centers": kmeans.cluster_centers_, "pca": pca_coords}
+
+
+def lookup_clustering(features, n_clusters, scale_data):
+    bundle = load_bundle()
+    if bundle is None:
+        return None
+    from precompute import bundle_clustering
+    return bundle_clustering(bundle, features, n_clusters, scale_data)
+
+
+# Fits are shared by every session for the same dataset version and settings,
+# and persisted on disk across restarts, so only the first person to pick a k
+# (or the warm-up, see warmup.py) waits for KMeans. Results are read-only arrays.
+def cached_clustering(key, df, features, n_clusters, scale_data):
+    def compute():
+        result = lookup_clustering(features, n_clusters, scale_data)
+        if result is not None:
+            return result
+        return disk_cached("clustering", CLUSTER_VERSION, dataset_fingerprint(key),
+                           [features, n_clusters, scale_data],
+                           lambda: run_clustering(df, features, n_clusters, scale_data))
+
+    # The default fit every session starts on stays pinned in the cache
+    default = (n_clusters, scale_data) == (DEFAULT_CLUSTERS, DEFAULT_SCALED) and features == numeric_columns(df)
+    cache = shared_cache("clusterings", CLUSTER_CACHE_ENTRIES)
+    return cache.get_or_compute((key, tuple(features), n_clusters, scale_data), compute,
+                                pin=("default", key.partition(":")[0]) if default else None)
+
+
+def numeric_columns(df):
+    return df.select_dtypes(include="number").columns.tolist()
+
+
+REGRESSIONS = [
+    ("Budget", "ContractCost"),
+    ("DurationDays", "ContractCost"),
+    ("Budget", "DurationDays"),
+]
+
+# Values from the original notebook, shown when no artifact bundle is loaded
+REGRESSION_DISPLAY = [
+    ("0.974", "610,409", "0.977"),
+    ("86,178", "34,268,617", "0.086"),
+    ("1.001 × 10⁻⁶", "190.02 days", "0.089"),
+]
+
+
+def fit_regression(df, x, y):
+    data = df[[x, y]].dropna().astype("float64")
+    slope, intercept = np.polyfit(data[x], data[y], 1)
+    r2 = np.corrcoef(data[x], data[y])[0, 1] ** 2
+    return {"x": x, "y": y, "slope": float(slope), "intercept": float(intercept), "r2": float(r2), "n": len(data)}
+
+
+def _superscript(n):
+    return str(n).translate(str.maketrans("-0123456789", "⁻⁰¹²³⁴⁵⁶⁷⁸⁹"))
+
+
+def regression_display():
+    bundle = load_bundle()
+    if bundle is None:
+        return REGRESSION_DISPLAY
+
+    r1, r2, r3 = bundle["regressions"]
+    exponent = int(np.floor(np.log10(abs(r3["slope"])))) if r3["slope"] else 0
+    return [
+        (f"{r1['slope']:.3f}", f"{r1['intercept']:,.0f}", f"{r1['r2']:.3f}"),
+        (f"{r2['slope']:,.0f}", f"{r2['intercept']:,.0f}", f"{r2['r2']:.3f}"),
+        (f"{r3['slope'] / 10 ** exponent:.3f} × 10{_superscript(exponent)}", f"{r3['intercept']:.2f} days", f"{r3['r2']:.3f}"),
+    ]
+
 # ---------------------------------------------------------
 # Main render
 # ---------------------------------------------------------
@@ -86,9 +203,10 @@ def render():
     inject_global_css()
     st.title("K-Means Clustering with PCA Visualization")
 
-    df = load_dataset()
+    key = dataset_key()
+    df = load_dataset(key)
 
-    numeric_cols = df.select_dtypes(include=["int64", "float64"]).columns.tolist()
+    numeric_cols = numeric_columns(df)
 
     if len(numeric_cols) < 2:
         st.error("Dataset does not contain enough numeric features to run K-Means.")
@@ -97,14 +215,22 @@ def render():
     st.write("### Dataset Preview")
     st.dataframe(df, use_container_width=True)
 
+    kmeans_section(key, df, numeric_cols)
+    regression_section()
+
+
+# Reruns on its own when a K-Means widget changes, so moving the k slider
+# does not re-execute the other tabs or the regression section
+@st.fragment
+def kmeans_section(key, df, numeric_cols):
     st.markdown("---")
     st.subheader("⚙️ K-Means Settings")
 
     col1, col2 = st.columns([1, 1])
 
     with col1:
-        n_clusters = st.slider("Number of Clusters (k):", 2, 10, 3)
-        scale_data = st.checkbox("Standardize Data", value=True)
+        n_clusters = st.slider("Number of Clusters (k):", 2, 10, DEFAULT_CLUSTERS)
+        scale_data = st.checkbox("Standardize Data", value=DEFAULT_SCALED)
 
     with col2:
         selected_features = st.multiselect(
@@ -119,37 +245,18 @@ def render():
 
     st.markdown("---")
 
-    # ---------------------------
-    # Data Preparation
-    # ---------------------------
-    df_num = df[selected_features].copy()
-
-    # Handle NaN
-    imputer = SimpleImputer(strategy="mean")
-    df_num_imputed = pd.DataFrame(imputer.fit_transform(df_num), columns=selected_features)
-
-    # Scale
-    if scale_data:
-        scaler = StandardScaler()
-        X = scaler.fit_transform(df_num_imputed)
-    else:
-        X = df_num_imputed.values
-
-    # ---------------------------
-    # K-Means
-    # ---------------------------
-    kmeans = KMeans(n_clusters=n_clusters, n_init=20, random_state=42)
-    df["Cluster"] = kmeans.fit_predict(X)
-
-    # ---------------------------
-    # PCA for visualization
-    # ---------------------------
-    pca = PCA(n_components=2)
-    pca_coords = pca.fit_transform(X)
-
-    df_plot = df.copy()
-    df_plot["PC1"] = pca_coords[:, 0]
-    df_plot["PC2"] = pca_coords[:, 1]
+    # Multiselect order does not change the clustering, so key results on
+    # the dataset's column order (this is also how precompute stores them)
+    selected_features = [c for c in numeric_cols if c in selected_features]
+    result = cached_clustering(key, df, selected_features, n_clusters, scale_data)
+
+    # Labels and PCA coordinates stay in this session's arrays; assign()
+    # shares the dataset's existing columns instead of copying them
+    df_plot = df.assign(
+        Cluster=result["labels"],
+        PC1=result["pca"][:, 0],
+        PC2=result["pca"][:, 1],
+    )
 
     # ---------------------------
     # Output
@@ -159,6 +266,8 @@ def render():
 
     st.write("### 📊 PCA Visualization of Clusters")
 
+    import plotly.express as px
+
     fig = px.scatter(
         df_plot,
         x="PC1",
@@ -171,9 +280,11 @@ def render():
     st.plotly_chart(fig, use_container_width=True)
 
     st.write("### 🎯 Cluster Centroids (Scaled Feature Space)")
-    centroids = pd.DataFrame(kmeans.cluster_centers_, columns=selected_features)
+    centroids = pd.DataFrame(result["centers"], columns=selected_features)
     st.dataframe(centroids, use_container_width=True)
 
+
+def regression_section():
     st.title("Analysis Dashboard")
     st.write(
         "This section presents the regression analyses examining how "
@@ -181,6 +292,7 @@ def render():
     )
 
     st.divider()
+    metrics = regression_display()
 
     # ------------------------------
     # TABS FOR EACH REGRESSION
@@ -204,17 +316,17 @@ def render():
         with c1:
             with st.container(border=True, horizontal_alignment="center"):
                 st.caption("Slope")
-                st.header("0.974")
+                st.header(metrics[0][0])
                 #c1.metric("Slope", "0.974")
         with c2:
             with st.container(border=True, horizontal_alignment="center"):
                 st.caption("Intercept")
-                st.header("610,409")
+                st.header(metrics[0][1])
                 #c2.metric("Intercept", "610,409")
         with c3:
             with st.container(border=True, horizontal_alignment="center"):
                 st.caption("R² Score")
-                st.header("0.977")
+                st.header(metrics[0][2])
                 #c3.metric("R² Score", "0.977")
 
         st.markdown("""
@@ -244,17 +356,17 @@ def render():
         with c1:
             with st.container(border=True, horizontal_alignment="center"):
                 st.caption("Slope")
-                st.header("86,178")
+                st.header(metrics[1][0])
             # c1.metric("Slope", "86,178")
         with c2:
             with st.container(border=True, horizontal_alignment="center"):
                 st.caption("Intercept")
-                st.header("34,268,617")
+                st.header(metrics[1][1])
                 #c2.metric("Intercept", "34,268,617")
         with c3:
             with st.container(border=True, horizontal_alignment="center"):
                 st.caption("R² Score")
-                st.header("0.086")
+                st.header(metrics[1][2])
 
                 #c3.metric("R² Score", "0.086")
 
@@ -285,17 +397,17 @@ def render():
         with c1:
             with st.container(border=True, horizontal_alignment="center"):
                 st.caption("Slope")
-                st.header("1.001 × 10⁻⁶")
+                st.header(metrics[2][0])
                 #c1.metric("Slope", "1.001 × 10⁻⁶")
         with c2:
             with st.container(border=True, horizontal_alignment="center"):
                 st.caption("Intercept")
-                st.header("190.02 days")
+                st.header(metrics[2][1])
                 #c2.metric("Intercept", "190.02 days")
         with c3:
             with st.container(border=True, horizontal_alignment="center"):
                 st.caption("R² Score")
-                st.header("0.089")
+                st.header(metrics[2][2])
                 #c3.metric("R² Score", "0.089")
 
         st.markdown("""
@@ -1,8 +1,12 @@
 # tab_dataexploration.py
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-from utils import load_dataset
+from cache import shared_cache, cached_figure
+from utils import load_dataset, load_store, dataset_key, filter_form
+from store import CUBE_KEYS, build_cube, filter_cube, scan_rows, column_summary, cell_version
+
+# plotly.express is imported inside the figure builders: it only loads when
+# the first chart is built, not when the app starts
 
 # def load_dataset():
 #     df = pd.read_csv("data/dpwhfloodcontrol.csv")
@@ -38,46 +42,242 @@ from utils import load_dataset
 #     return df
 
 
-# Filter dataset (inside tab)
-def filter_dataset(df):
+VIEW_CACHE_ENTRIES = 128
+
+# The unfiltered selection every session starts on
+DEFAULT_FILTER = ("All", "all", "all")
+
+
+# ---------------------------------------------------------
+# Filter state
+# ---------------------------------------------------------
+# A filter is normalized to (region, years, budget) strings, e.g.
+# ("Region III", "2022-2024", "all"). The same tuple is written to the URL
+# query parameters, so a view can be shared as a link, and keys the
+# cross-session view cache, so a popular view is computed once per dataset
+# version no matter who asks for it.
+def normalize_filter(region, year_range, budget_range, year_bounds, budget_bounds):
+    if year_bounds is None or tuple(year_range) == tuple(year_bounds):
+        years = "all"
+    else:
+        years = f"{int(year_range[0])}-{int(year_range[1])}"
+    if budget_bounds is None or tuple(budget_range) == tuple(budget_bounds):
+        budget = "all"
+    else:
+        budget = f"{round(budget_range[0])}-{round(budget_range[1])}"
+    return region, years, budget
+
+
+def _clamp(value_range, bounds):
+    low = min(max(value_range[0], bounds[0]), bounds[1])
+    return low, min(max(value_range[1], low), bounds[1])
+
+
+def _parse_range(text, bounds, cast):
+    try:
+        low, high = (cast(x) for x in text.split("-", 1))
+    except (AttributeError, ValueError):
+        return tuple(bounds)
+    return _clamp((low, high), bounds)
+
+
+def resolve_filter(state, year_bounds, budget_bounds):
+    region, years, budget = state
+    year_range = (None, None) if year_bounds is None else _parse_range(years, year_bounds, int)
+    budget_range = (None, None) if budget_bounds is None else _parse_range(budget, budget_bounds, float)
+    return region, year_range, budget_range
+
+
+def sync_query_params(state):
+    region, years, budget = state
+    params = {"region": region, "years": years, "budget": budget}
+    defaults = dict(zip(params, DEFAULT_FILTER))
+    for name, value in params.items():
+        if value == defaults[name]:
+            if name in st.query_params:
+                del st.query_params[name]
+        elif st.query_params.get(name) != value:
+            st.query_params[name] = value
+
+
+# Seeds the keyed filter widgets from the URL on a session's first run and
+# keeps them inside the current dataset's bounds afterwards.
+def init_filter_widgets(regions, year_bounds, budget_bounds):
+    state = st.session_state
+    if "explore_region" not in state:
+        url_state = tuple(
+            st.query_params.get(name, default)
+            for name, default in zip(("region", "years", "budget"), DEFAULT_FILTER)
+        )
+        region, year_range, budget_range = resolve_filter(url_state, year_bounds, budget_bounds)
+        state["explore_region"] = region
+        state["explore_years"] = year_range
+        state["explore_budget"] = budget_range
+
+    if state["explore_region"] not in regions:
+        state["explore_region"] = "All"
+    for name, bounds in (("explore_years", year_bounds), ("explore_budget", budget_bounds)):
+        if bounds is not None:
+            value = state[name]
+            state[name] = tuple(bounds) if None in value else _clamp(value, bounds)
+
+
+# Filter widgets (shared by the in-memory and store modes)
+def filter_controls(regions, year_bounds, budget_bounds):
     st.subheader("Budget Allocation")
-    
+
+    with filter_form("exploration_filters"):
+        return filter_widgets(regions, year_bounds, budget_bounds)
+
+
+def filter_widgets(regions, year_bounds, budget_bounds):
     # Region filter
-    regions = ["All"] + sorted(df["Region"].dropna().unique().tolist())
-    selected_region = st.selectbox("Select Region:", regions)
+    regions = ["All"] + sorted(regions)
+    init_filter_widgets(regions, year_bounds, budget_bounds)
+    selected_region = st.selectbox("Select Region:", regions, key="explore_region")
     
     # Year range filter
-    if "Year" in df.columns:
-        min_year = int(df["Year"].min())
-        max_year = int(df["Year"].max())
+    if year_bounds is not None:
+        min_year, max_year = year_bounds
         year_range = st.slider("Select Funding Year Range:",
                                min_value=min_year,
                                max_value=max_year,
-                               value=(min_year, max_year))
+                               key="explore_years")
     else:
         year_range = (None, None)
     
     # Budget filter
-    if "Budget" in df.columns:
-        min_budget = float(df["Budget"].min())
-        max_budget = float(df["Budget"].max())
+    if budget_bounds is not None:
+        min_budget, max_budget = budget_bounds
         budget_range = st.slider("Select Budget Range:",
                                  min_value=min_budget,
                                  max_value=max_budget,
-                                 value=(min_budget, max_budget))
+                                 key="explore_budget")
     else:
         budget_range = (None, None)
-    
-    # Apply filters
-    df_filtered = df.copy()
+
+    return selected_region, year_range, budget_range
+
+
+def filter_bounds(df):
+    regions = df["Region"].dropna().unique().tolist()
+    year_bounds = (int(df["Year"].min()), int(df["Year"].max())) if "Year" in df.columns else None
+    budget_bounds = (float(df["Budget"].min()), float(df["Budget"].max())) if "Budget" in df.columns else None
+    return regions, year_bounds, budget_bounds
+
+
+# Filter dataset (inside tab)
+def filter_dataset(df):
+    selected_region, year_range, budget_range = filter_controls(*filter_bounds(df))
+    return apply_filters(df, selected_region, year_range, budget_range)
+
+
+def filter_mask(df, selected_region, year_range, budget_range):
+    mask = pd.Series(True, index=df.index)
     if year_range[0] is not None:
-        df_filtered = df_filtered[(df_filtered["Year"] >= year_range[0]) & (df_filtered["Year"] <= year_range[1])]
+        mask &= (df["Year"] >= year_range[0]) & (df["Year"] <= year_range[1])
     if budget_range[0] is not None:
-        df_filtered = df_filtered[(df_filtered["Budget"] >= budget_range[0]) & (df_filtered["Budget"] <= budget_range[1])]
+        mask &= (df["Budget"] >= budget_range[0]) & (df["Budget"] <= budget_range[1])
     if selected_region != "All":
-        df_filtered = df_filtered[df_filtered["Region"] == selected_region]
-    
-    return df_filtered
+        mask &= df["Region"] == selected_region
+    return mask
+
+
+def apply_filters(df, selected_region, year_range, budget_range):
+    # Apply filters as one mask over the shared dataset: a single row
+    # selection, and no copy at all when nothing is filtered out
+    mask = filter_mask(df, selected_region, year_range, budget_range)
+    return df if mask.all() else df[mask]
+
+
+# ---------------------------------------------------------
+# Cached filter results
+# ---------------------------------------------------------
+# A view is what the charts need for one filter: the filtered Region x Year
+# cube, a few KB however many rows match. The key it was cached under also
+# keys the view's figures in the figure cache.
+def build_view(cube):
+    return {"cube": cube}
+
+
+def cached_view(cache_key, compute):
+    # The unfiltered view every session starts on stays pinned in the cache
+    pin = default_slot(cache_key) if is_default_view(cache_key) else None
+    view = shared_cache("exploration_views", VIEW_CACHE_ENTRIES).get_or_compute(cache_key, compute, pin=pin)
+    return dict(view, key=cache_key)
+
+
+def is_default_view(cache_key):
+    return tuple(cache_key[-3:]) == DEFAULT_FILTER
+
+
+# One pinned default per data source, so an upload does not unpin the
+# server dataset's default view (or the other way around)
+def default_slot(cache_key, name="default"):
+    return name, str(cache_key[0]).partition(":")[0]
+
+
+def filtered_view(df, key, state, bounds):
+    def compute():
+        selected_region, year_range, budget_range = resolve_filter(state, *bounds)
+        mask = filter_mask(df, selected_region, year_range, budget_range)
+        return build_view(build_cube(df[mask]))
+
+    return cached_view((key,) + state, compute)
+
+
+# Store mode: the same filters answered from the aggregate cube. Only a
+# narrowed budget range needs row data, and then just three columns of the
+# matching rows are scanned from disk.
+def store_bounds(store):
+    cube = store["cube"]
+    budget = store["stats"]["Budget"]
+    regions = cube["Region"].dropna().unique().tolist()
+    year_bounds = (int(cube["Year"].min()), int(cube["Year"].max()))
+    budget_bounds = (float(budget["min"]), float(budget["max"]))
+    return regions, year_bounds, budget_bounds
+
+
+def filter_store(store):
+    regions, year_bounds, budget_bounds = store_bounds(store)
+    selected_region, year_range, budget_range = filter_controls(regions, year_bounds, budget_bounds)
+    state = normalize_filter(selected_region, year_range, budget_range, year_bounds, budget_bounds)
+    sync_query_params(state)
+    return store_view(store, state, (year_bounds, budget_bounds))
+
+
+def store_view(store, state, bounds):
+    cube = store["cube"]
+    selected_region, year_range, budget_range = resolve_filter(state, *bounds)
+
+    def compute():
+        if state[2] == "all":
+            return build_view(filter_cube(cube, selected_region, year_range))
+        rows = scan_rows(store, CUBE_KEYS + ["Budget"], selected_region, year_range, budget_range)
+        rows["ContractCost"] = 0.0
+        rows["DurationDays"] = float("nan")
+        return build_view(build_cube(rows))
+
+    # Keyed on the versions of the cells the filter covers, so an appended
+    # batch only invalidates the views whose Region x Year cells it touched.
+    return cached_view(("store", cell_version(store, selected_region, year_range)) + state, compute)
+
+
+# The default view and its figures, as a first visit renders them (used by
+# warmup.py to fill the caches ahead of time)
+def default_view(key, df, store=None):
+    if store is not None:
+        return store_view(store, DEFAULT_FILTER, store_bounds(store)[1:])
+    return filtered_view(df, key, DEFAULT_FILTER, filter_bounds(df)[1:])
+
+
+def default_figures(view):
+    return [
+        view_figure(view, "budget_per_region", budget_per_region_figure),
+        view_figure(view, "budget_per_year", budget_per_year_figure),
+        view_figure(view, "projects_per_year", projects_per_year_figure),
+        view_figure(view, "projects_per_region", projects_per_region_figure, extra=("All",)),
+    ]
 
 
 # Key Statistics
@@ -94,9 +294,31 @@ def display_key_statistics(df):
         st.error("Dataset must contain 'ApprovedBudgetForContract' and 'ContractCost' columns.")
         return
 
-    #Convert to numeric (handles TypeError from strings) 
-    df[budget_col] = pd.to_numeric(df[budget_col], errors="coerce")
-    df[cost_col] = pd.to_numeric(df[cost_col], errors="coerce")
+    #Convert to numeric (handles TypeError from strings); df is the shared
+    #dataset, so convert into new series rather than assigning back
+    budget = pd.to_numeric(df[budget_col], errors="coerce").astype("float64")
+    cost = pd.to_numeric(df[cost_col], errors="coerce").astype("float64")
+
+    render_statistics_table(summarize_column(budget), summarize_column(cost))
+
+
+def summarize_column(series):
+    return {
+        "mean": series.mean(),
+        "mode": series.mode().iloc[0],
+        "std": series.std(),
+        "var": series.var(),
+        "min": series.min(),
+        "max": series.max(),
+        "q1": series.quantile(0.25),
+        "median": series.median(),
+        "q3": series.quantile(0.75),
+    }
+
+
+def render_statistics_table(budget, cost):
+    budget_col = "Budget"
+    cost_col = "ContractCost"
 
     # Helper for peso formatting
     def peso(x):
@@ -120,28 +342,28 @@ def display_key_statistics(df):
             "75th Percentile (Q3)"
         ],
         budget_col: [
-            peso(df[budget_col].mean()),
-            peso(df[budget_col].mode().iloc[0]),
-            peso(df[budget_col].std()),
-            f"{df[budget_col].var():.2e}",
-            peso(df[budget_col].min()),
-            peso(df[budget_col].max()),
-            peso(df[budget_col].max() - df[budget_col].min()),
-            peso(df[budget_col].quantile(0.25)),
-            peso(df[budget_col].median()),
-            peso(df[budget_col].quantile(0.75)),
+            peso(budget["mean"]),
+            peso(budget["mode"]),
+            peso(budget["std"]),
+            f"{budget['var']:.2e}",
+            peso(budget["min"]),
+            peso(budget["max"]),
+            peso(budget["max"] - budget["min"]),
+            peso(budget["q1"]),
+            peso(budget["median"]),
+            peso(budget["q3"]),
         ],
         cost_col: [
-            peso(df[cost_col].mean()),
-            peso(df[cost_col].mode().iloc[0]),
-            peso(df[cost_col].std()),
-            f"{df[cost_col].var():.2e}",
-            peso(df[cost_col].min()),
-            peso(df[cost_col].max()),
-            peso(df[cost_col].max() - df[cost_col].min()),
-            peso(df[cost_col].quantile(0.25)),
-            peso(df[cost_col].median()),
-            peso(df[cost_col].quantile(0.75)),
+            peso(cost["mean"]),
+            peso(cost["mode"]),
+            peso(cost["std"]),
+            f"{cost['var']:.2e}",
+            peso(cost["min"]),
+            peso(cost["max"]),
+            peso(cost["max"] - cost["min"]),
+            peso(cost["q1"]),
+            peso(cost["median"]),
+            peso(cost["q3"]),
         ],
         "Interpretation": [
             "On average, contract costs are slightly lower than the approved budgets, indicating cost savings.",
@@ -206,54 +428,80 @@ def heatmap_boxplot_histogram(df):
         st.image("res/histogram.png", use_container_width=True)
 
 
-# Visualizations
-def plot_budget_per_region(df):
-    if "Budget" in df.columns and "Region" in df.columns:
-        st.subheader("Budget Allocation per Region")
-        fig = px.bar(df.groupby("Region")["Budget"].sum().reset_index(),
-                     x="Region", y="Budget",
-                     title="Total Budget per Region",
-                     text_auto=True)
-        st.plotly_chart(fig, use_container_width=True)
-
-def plot_budget_per_year(df):
-    if "Budget" in df.columns and "Year" in df.columns:
-        st.subheader("Budget Allocation per Year")
-        fig = px.bar(df.groupby("Year")["Budget"].sum().reset_index(),
-                     x="Year", y="Budget",
-                     title="Total Budget per Funding Year",
-                     text_auto=True)
-        st.plotly_chart(fig, use_container_width=True)
-
-def plot_projects_per_year(df):
-    if "Year" in df.columns:
-        st.subheader("Number of Projects per Year")
-        fig = px.bar(df.groupby("Year").size().reset_index(name="Projects"),
-                     x="Year", y="Projects",
-                     title="Projects per Funding Year",
-                     text_auto=True)
-        st.plotly_chart(fig, use_container_width=True)
-
-def interactive_projects_per_region(df):
-    if "Region" in df.columns and "Year" in df.columns:
-        st.subheader("Projects per Region")
-        regions = ["All"] + sorted(df["Region"].dropna().unique().tolist())
-        selected_region = st.selectbox("Select Region for Detailed View:", regions)
-        
-        if selected_region != "All":
-            df_region = df[df["Region"] == selected_region]
-        else:
-            df_region = df
-
-        fig = px.bar(df_region.groupby("Year").size().reset_index(name="Projects"),
-                     x="Year", y="Projects",
-                     title=f"Projects in {selected_region}" if selected_region != "All" else "Projects by Year",
-                     text_auto=True)
-        st.plotly_chart(fig, use_container_width=True)
+# Visualizations (all built from a Region x Year cube, see store.build_cube)
+def budget_per_region_figure(cube):
+    import plotly.express as px
+    return px.bar(cube.groupby("Region")["Budget"].sum().reset_index(),
+                  x="Region", y="Budget",
+                  title="Total Budget per Region",
+                  text_auto=True)
+
+def budget_per_year_figure(cube):
+    import plotly.express as px
+    return px.bar(cube.groupby("Year")["Budget"].sum().reset_index(),
+                  x="Year", y="Budget",
+                  title="Total Budget per Funding Year",
+                  text_auto=True)
+
+def projects_per_year_figure(cube):
+    import plotly.express as px
+    return px.bar(cube.groupby("Year")["Projects"].sum().reset_index(),
+                  x="Year", y="Projects",
+                  title="Projects per Funding Year",
+                  text_auto=True)
+
+def projects_per_region_figure(cube, selected_region="All"):
+    import plotly.express as px
+    if selected_region != "All":
+        cube_region = cube[cube["Region"] == selected_region]
+    else:
+        cube_region = cube
+
+    return px.bar(cube_region.groupby("Year")["Projects"].sum().reset_index(),
+                  x="Year", y="Projects",
+                  title=f"Projects in {selected_region}" if selected_region != "All" else "Projects by Year",
+                  text_auto=True)
+
+def view_figure(view, chart_id, build, extra=()):
+    data_version, filter_key = view["key"][0], view["key"][1:] + tuple(extra)
+    default = is_default_view(view["key"]) and all(value == "All" for value in extra)
+    return cached_figure(chart_id, data_version, filter_key, lambda: build(view["cube"]),
+                         pin=default_slot(view["key"], chart_id) if default else None)
+
+def plot_budget_per_region(view):
+    st.subheader("Budget Allocation per Region")
+    fig = view_figure(view, "budget_per_region", budget_per_region_figure)
+    st.plotly_chart(fig, use_container_width=True)
+
+def plot_budget_per_year(view):
+    st.subheader("Budget Allocation per Year")
+    fig = view_figure(view, "budget_per_year", budget_per_year_figure)
+    st.plotly_chart(fig, use_container_width=True)
+
+def plot_projects_per_year(view):
+    st.subheader("Number of Projects per Year")
+    fig = view_figure(view, "projects_per_year", projects_per_year_figure)
+    st.plotly_chart(fig, use_container_width=True)
+
+def interactive_projects_per_region(view):
+    cube = view["cube"]
+    st.subheader("Projects per Region")
+    regions = ["All"] + sorted(cube["Region"].dropna().unique().tolist())
+    selected_region = st.selectbox("Select Region for Detailed View:", regions)
+
+    fig = view_figure(view, "projects_per_region",
+                      lambda cube: projects_per_region_figure(cube, selected_region),
+                      extra=(selected_region,))
+    st.plotly_chart(fig, use_container_width=True)
 
 # kulang pa ng overlapping projects per region per year visualization
 
 def render():
+    store = load_store()
+    if store is not None:
+        render_store(store)
+        return
+
     df = load_dataset()
     
     # Display stats and charts
@@ -263,8 +511,42 @@ def render():
     heatmap_boxplot_histogram(df)
 
      # Filter inside the tab
-    df_filtered = filter_dataset(df)
-    plot_budget_per_region(df_filtered)
-    plot_budget_per_year(df_filtered)
-    plot_projects_per_year(df_filtered)
-    interactive_projects_per_region(df_filtered)
+    filter_and_charts(df)
+
+
+# The filter widgets and the charts they drive rerun as one fragment, so a
+# slider drag only re-executes this block, not the whole app
+@st.fragment
+def filter_and_charts(df):
+    bounds = filter_bounds(df)
+    selected_region, year_range, budget_range = filter_controls(*bounds)
+    state = normalize_filter(selected_region, year_range, budget_range, *bounds[1:])
+    sync_query_params(state)
+    render_charts(filtered_view(df, dataset_key(), state, bounds[1:]))
+
+
+@st.fragment
+def filter_and_charts_store(store):
+    render_charts(filter_store(store))
+
+
+def render_charts(view):
+    cube = view["cube"]
+    st.caption(f"{int(cube['Projects'].sum()):,} projects · "
+               f"₱{cube['Budget'].sum():,.2f} total budget in this selection")
+    plot_budget_per_region(view)
+    plot_budget_per_year(view)
+    plot_projects_per_year(view)
+    interactive_projects_per_region(view)
+
+
+def render_store(store):
+    st.subheader("Key Statistics")
+    stats = store["stats"]
+    render_statistics_table(column_summary(stats, "Budget"), column_summary(stats, "ContractCost"))
+    st.caption(f"Computed over {store['manifest']['rows']:,} rows from the dataset store; "
+               "percentiles are approximate to one histogram bin.")
+
+    heatmap_boxplot_histogram(None)
+
+    filter_and_charts_store(store)
@@ -1,6 +1,10 @@
+import numpy as np
 import streamlit as st
-import plotly.express as px
-from utils import load_dataset
+from utils import load_dataset, load_bundle, dataset_key, shared_cube
+from cache import cached_figure
+from leaderboard import (HHI_HIGH, HHI_MODERATE, METRICS, TOP_CONTRACTORS, concentration_heatmap,
+                         concentration_level, concentration_regions, concentration_summary, top_contractors)
+from quantiles import PERCENTILES, SKETCH_K, group_percentiles
 from style_manager import *
 
 
@@ -153,6 +157,91 @@ def interactive_cluster_profile():
         st.markdown(markdown_output)
 
         st.markdown("</div>", unsafe_allow_html=True)
+# Figure builders; render code goes through cached_figure so each one runs
+# once per dataset version. plotly.express is imported inside them so it
+# loads with the first chart, not when the app starts.
+def cost_histogram_figure(df):
+    import plotly.express as px
+    bundle = load_bundle()
+    if bundle is not None:
+        # Precomputed bins over every row, see precompute.py
+        bins = bundle["histograms"]["ContractCost"]
+        edges = bins["edges"]
+        fig_hist = px.bar(
+            x=[(lo + hi) / 2 for lo, hi in zip(edges[:-1], edges[1:])],
+            y=bins["counts"],
+            title="Project Contract Cost Distribution",
+            log_y=True,
+            labels={'x': 'Contract Cost (Log Scale)', 'y': 'count'}
+        )
+        fig_hist.update_traces(width=edges[1] - edges[0])
+        return fig_hist
+
+    return px.histogram(
+        df[df['ContractCost'].notna()],
+        x="ContractCost",
+        nbins=50,
+        title="Project Contract Cost Distribution",
+        log_y=True,
+        labels={'ContractCost': 'Contract Cost (Log Scale)'}
+    )
+
+def regional_trend_figure(df):
+    import plotly.express as px
+    df_regional_budget = df.astype({'Budget': 'float64'}).groupby(['Year', 'Region'])['Budget'].sum().reset_index()
+
+    return px.bar(
+        df_regional_budget,
+        x='Year',
+        y='Budget',
+        title="Approved Budget vs Contract Cost (Tight Alignment)",
+        log_x=True,
+        log_y=True,
+        template="plotly_dark"
+    )
+
+def cost_alignment_figure(df):
+    import plotly.express as px
+    return px.scatter(
+        df,
+        x='Budget',
+        y='ContractCost',
+        title="Approved Budget vs Contract Cost (Tight Alignment)",
+        log_x=True,
+        log_y=True,
+        template="plotly_dark"
+    )
+
+def cost_duration_figure(df):
+    import plotly.express as px
+    fig_scatter = px.scatter(
+        df[df['ContractCost'] < df['ContractCost'].quantile(0.95)],
+        y='ContractCost',
+        x='DurationDays',
+        log_y=True,
+        title="Cost vs Duration: Weak Correlation (r = 0.22)",
+        labels={
+            'DurationDays': 'Project Duration(Days)',
+            'ContractCost': 'Contract Cost (Log Scale)',
+        }
+    )
+    fig_scatter.update_layout(template="plotly_dark", height=450)
+    return fig_scatter
+
+# chart id -> (builder, Streamlit theme) for every Insights figure; warmup.py
+# builds them all before the first visit
+INSIGHT_FIGURES = {
+    "cost_histogram": (cost_histogram_figure, "streamlit"),
+    "regional_trend": (regional_trend_figure, "plotly_dark"),
+    "cost_alignment": (cost_alignment_figure, "plotly_dark"),
+    "cost_duration": (cost_duration_figure, "plotly_dark"),
+}
+
+def insight_figure(chart_id, df, version):
+    build, theme = INSIGHT_FIGURES[chart_id]
+    return cached_figure(chart_id, version, "all", lambda: build(df), theme=theme,
+                         pin=(chart_id, version.partition(":")[0]))
+
 def format_peso_billions(value):
     try:
        return f"₱{value / 1_000_000_000:,.2f} B"
@@ -161,15 +250,16 @@ def format_peso_billions(value):
 #endregion
 
 
-def key_insights(df):
+def key_insights(df, cube, version):
     st.header("Key Findings and Summary")
 
-    # Data Preparation and Metrics
-    total_cost = df['ContractCost'].sum()
-    total_project = len(df)
+    # Data Preparation and Metrics (totals come from the Region x Year cube so
+    # they stay exact in store mode, where df is only a row sample)
+    total_cost = cube['ContractCost'].sum()
+    total_project = int(cube['Projects'].sum())
 
-    if "Year" in df.columns and "Budget" in df.columns:
-        budget_year = df.groupby("Year")["Budget"].sum().reset_index()
+    if "Year" in cube.columns and "Budget" in cube.columns:
+        budget_year = cube.groupby("Year")["Budget"].sum().reset_index()
         peak_budget = budget_year["Budget"].max()
         peak_year = budget_year.loc[budget_year["Budget"].idxmax(), "Year"]
     else:
@@ -207,14 +297,7 @@ def key_insights(df):
     col_hist, col_text = st.columns([2,1])
     with col_hist:
         with st.container(border=True, horizontal_alignment="center"):
-            fig_hist = px.histogram(
-                df[df['ContractCost'].notna()],
-                x="ContractCost",
-                nbins=50,
-                title="Project Contract Cost Distribution",
-                log_y=True,
-                labels={'ContractCost': 'Contract Cost (Log Scale)'}
-            )
+            fig_hist = insight_figure("cost_histogram", df, version)
             st.plotly_chart(fig_hist)
     with col_text:
         with st.container(horizontal_alignment="center"):
@@ -229,10 +312,56 @@ def key_insights(df):
                 """
             ,unsafe_allow_html=True)
     st.divider()
-    # Should I Add A Concentration of Contracts???
     st.subheader("Concentration of Contracts")
-
-def pattern_trends(df):
+    concentration_of_contracts(version)
+
+
+def concentration_figure(table, metric):
+    import plotly.express as px
+    return px.imshow(
+        table,
+        text_auto=".0f",
+        aspect="auto",
+        color_continuous_scale="Reds",
+        labels={"x": "Year", "y": "Region", "color": "HHI"},
+        title=f"Contract Concentration (HHI) by {METRICS[metric].lower()}",
+    )
+
+
+# Region and ranking changes rerun only this section
+@st.fragment
+def concentration_of_contracts(version):
+    col_controls, col_board = st.columns([1, 2])
+    with col_controls:
+        with st.container(border=True):
+            regions = ["All"] + concentration_regions(version)
+            region = st.selectbox("Region:", regions, key="concentration_region")
+            metric = st.radio("Rank contractors by:", list(METRICS), format_func=METRICS.get,
+                              key="concentration_metric")
+            index, contractors, approximate = concentration_summary(version, metric, region)
+            st.metric("Concentration (HHI)", f"{index:,.0f}" if not np.isnan(index) else "N/A")
+            st.caption(f"{concentration_level(index).capitalize()} across {'about ' if approximate else ''}"
+                       f"{contractors:,} contractors. "
+                       f"HHI is the sum of squared market shares (0-10,000); above {HHI_MODERATE:,} is "
+                       f"moderately and above {HHI_HIGH:,} highly concentrated.")
+    with col_board:
+        board = top_contractors(version, metric, region)
+        board["ContractCost"] = board["ContractCost"].map(lambda cost: f"₱{cost:,.0f}")
+        st.dataframe(board, use_container_width=True, column_config={
+            "ContractCost": "Contract Cost",
+            "Share": st.column_config.ProgressColumn(f"Share of {METRICS[metric].lower()}",
+                                                     format="percent", min_value=0, max_value=1),
+        })
+        st.caption(f"Top {TOP_CONTRACTORS} contractors{'' if region == 'All' else ' in ' + region}. Name "
+                   "variants of one firm count together; joint ventures count as their own contractor."
+                   + (" Estimated from streaming sketches of the full export." if approximate else ""))
+
+    fig = cached_figure("contract_concentration", version, metric,
+                        lambda: concentration_figure(concentration_heatmap(version, metric), metric))
+    st.plotly_chart(fig, use_container_width=True)
+
+
+def pattern_trends(df, version):
     if df.empty:
         st.warning("No data found")
         return
@@ -242,17 +371,7 @@ def pattern_trends(df):
 
     with col_chart:
         with st.container(horizontal_alignment="center"):
-            df_regional_budget = df.groupby(['Year', 'Region'])['Budget'].sum().reset_index()
-
-            fig_trend = px.bar(
-                df_regional_budget,
-                x='Year',
-                y='Budget',
-                title="Approved Budget vs Contract Cost (Tight Alignment)",
-                log_x=True,
-                log_y=True,
-                template="plotly_dark"
-            )
+            fig_trend = insight_figure("regional_trend", df, version)
             st.plotly_chart(fig_trend, use_container_width=True)
     with col_text:
         with st.container(horizontal_alignment="center"):
@@ -266,8 +385,38 @@ def pattern_trends(df):
                 </div>
             """,unsafe_allow_html=True)
 
+    st.subheader("Project Durations and Costs by Group")
+    group_percentiles_section(version)
 
-def anomalies(df):
+
+PERCENTILE_GROUPS = {"Region": "Region", "TypeOfWork": "Type of work", "Contractor": "Contractor"}
+PERCENTILE_COLUMNS = {"DurationDays": "Duration (days)", "ContractCost": "Contract cost"}
+
+
+# Median and p90 per group, from the mergeable sketches in quantiles.py
+@st.fragment
+def group_percentiles_section(version):
+    col_by, col_column = st.columns(2)
+    with col_by:
+        by = st.radio("Group by:", list(PERCENTILE_GROUPS), format_func=PERCENTILE_GROUPS.get,
+                      horizontal=True, key="percentile_group")
+    with col_column:
+        column = st.radio("Measure:", list(PERCENTILE_COLUMNS), format_func=PERCENTILE_COLUMNS.get,
+                          horizontal=True, key="percentile_column")
+
+    table = group_percentiles(version, column, by).sort_values("P90", ascending=False)
+    if column == "ContractCost":
+        for name in PERCENTILES:
+            table[name] = table[name].map(lambda cost: f"₱{cost:,.0f}")
+    st.dataframe(table, use_container_width=True, height=360, column_config={
+        "Projects": st.column_config.NumberColumn("Projects", format="localized"),
+    })
+    st.caption(f"Highest 90th percentile first. Groups of up to {SKETCH_K} projects are exact; "
+               f"larger ones come from quantile sketches and are within about 1% of the rows of the exact "
+               f"percentile. Contractor name variants count together.")
+
+
+def anomalies(df, version):
     st.divider()
     if df.empty:
         st.warning("No data found")
@@ -293,15 +442,7 @@ def anomalies(df):
             """,unsafe_allow_html=True)
     with col_chart:
         with st.container(horizontal_alignment="center"):
-            fig_cost_align = px.scatter(
-                df,
-                x='Budget',
-                y='ContractCost',
-                title="Approved Budget vs Contract Cost (Tight Alignment)",
-                log_x=True,
-                log_y=True,
-                template="plotly_dark"
-            )
+            fig_cost_align = insight_figure("cost_alignment", df, version)
             st.plotly_chart(fig_cost_align, use_container_width=True)
     st.divider()
     st.subheader("Financial Disconnect: The Oversight Paradox")
@@ -309,18 +450,7 @@ def anomalies(df):
     col_plot, col_text = st.columns([2, 1])
     with col_plot:
         with st.container(horizontal_alignment="center"):
-            fig_scatter = px.scatter(
-                df[df['ContractCost'] < df['ContractCost'].quantile(0.95)],
-                y='ContractCost',
-                x='DurationDays',
-                log_y=True,
-                title="Cost vs Duration: Weak Correlation (r = 0.22)",
-                labels={
-                    'DurationDays': 'Project Duration(Days)',
-                    'ContractCost': 'Contract Cost (Log Scale)',
-                }
-            )
-            fig_scatter.update_layout(template="plotly_dark", height=450)
+            fig_scatter = insight_figure("cost_duration", df, version)
             st.plotly_chart(fig_scatter, use_container_width=True)
     with col_text:
         with st.container(horizontal_alignment="center"):
@@ -631,9 +761,11 @@ def render():
     st.title("Insights")
     st.divider()
     df = load_dataset()
-    key_insights(df)
-    pattern_trends(df)
-    anomalies(df)
+    version = dataset_key()
+    cube = shared_cube(version)
+    key_insights(df, cube, version)
+    pattern_trends(df, version)
+    anomalies(df, version)
     analysis_clustering()
     value_technique()
     limitations()
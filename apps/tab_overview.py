@@ -1,7 +1,10 @@
 # tab_overview.py
 import streamlit as st
+import numpy as np
 import pandas as pd
-from utils import load_dataset
+from utils import load_dataset, load_quality, load_store, shared_dataset, dataset_key, filter_form
+from entities import contractor_entities
+from search import project_search, value_picker
 from style_manager import inject_global_css
 
 def display_title_and_overview():
@@ -35,32 +38,79 @@ def display_title_and_overview():
 #     #     return None
     
 def display_dataset_info(df):
-    # Remove unnamed columns
-    df_clean = df.loc[:, ~df.columns.str.startswith("Unnamed")]
-
-    for col in ["Budget", "ContractCost"]:
-        if col in df_clean.columns:
-            # Strip whitespace and replace weird placeholders
-            df_clean[col] = df_clean[col].apply(lambda x: str(x).strip() if pd.notnull(x) else "0")
-            df_clean[col].replace({"": "0", " ": "0", "  ": "0", "—": "0", "-": "0", "N/A": "0", "NA": "0", "None": "0", "null": "0"}, inplace=True)
-            # Convert to numeric and fill any remaining NaN with 0
-            df_clean[col] = pd.to_numeric(df_clean[col], errors="coerce").fillna(0)
+    # Counts come from the quality profile built when the dataset was loaded
+    # (utils.quality_profile); nothing here rescans the frame.
+    quality = load_quality()
 
-    st.write(f"*Rows:* {df_clean.shape[0]} | *Columns:* {df_clean.shape[1]}")
+    store = load_store()
+    if store is not None:
+        st.write(f"*Rows:* {store['manifest']['rows']} | *Columns:* {df.shape[1]}")
+        st.caption(f"Tables below show a uniform sample of {df.shape[0]:,} rows from the dataset store.")
+    else:
+        st.write(f"*Rows:* {df.shape[0]} | *Columns:* {df.shape[1]}")
 
     with st.expander("Show Detailed Dataset Information", expanded=False):
-        # st.write("### Data Summary")
-        # st.write(df_clean.describe(include="all"))
-
-        # st.write("### Numeric Summary")
-        # st.write(df_clean.describe())
-
-        st.write("### Missing Values")
-
-        st.write(df_clean.isnull().sum())
+        st.write("### Data Quality")
+        if quality is None:
+            st.caption("This dataset store was built without a data-quality profile; re-ingest it to add one.")
+        else:
+            st.write(quality_table(quality))
+            st.caption(f"Over {quality['rows']:,} rows. *Failed to convert*: values in the file that are "
+                       "not a valid number or MM/DD/YYYY date; they are left missing. *Out of range*: "
+                       "negative amounts or durations and implausible years. No rows are dropped.")
+
+            examples = {col: ", ".join(entry["examples"])
+                        for col, entry in quality["columns"].items() if entry["examples"]}
+            if examples:
+                st.write("### Values That Failed to Convert")
+                st.write(pd.Series(examples, name="Examples"))
+
+        if "Contractor" in df.columns:
+            resolved = contractor_entities(dataset_key())
+            st.write("### Contractor Name Variants")
+            st.dataframe(contractor_variants(resolved), hide_index=True, use_container_width=True)
+            firms = resolved["entities"]["Kind"] == "firm"
+            st.caption(f"{len(resolved['spellings']):,} spellings (including former names) resolve to "
+                       f"{firms.sum():,} firms; the {len(resolved['aliases']):,} distinct Contractor values "
+                       f"resolve to {resolved['aliases']['ContractorId'].nunique():,} contractors "
+                       "(firms or joint ventures).")
 
     st.divider()
 
+
+# Firms written more than one way, most projects first
+def contractor_variants(resolved):
+    spellings = resolved["spellings"]
+    ids = spellings["ContractorId"]
+    merged = spellings[ids.duplicated(keep=False)]
+    table = merged.reset_index().groupby("ContractorId").agg(
+        Spellings=("Spelling", " | ".join), Mentions=("Mentions", "sum"),
+    )
+    table.insert(0, "Contractor", resolved["entities"].loc[table.index, "Contractor"])
+    return table.sort_values("Mentions", ascending=False)
+
+
+def quality_table(quality):
+    table = pd.DataFrame.from_dict(quality["columns"], orient="index")
+    return table[["nulls", "coerced", "invalid"]].rename(columns={
+        "nulls": "Missing", "coerced": "Failed to convert", "invalid": "Out of range",
+    })
+
+# Row positions matching one column filter, cached per dataset version and
+# filter value: a (min, max) range for numeric columns, else selected values.
+@st.cache_data(max_entries=256, show_spinner=False)
+def filter_rows(key, col, value):
+    series = shared_dataset(key)[col]
+    if pd.api.types.is_numeric_dtype(series):
+        mask = (series >= value[0]) & (series <= value[1])
+    else:
+        mask = series.isin(value)
+    return np.flatnonzero(mask.to_numpy())
+
+
+# Column filter reruns as its own fragment; changing it leaves the rest of
+# the app untouched
+@st.fragment
 def display_filters(df):
     # Exclude unnamed columns
     df_clean = df.loc[:, ~df.columns.str.startswith("Unnamed")]
@@ -70,39 +120,45 @@ def display_filters(df):
     It contains both quantitative and qualitative data on flood control projects implemented by the Department of Public Works and Highways (DPWH) across the Philippines, including information such as project location, contractor, type of work, budget, contract cost, and completion dates.
     """)
 
-    numeric_cols = df_clean.select_dtypes(include=['float64', 'int64']).columns.tolist()
-    cat_cols = df_clean.select_dtypes(include=['object']).columns.tolist()
+    # Ranked row positions of a full-text search, or None
+    found = project_search(dataset_key(), df_clean)
+
+    numeric_cols = df_clean.select_dtypes(include='number').columns.tolist()
+    cat_cols = df_clean.select_dtypes(include=['object', 'string', 'category']).columns.tolist()
 
     col_data, col_option = st.columns([3, 1])
     with col_option:
         st.markdown("""<div class='filter-reset-container'>""",unsafe_allow_html=True)
 
-        selected_col = st.selectbox("Select column to filter:", df_clean.columns)
-
-        if selected_col in numeric_cols:
-            min_val = float(df_clean[selected_col].min())
-            max_val = float(df_clean[selected_col].max())
-
-            filter_range = st.slider(
-                f"Filter `{selected_col}` by range:",
-                min_val, max_val, (min_val, max_val)
-            )
-
-            df_filtered = df_clean[(df_clean[selected_col] >= filter_range[0]) &
-                                   (df_clean[selected_col] <= filter_range[1])]
-
-        elif selected_col in cat_cols:
-            unique_vals = df_clean[selected_col].dropna().unique().tolist()
-            selected_vals = st.multiselect(
-                f"Select values for `{selected_col}`:",
-                unique_vals
-            )
-
-            df_filtered = df_clean[df_clean[selected_col].isin(selected_vals)] if selected_vals else df_clean
-
-        else:
-            st.info("Column type not supported for filtering.")
-            df_filtered = df_clean
+        # In batch mode a new column's range/values appear after submitting;
+        # the typeahead search box stays outside the form so it still reacts
+        # while typing
+        search_area = st.container() if st.session_state.get("batch_filters") else None
+        with filter_form("overview_filters"):
+            selected_col = st.selectbox("Select column to filter:", df_clean.columns)
+
+            if selected_col in numeric_cols:
+                min_val = float(df_clean[selected_col].min())
+                max_val = float(df_clean[selected_col].max())
+
+                filter_range = st.slider(
+                    f"Filter `{selected_col}` by range:",
+                    min_val, max_val, (min_val, max_val)
+                )
+                rows = filter_rows(dataset_key(), selected_col, tuple(filter_range))
+
+            elif selected_col in cat_cols:
+                selected_vals = value_picker(dataset_key(), selected_col, search_area)
+                rows = filter_rows(dataset_key(), selected_col, tuple(selected_vals)) if selected_vals else None
+
+            else:
+                st.info("Column type not supported for filtering.")
+                rows = None
+
+        if found is not None:
+            # Search results keep their ranking; a column filter narrows them
+            rows = found if rows is None else found[np.isin(found, rows)]
+        df_filtered = df_clean if rows is None else df_clean.iloc[rows]
         st.markdown("</div>",unsafe_allow_html=True)
     with col_data:
         st.dataframe(df_filtered, use_container_width=True)
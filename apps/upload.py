@@ -0,0 +1,177 @@
+# upload.py
+# Sidebar CSV upload with a content-addressed parse cache.
+#
+# Uploaded bytes are hashed (sha256) and parsed + cleaned once, in a background
+# thread, into UPLOAD_CACHE_DIR/<hash>.parquet. Any later upload of the same
+# bytes, from any session, loads that parquet file instead of re-parsing. While
+# a large file parses the rest of the app keeps serving the bundled dataset.
+# Parsed uploads are held to the disk cache's TTL and byte budget
+# (disk_cache.evict), least recently read first; an evicted upload is simply
+# parsed again.
+
+import hashlib
+import io
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import streamlit as st
+
+import disk_cache
+from store import prepare_chunk
+from utils import merge_quality
+
+UPLOAD_CACHE_DIR = ".cache/uploads"
+PARSE_CHUNK_ROWS = 100_000
+PARSE_WORKERS = 2
+# Seconds a failed parse is kept so its sessions can show the error
+FAILED_JOB_SECONDS = 600
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def cached_path(digest):
+    return os.path.join(UPLOAD_CACHE_DIR, f"{digest}.parquet")
+
+
+def is_cached(digest):
+    return os.path.exists(cached_path(digest))
+
+
+# ---------------------------------------------------------
+# Background parsing
+# ---------------------------------------------------------
+@st.cache_resource
+def _parse_pool():
+    return ThreadPoolExecutor(max_workers=PARSE_WORKERS, thread_name_prefix="upload-parse")
+
+
+# digest -> {"future", "progress"}; shared across sessions so two people
+# uploading the same file share one parse.
+@st.cache_resource
+def _jobs():
+    return {}, threading.Lock()
+
+
+# Finished jobs are dropped (call with the lock held): a parsed upload is
+# found through its parquet file, and a failed one is kept FAILED_JOB_SECONDS
+# for the error message, as its traceback still holds the uploaded bytes.
+def _prune_jobs(jobs):
+    now = time.time()
+    for digest, job in list(jobs.items()):
+        if not job["future"].done():
+            continue
+        finished = job.setdefault("finished", now)
+        if job["future"].exception() is None or now - finished > FAILED_JOB_SECONDS:
+            del jobs[digest]
+
+
+def parse_upload(data, digest, job):
+    buffer = io.BytesIO(data)
+    chunks = []
+    # Cast per chunk as the store does, so a column read as numbers in one
+    # chunk and as text in another still concatenates to one parquet type
+    for raw in pd.read_csv(buffer, chunksize=PARSE_CHUNK_ROWS):
+        chunks.append(prepare_chunk(raw))
+        job["progress"] = buffer.tell() / max(len(data), 1)
+
+    df = pd.concat(chunks, ignore_index=True)
+    df.attrs["quality"] = merge_quality(*(chunk.attrs["quality"] for chunk in chunks))
+    os.makedirs(UPLOAD_CACHE_DIR, exist_ok=True)
+    # A temporary file of its own, so two processes parsing the same upload
+    # never rename each other's half-written file into place
+    fd, tmp = tempfile.mkstemp(dir=UPLOAD_CACHE_DIR, suffix=".tmp")
+    os.close(fd)
+    try:
+        df.to_parquet(tmp, index=False)
+        os.replace(tmp, cached_path(digest))
+    except BaseException:
+        os.remove(tmp)
+        raise
+    evict_uploads()
+    job["progress"] = 1.0
+
+
+def evict_uploads():
+    disk_cache.evict(disk_cache.DISK_CACHE_BYTES, disk_cache.DISK_CACHE_TTL,
+                     directory=UPLOAD_CACHE_DIR, suffix=".parquet")
+
+
+def submit_upload(data, digest):
+    jobs, lock = _jobs()
+    with lock:
+        _prune_jobs(jobs)
+        job = jobs.get(digest)
+        if job is None or (job["future"].done() and job["future"].exception() is not None):
+            job = {"progress": 0.0}
+            job["future"] = _parse_pool().submit(parse_upload, data, digest, job)
+            jobs[digest] = job
+    return job
+
+
+# Cached once per process by utils.shared_dataset
+def read_upload(digest):
+    path = cached_path(digest)
+    df = pd.read_parquet(path)
+    # Recency for evict_uploads; mtime stays the write time the TTL counts from
+    os.utime(path, (time.time(), os.stat(path).st_mtime))
+    return df
+
+
+def active_upload():
+    return st.session_state.get("upload_digest")
+
+
+# ---------------------------------------------------------
+# Sidebar
+# ---------------------------------------------------------
+@st.fragment(run_every=1)
+def _parse_progress(digest):
+    jobs, lock = _jobs()
+    with lock:
+        job = jobs.get(digest)
+    if job is None:
+        # Parsed, and pruned by another session's upload meanwhile
+        if is_cached(digest):
+            st.session_state["upload_digest"] = digest
+            st.rerun()
+        return
+    if job["future"].done():
+        error = job["future"].exception()
+        if error is not None:
+            st.error(f"Could not parse the uploaded file: {error}")
+            return
+        st.session_state["upload_digest"] = digest
+        st.rerun()
+    st.progress(job["progress"], text=f"Parsing upload... {job['progress']:.0%}")
+
+
+def render_sidebar():
+    st.sidebar.header("Upload Your Dataset")
+    uploaded_file = st.sidebar.file_uploader("Upload CSV file", type=["csv"])
+
+    if uploaded_file is None:
+        st.session_state.pop("upload_digest", None)
+        return
+
+    # Hash once per uploaded file, not on every rerun.
+    hashes = st.session_state.setdefault("upload_hashes", {})
+    digest = hashes.get(uploaded_file.file_id)
+    if digest is None:
+        digest = hashes[uploaded_file.file_id] = content_hash(uploaded_file.getvalue())
+
+    if is_cached(digest):
+        st.session_state["upload_digest"] = digest
+        st.sidebar.success(f"Using uploaded dataset `{uploaded_file.name}`.")
+        return
+
+    st.session_state.pop("upload_digest", None)
+    submit_upload(uploaded_file.getvalue(), digest)
+    st.sidebar.info("Showing the bundled dataset until the upload is parsed.")
+    with st.sidebar:
+        _parse_progress(digest)
@@ -1,32 +1,328 @@
+import os
+from contextlib import contextmanager
+
 import streamlit as st
 import pandas as pd
 
-def load_dataset():
-    df = pd.read_csv("data/dpwhfloodcontrol.csv")
+from cache import estimate_size, resource_cache
+
+# The cleaned dataset is shared by every session (see load_dataset). With
+# copy-on-write, selections and new columns made by one session never touch
+# the shared frame. It is the default from pandas 3.
+if int(pd.__version__.split(".")[0]) < 3:
+    pd.set_option("mode.copy_on_write", True)
+
+DATA_PATH = "data/dpwhfloodcontrol.csv"
+
+# Bump when clean_dataset or store.build_cube change their output, so
+# results persisted by disk_cache.py are recomputed.
+CLEAN_VERSION = 3
+
+# Set DPWH_BUNDLE to a directory built by `python apps/precompute.py` to serve
+# every heavy result from the precomputed, read-only artifact bundle.
+BUNDLE_DIR = os.environ.get("DPWH_BUNDLE")
+
+# Set DPWH_STORE to a directory built by `python apps/store.py ingest ...`
+# to run the dashboard from the chunked store instead of the raw CSV.
+# A bundle always carries its own store.
+STORE_DIR = os.environ.get("DPWH_STORE")
+if BUNDLE_DIR and not STORE_DIR:
+    # Same lookup as precompute.resolve_bundle (not imported here: it imports us)
+    with open(os.path.join(BUNDLE_DIR, "current")) as f:
+        STORE_DIR = os.path.join(BUNDLE_DIR, f.read().strip(), "store")
+
+# Set DPWH_COMPACT=1 to hold the shared frames with compact dtypes (small ints,
+# float32 where exact, see compact.py); on the DPWH export about 12% less
+# memory per server process than the Arrow-string frame alone.
+COMPACT_DTYPES = os.environ.get("DPWH_COMPACT") == "1"
+
+# Text columns are held in Arrow memory (see arrow_strings); columns with at
+# most this share of distinct values are dictionary-encoded.
+ARROW_STRING = pd.StringDtype("pyarrow")
+DICTIONARY_MAX_RATIO = 0.5
+
+# Every date in the DPWH export looks like 10/3/2022
+DATE_FORMAT = "%m/%d/%Y"
+
+RENAME_MAP = {
+    "FundingYear": "Year",
+    "ApprovedBudgetForContract": "Budget",
+    "StartDate": "StartDate",
+    "ActualCompletionDate": "EndDate",
+}
+
+
+# Parses a date column with a fixed format. Exports repeat a few thousand
+# distinct dates over every row, so only the unique strings are parsed and
+# the result is mapped back by position. Returns the dates and a mask of the
+# rows that had a value but failed to parse.
+def parse_dates(series, date_format=DATE_FORMAT):
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series, pd.Series(False, index=series.index)
+
+    codes, uniques = pd.factorize(series)
+    parsed = pd.DatetimeIndex(pd.to_datetime(pd.Series(uniques, dtype=object), format=date_format, errors="coerce"))
+    # take() with allow_fill maps the -1 code of missing values to NaT
+    values = parsed.take(codes, allow_fill=True, fill_value=pd.NaT)
+    dates = pd.Series(values, index=series.index, name=series.name)
+    return dates, series.notna() & dates.isna()
+
+
+# Values outside these bounds are counted as invalid in the quality profile;
+# the rows are kept.
+VALID_RANGES = {
+    "Year": (1900, 2100),
+    "Budget": (0, None),
+    "ContractCost": (0, None),
+    "DurationDays": (0, None),  # completion before the start date
+}
+QUALITY_EXAMPLES = 5
+
+
+def clean_dataset(df):
     df = df.loc[:, ~df.columns.str.startswith("Unnamed")]
-    df = df.rename(columns={
-        "FundingYear": "Year",
-        "ApprovedBudgetForContract": "Budget",
-        "StartDate": "StartDate",
-        "ActualCompletionDate": "EndDate",
-    })
-    # Ensure correct types
-    if "Year" in df.columns:
-        df["Year"] = pd.to_numeric(df["Year"], errors="coerce")
-    if "Budget" in df.columns:
-        df["Budget"] = pd.to_numeric(df["Budget"], errors="coerce")
+    df = df.rename(columns=RENAME_MAP)
+    # Raw values of every coerced column, to count what the coercion lost
+    raw = {}
 
-    #Converting ContractCost from a str into an int
-    cost_col = 'ContractCost'
-    df[cost_col] = pd.to_numeric(df[cost_col], errors="coerce")
+    # Ensure correct types
+    for col in ["Year", "Budget", "ContractCost"]:
+        if col in df.columns:
+            raw[col] = df[col]
+            df[col] = pd.to_numeric(df[col], errors="coerce")
 
     #Converting the date string into dates
     date_cols = ['StartDate', 'EndDate']
     for col in date_cols:
-        df[col] = pd.to_datetime(df[col], errors="coerce")
+        raw[col] = df[col]
+        df[col], _ = parse_dates(raw[col])
 
     df['DurationDays'] = (df['EndDate'] - df['StartDate']).dt.days
     #Should I drop rows that have a missing date
     #df = df.dropna(subset=[cost_col, 'DurationDays'])
 
+    # Reported on the Overview tab; rows stay in with missing/invalid values
+    df.attrs["quality"] = quality_profile(df, raw)
+    return df
+
+
+# ---------------------------------------------------------
+# Data-quality profile
+# ---------------------------------------------------------
+# Built once per load by clean_dataset and kept in df.attrs["quality"] (the
+# dataset store keeps a merged copy in quality.json), so nothing rescans the
+# frame to report it:
+#   {"rows": n, "columns": {col: {"nulls", "coerced", "invalid", "examples"}}}
+# "coerced" counts values present in the file that failed to convert;
+# "examples" holds a few of them as they appeared in the file.
+def quality_profile(df, raw):
+    nulls = df.isna().sum()
+    columns = {}
+    for col in df.columns:
+        entry = {"nulls": int(nulls[col]), "coerced": 0, "invalid": 0, "examples": []}
+        if col in raw:
+            failed = raw[col].notna() & df[col].isna()
+            entry["coerced"] = int(failed.sum())
+            entry["examples"] = [str(v) for v in raw[col][failed].drop_duplicates().head(QUALITY_EXAMPLES)]
+        if col in VALID_RANGES:
+            low, high = VALID_RANGES[col]
+            values = df[col]
+            invalid = pd.Series(False, index=df.index)
+            if low is not None:
+                invalid |= values < low
+            if high is not None:
+                invalid |= values > high
+            entry["invalid"] = int(invalid.sum())
+        columns[col] = entry
+    return {"rows": len(df), "columns": columns}
+
+
+# Combines the profiles of row chunks of one dataset (chunked parsing, store
+# ingestion and appends).
+def merge_quality(*profiles):
+    merged = {"rows": 0, "columns": {}}
+    for profile in profiles:
+        if not profile:
+            continue
+        merged["rows"] += profile["rows"]
+        for col, entry in profile["columns"].items():
+            total = merged["columns"].setdefault(col, {"nulls": 0, "coerced": 0, "invalid": 0, "examples": []})
+            for count in ("nulls", "coerced", "invalid"):
+                total[count] += entry[count]
+            examples = total["examples"] + [v for v in entry["examples"] if v not in total["examples"]]
+            total["examples"] = examples[:QUALITY_EXAMPLES]
+    return merged
+
+
+def dataset_source():
+    from upload import active_upload
+    if active_upload():
+        return "upload"
+    if STORE_DIR:
+        return "store"
+    return "csv"
+
+
+# Identifies the dataset the current session is looking at, including its
+# version, so anything cached per dataset can use it as a key.
+def dataset_key():
+    from upload import active_upload
+    digest = active_upload()
+    if digest:
+        return f"upload:{digest}"
+    return base_dataset_key()
+
+
+# The key of the dataset the server was started with (store or CSV), which
+# every session sees until it uploads its own. Needs no session, so the
+# warm-up thread (warmup.py) can use it.
+def base_dataset_key():
+    if STORE_DIR:
+        import store
+        return f"store:{store.store_version(STORE_DIR)}"
+    stat = os.stat(DATA_PATH)
+    return f"csv:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+# Returns the process-wide cleaned frame for the session's dataset. Every
+# session gets the same object, so treat it as read-only: filter into new
+# frames and keep derived columns (e.g. cluster labels) in separate arrays.
+def load_dataset():
+    return shared_dataset(dataset_key())
+
+
+# In store mode the frame is the store's sample, accounted with _open_store
+@resource_cache("shared_dataset", 4, lambda df, key: 0 if key.startswith("store:") else estimate_size(df))
+def shared_dataset(key):
+    source, _, ref = key.partition(":")
+    if source == "upload":
+        from upload import read_upload
+        return shared_frame(read_upload(ref))
+
+    # In store mode only the uniform row sample kept by the store is loaded;
+    # totals and statistics must come from load_store() instead.
+    if source == "store":
+        return load_store()["sample"]
+
+    from disk_cache import disk_cached
+    return disk_cached("cleaned", CLEAN_VERSION, dataset_fingerprint(key), "compact" if COMPACT_DTYPES else None,
+                       lambda: shared_frame(clean_dataset(pd.read_csv(DATA_PATH))))
+
+
+# Final form of every frame shared_dataset hands out: Arrow-backed text
+# columns, then compact dtypes when DPWH_COMPACT=1.
+def shared_frame(df):
+    df = arrow_strings(df)
+    if COMPACT_DTYPES:
+        from compact import compact_frame
+        df = compact_frame(df)
     return df
+
+
+# Text columns with few distinct values (Region, Province, TypeOfWork,
+# Contractor) become categoricals, which Arrow takes as dictionary arrays
+# without copying the strings; the rest (ContractId, ProjectId) are held as
+# pyarrow strings. st.dataframe and parquet then hand the columns to Arrow
+# as they are instead of converting Python strings on every rerun.
+# Categoricals are made here and not per chunk in clean_dataset, because
+# concatenating chunks with different categories falls back to objects.
+def arrow_strings(df):
+    text = {}
+    for col in df.columns:
+        series = df[col]
+        if not (pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series)):
+            continue
+        if len(series) and series.nunique() / len(series) <= DICTIONARY_MAX_RATIO:
+            text[col] = "category"
+        elif series.dtype != ARROW_STRING:
+            text[col] = ARROW_STRING
+    if not text:
+        return df
+    converted = df.astype(text)
+    converted.attrs = dict(df.attrs)
+    return converted
+
+
+# Region x Year cube of the whole dataset (see store.build_cube): the store's
+# own cube in store mode, otherwise built once per process and shared.
+@resource_cache("shared_cube", 4, lambda cube, key: 0 if key.startswith("store:") else estimate_size(cube))
+def shared_cube(key):
+    if key.startswith("store:"):
+        return load_store()["cube"]
+    import store
+    from disk_cache import disk_cached
+    return disk_cached("cube", CLEAN_VERSION, dataset_fingerprint(key), None,
+                       lambda: store.build_cube(shared_dataset(key)))
+
+
+# Content hash of the dataset behind a dataset_key(), for results that are
+# persisted across restarts: uploads and store versions are content hashes
+# already; the CSV is hashed once per size and modification time.
+@st.cache_resource(max_entries=4, show_spinner=False)
+def dataset_fingerprint(key):
+    source, _, ref = key.partition(":")
+    if source != "csv":
+        return ref
+    import hashlib
+    digest = hashlib.sha256()
+    with open(DATA_PATH, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# Data-quality profile (see quality_profile) of the session's dataset; in
+# store mode it covers every stored row, not just the sample.
+def load_quality():
+    store = load_store()
+    if store is not None:
+        return store["quality"]
+    return load_dataset().attrs.get("quality")
+
+
+def load_store():
+    if dataset_source() != "store":
+        return None
+    import store
+    # Keyed on the manifest version so appended batches are picked up on the
+    # next rerun without restarting the server.
+    return _open_store(STORE_DIR, store.store_version(STORE_DIR))
+
+
+@resource_cache("store", 1)
+def _open_store(path, version):
+    import store
+    opened = store.open_store(path)
+    opened["sample"] = shared_frame(opened["sample"])
+    return opened
+
+
+# The bundle only describes the store version it was built on; for any other
+# (an appended batch, another DPWH_STORE) results are computed live.
+def load_bundle():
+    if not BUNDLE_DIR or dataset_source() != "store":
+        return None
+    import store
+    bundle = _open_bundle(BUNDLE_DIR)
+    if bundle["manifest"].get("store_version") != store.store_version(STORE_DIR):
+        return None
+    return bundle
+
+
+@resource_cache("bundle", 2)
+def _open_bundle(root):
+    from precompute import open_bundle, resolve_bundle
+    return open_bundle(resolve_bundle(root))
+
+
+# Wraps filter widgets in a form when the session has "Apply filters on
+# submit" switched on: widget changes then accumulate without reruns and the
+# filter runs once per submit. Without it the widgets apply immediately.
+@contextmanager
+def filter_form(key, label="Apply filters"):
+    if not st.session_state.get("batch_filters"):
+        yield
+        return
+    with st.form(key, border=False):
+        yield
+        st.form_submit_button(label)
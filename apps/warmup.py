@@ -0,0 +1,181 @@
+# warmup.py
+# Fills the process-wide caches before the first visitor needs them.
+#
+#   python apps/warmup.py serve [streamlit options]   # start the server, warm up at once
+#   python apps/warmup.py check                       # exit 0 when the server is warm
+#   python apps/warmup.py check --wait 300            # poll until warm (or time out)
+#
+# main.py also calls start() on every run, so a plain `streamlit run
+# apps/main.py` warms up with its first session, and every server re-warms in
+# the background when the dataset version changes (e.g. a store append).
+#
+# A warm-up loads the cleaned dataset and its Region x Year cube, the default
+# Data Exploration view and figures, the default K-Means fit (all numeric
+# features, k = 3, standardized), the contractor entity resolution and
+# leaderboard aggregate, the per-group quantile sketches and the Insights
+# figures. Progress is written to WARMUP_STATUS for orchestrators to
+# poll, e.g.
+#   {"state": "ready", "dataset": "csv:...", "pid": 12, "steps": {"dataset": 0.41, ...}}
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import traceback
+
+import streamlit as st
+
+from utils import base_dataset_key, load_store, shared_cube, shared_dataset
+
+WARMUP_STATUS = os.environ.get("DPWH_WARMUP_STATUS", ".cache/warmup.json")
+MAIN_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+
+
+def warm(key, status):
+    import tab_analysis
+    import tab_dataexploration
+    import tab_insights
+
+    def step(name, compute):
+        started = time.time()
+        result = compute()
+        status["steps"][name] = round(time.time() - started, 3)
+        write_status(status)
+        return result
+
+    df = step("dataset", lambda: shared_dataset(key))
+    step("cube", lambda: shared_cube(key))
+
+    store = load_store() if key.startswith("store:") else None
+    view = step("exploration view", lambda: tab_dataexploration.default_view(key, df, store))
+    step("exploration figures", lambda: tab_dataexploration.default_figures(view))
+
+    analysis_df = step("analysis dataset", lambda: tab_analysis.load_dataset(key))
+    features = tab_analysis.numeric_columns(analysis_df)
+    step("clustering", lambda: tab_analysis.cached_clustering(
+        key, analysis_df, features, tab_analysis.DEFAULT_CLUSTERS, tab_analysis.DEFAULT_SCALED))
+
+    import entities
+    step("contractors", lambda: entities.contractor_entities(key))
+    import leaderboard
+    # Large stores answer the concentration view from their sketches instead
+    if leaderboard.contractor_sketches(key) is None:
+        step("contractor cube", lambda: leaderboard.contractor_cube(key))
+    import quantiles
+    step("quantile sketches", lambda: quantiles.group_sketches(key))
+
+    step("insight figures", lambda: [
+        tab_insights.insight_figure(chart_id, df, key) for chart_id in tab_insights.INSIGHT_FIGURES
+    ])
+
+
+def run(key):
+    status = {"state": "warming", "dataset": key, "pid": os.getpid(),
+              "started": time.strftime("%Y-%m-%dT%H:%M:%S"), "steps": {}}
+    write_status(status)
+    try:
+        warm(key, status)
+    except Exception:
+        status.update(state="failed", error=traceback.format_exc(limit=5))
+        print(f"Warm-up of {key} failed:\n{status['error']}", file=sys.stderr)
+    else:
+        status["state"] = "ready"
+    status["finished"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+    write_status(status)
+
+
+# One background warm-up per dataset version and process
+@st.cache_resource(max_entries=4, show_spinner=False)
+def _warmup_thread(key):
+    thread = threading.Thread(target=run, args=(key,), name="warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+def start():
+    return _warmup_thread(base_dataset_key())
+
+
+# ---------------------------------------------------------
+# Readiness
+# ---------------------------------------------------------
+def write_status(status):
+    os.makedirs(os.path.dirname(WARMUP_STATUS) or ".", exist_ok=True)
+    tmp = f"{WARMUP_STATUS}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(status, f, indent=1)
+    os.replace(tmp, WARMUP_STATUS)
+
+
+def read_status():
+    try:
+        with open(WARMUP_STATUS) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _running(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+# Ready means the server that wrote the status is still running and has
+# finished warming the dataset version it currently serves.
+def is_ready(status):
+    return (
+        status is not None
+        and status["state"] == "ready"
+        and status["dataset"] == base_dataset_key()
+        and _running(status["pid"])
+    )
+
+
+def check(wait=0, interval=1.0):
+    deadline = time.time() + wait
+    while True:
+        status = read_status()
+        if is_ready(status) or time.time() >= deadline:
+            break
+        time.sleep(interval)
+
+    if status is None:
+        print(f"Not ready: no warm-up status at {WARMUP_STATUS}")
+    else:
+        print(json.dumps(status, indent=1))
+    return 0 if is_ready(status) else 1
+
+
+def serve(streamlit_args):
+    # Imported by name so the server's own `import warmup` (in main.py) finds
+    # this module and its already started warm-up instead of a second copy.
+    import warmup
+    warmup.start()
+
+    from streamlit.web import cli
+    sys.argv = ["streamlit", "run", MAIN_SCRIPT, *streamlit_args]
+    return cli.main()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Warm the dashboard caches and report readiness.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("serve", help="run the Streamlit server and warm it up at start")
+    check_parser = commands.add_parser("check", help="exit 0 when the server is warm")
+    check_parser.add_argument("--wait", type=float, default=0, help="seconds to wait for readiness")
+    args, extra = parser.parse_known_args()
+
+    if args.command == "serve":
+        sys.exit(serve(extra))
+    sys.exit(check(args.wait))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+# conftest.py
+# The app modules import each other by bare name from apps/, and the bundled
+# dataset path (utils.DATA_PATH) is relative to the repository root.
+
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "apps"))
+os.chdir(ROOT)
+
+
+# The bundled export, cleaned as the app loads it
+@pytest.fixture(scope="session")
+def dataset():
+    from utils import DATA_PATH, clean_dataset
+    return clean_dataset(pd.read_csv(DATA_PATH))
+
+
+# The bundled export as read from disk, before cleaning
+@pytest.fixture(scope="session")
+def raw_dataset():
+    from utils import DATA_PATH
+    return pd.read_csv(DATA_PATH)
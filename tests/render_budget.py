@@ -0,0 +1,270 @@
+# render_budget.py
+# Render-time budgets: renders each tab headlessly against fixed-size
+# datasets and fails when a tab takes longer or allocates more than its budget.
+#
+#   python tests/render_budget.py                   # every tab at every size
+#   python tests/render_budget.py --tabs tab_analysis --sizes 50000
+#   python tests/render_budget.py --time-scale 2    # on a slower machine
+#   python -m pytest tests/test_render_budget.py    # the same checks as tests
+#
+# Datasets are resampled from the bundled CSV with a fixed seed, so a size
+# always means the same rows. Each tab is rendered cold (empty in-process and
+# disk caches) REPEATS times, the fastest render counting against the time
+# budget so one slow run on a busy machine does not fail it, and once under
+# tracemalloc for its peak Python/NumPy allocation. When a budget is exceeded
+# the tab's sections are listed with their own time and peak, so the
+# regression points at a function. The sections are wrapped only while a tab
+# is measured (instrumented), so nothing else in the process sees the timers.
+#
+# DPWH_BUDGET_TIME_SCALE multiplies the time budgets (default 1), for the
+# tests as for --time-scale.
+
+import argparse
+import contextlib
+import functools
+import importlib
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from streamlit.logger import set_log_level
+from streamlit.testing.v1 import AppTest
+
+# The app modules import each other by bare name from apps/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "apps"))
+import disk_cache
+import utils
+
+SIZES = [10_000, 50_000]
+SEED = 0
+REPEATS = 3
+TIME_SCALE = float(os.environ.get("DPWH_BUDGET_TIME_SCALE", 1.0))
+
+# Top-level functions each tab's render() calls, timed separately
+SECTIONS = {
+    "tab_overview": ["display_title_and_overview", "load_dataset", "display_filters",
+                     "display_dataset_info", "chosen_techniques", "objective", "display_group_members"],
+    "tab_dataexploration": ["load_store", "load_dataset", "display_key_statistics",
+                            "heatmap_boxplot_histogram", "filter_and_charts"],
+    "tab_analysis": ["load_dataset", "kmeans_section", "regression_section"],
+    "tab_insights": ["load_dataset", "shared_cube", "key_insights", "concentration_of_contracts", "pattern_trends", "anomalies",
+                     "analysis_clustering", "value_technique", "limitations", "recommendation"],
+}
+
+# (seconds, peak MB) per tab and dataset size, for a cold render. Set about
+# twice what the tabs take today (fastest of REPEATS renders, peak under
+# tracemalloc), so timing noise does not fail a tab but a tab that gets about
+# twice as slow or large does.
+BUDGETS = {
+    10_000: {
+        "tab_overview": (1.2, 10),
+        "tab_dataexploration": (1.0, 10),
+        "tab_analysis": (1.0, 15),
+        "tab_insights": (2.2, 16),
+    },
+    50_000: {
+        "tab_overview": (1.8, 32),
+        "tab_dataexploration": (1.6, 32),
+        "tab_analysis": (2.4, 60),
+        "tab_insights": (2.4, 40),
+    },
+}
+
+_records = []
+_run_peak = 0
+
+
+# (seconds, peak MB) of a tab at `rows`: a listed size's own budget, sizes
+# between two listed ones interpolated linearly. Outside the listed sizes
+# there is nothing to scale from, so they are rejected.
+def budget(tab, rows):
+    sizes = sorted(BUDGETS)
+    if not sizes[0] <= rows <= sizes[-1]:
+        raise ValueError(f"no render budget for {rows:,} rows; budgets cover {sizes[0]:,} to {sizes[-1]:,} rows")
+    seconds, mb = zip(*(BUDGETS[n][tab] for n in sizes))
+    return float(np.interp(rows, sizes, seconds)), float(np.interp(rows, sizes, mb))
+
+
+# ---------------------------------------------------------
+# Datasets
+# ---------------------------------------------------------
+def synthetic_csv(rows, out_dir, source=utils.DATA_PATH):
+    path = os.path.join(out_dir, f"dataset-{rows}.csv")
+    if not os.path.exists(path):
+        raw = pd.read_csv(source)
+        raw.sample(n=rows, replace=True, random_state=SEED).to_csv(path, index=False)
+    return path
+
+
+# ---------------------------------------------------------
+# Section timing
+# ---------------------------------------------------------
+def timed(name, func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            base = tracemalloc.get_traced_memory()[0]
+            _track_peak()
+            tracemalloc.reset_peak()
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            peak = None
+            if tracing:
+                peak = tracemalloc.get_traced_memory()[1] - base
+                _track_peak()
+            _records.append((name, time.perf_counter() - started, peak))
+    return wrapper
+
+
+# Sections reset tracemalloc's peak to measure their own, so the peak of the
+# whole render is kept here
+def _track_peak():
+    global _run_peak
+    _run_peak = max(_run_peak, tracemalloc.get_traced_memory()[1])
+
+
+# The tab's sections replaced by timed wrappers inside the block; the
+# originals are put back on the way out, also when the render fails
+@contextlib.contextmanager
+def instrumented(tab):
+    module = importlib.import_module(tab)
+    originals = {name: getattr(module, name) for name in SECTIONS[tab]}
+    try:
+        for name, func in originals.items():
+            setattr(module, name, timed(name, func))
+        yield module
+    finally:
+        for name, func in originals.items():
+            setattr(module, name, func)
+
+
+def sections():
+    totals = {}
+    for name, seconds, peak in _records:
+        total = totals.setdefault(name, [0.0, 0])
+        total[0] += seconds
+        total[1] = max(total[1], peak or 0)
+    return totals
+
+
+# ---------------------------------------------------------
+# Rendering
+# ---------------------------------------------------------
+def render_cold(tab, trace):
+    global _run_peak
+    _run_peak = 0
+    st.cache_data.clear()
+    st.cache_resource.clear()
+    cache_dir = disk_cache.DISK_CACHE_DIR
+    disk_cache.DISK_CACHE_DIR = tempfile.mkdtemp(prefix="render-budget-")
+    _records.clear()
+    try:
+        app = AppTest.from_string(f"import {tab}\n{tab}.render()", default_timeout=600)
+        if trace:
+            tracemalloc.start()
+        started = time.perf_counter()
+        app.run()
+        elapsed = time.perf_counter() - started
+        if trace:
+            _track_peak()
+        peak = _run_peak if trace else None
+    finally:
+        if trace:
+            tracemalloc.stop()
+        shutil.rmtree(disk_cache.DISK_CACHE_DIR, ignore_errors=True)
+        disk_cache.DISK_CACHE_DIR = cache_dir
+    if app.exception:
+        raise RuntimeError(f"{tab} raised: {app.exception[0].value}")
+    return elapsed, peak, sections()
+
+
+# Libraries the tabs import on first use (see startup.py) are loaded up front,
+# so the first tab measured does not also pay for their import.
+def prime_imports():
+    import plotly.express
+    import sklearn.cluster
+    import sklearn.decomposition
+    import sklearn.impute
+    import sklearn.preprocessing
+
+
+def check(tab, rows, time_scale=TIME_SCALE):
+    max_seconds, max_mb = budget(tab, rows)
+    max_seconds *= time_scale
+    elapsed, _, timed_sections = min((render_cold(tab, trace=False) for _ in range(REPEATS)), key=lambda run: run[0])
+    _, peak, traced_sections = render_cold(tab, trace=True)
+    return {
+        "tab": tab,
+        "rows": rows,
+        "seconds": elapsed,
+        "peak_mb": peak / 1e6,
+        "max_seconds": max_seconds,
+        "max_mb": max_mb,
+        "ok": elapsed <= max_seconds and peak / 1e6 <= max_mb,
+        "sections": {name: (timed_sections.get(name, (0.0, 0))[0], traced_sections.get(name, (0.0, 0))[1] / 1e6)
+                     for name in SECTIONS[tab]},
+    }
+
+
+def report(result, breakdown):
+    status = "ok" if result["ok"] else "OVER BUDGET"
+    lines = [f"{result['tab']:<22}{result['rows']:>8,}"
+             f"{result['seconds']:>8.2f}s /{result['max_seconds']:>5.1f}s"
+             f"{result['peak_mb']:>8.1f}MB /{result['max_mb']:>5.0f}MB  {status}"]
+    if breakdown or not result["ok"]:
+        for name, (seconds, peak_mb) in result["sections"].items():
+            lines.append(f"    {name:<28}{seconds:>8.2f}s{peak_mb:>10.1f}MB")
+    return "\n".join(lines)
+
+
+# The tabs load images and data relative to the repository root, and are
+# measured on the bundled CSV only (no store or precomputed bundle)
+def setup():
+    os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    utils.STORE_DIR = utils.BUNDLE_DIR = None
+    set_log_level("error")
+    prime_imports()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check per-tab render time and memory budgets.")
+    parser.add_argument("--tabs", default=",".join(SECTIONS))
+    parser.add_argument("--sizes", default=",".join(str(n) for n in SIZES))
+    parser.add_argument("--time-scale", type=float, default=TIME_SCALE, help="multiply the time budgets")
+    parser.add_argument("--breakdown", action="store_true", help="list sections for every tab")
+    args = parser.parse_args()
+    sizes = [int(n) for n in args.sizes.split(",")]
+    for rows in sizes:
+        try:
+            budget(next(iter(SECTIONS)), rows)
+        except ValueError as e:
+            parser.error(str(e))
+
+    setup()
+    data_dir = tempfile.mkdtemp(prefix="render-budget-data-")
+    failed = False
+    try:
+        print(f"{'tab':<22}{'rows':>8}{'time / budget':>16}{'peak / budget':>18}")
+        for rows in sizes:
+            utils.DATA_PATH = synthetic_csv(rows, data_dir)
+            for tab in args.tabs.split(","):
+                with instrumented(tab):
+                    result = check(tab, rows, args.time_scale)
+                print(report(result, args.breakdown))
+                failed |= not result["ok"]
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+# test_cache.py
+# CacheManager eviction across caches (LRU and LFU), pinned entries, the
+# hit/miss/eviction counters, and the accounting of st.cache_resource values.
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import cache
+from cache import CacheManager, estimate_size, figure_size, resource_cache, unshared_size
+
+
+@pytest.fixture
+def manager(monkeypatch):
+    manager = CacheManager(max_bytes=100, policy="lru")
+    monkeypatch.setattr(cache, "cache_manager", lambda: manager)
+    return manager
+
+
+def test_budget_evicts_least_recently_used_across_caches(manager):
+    first, second = manager.cache("first", 10), manager.cache("second", 10)
+    first.put("a", "a", 40)
+    second.put("b", "b", 40)
+    first.get("a")
+    second.put("c", "c", 40)
+    assert "a" in first._data and "b" not in second._data and "c" in second._data
+    assert manager.nbytes == 80
+    assert (first.evictions, second.evictions) == (0, 1)
+
+
+def test_lfu_evicts_least_frequently_used():
+    manager = CacheManager(max_bytes=100, policy="lfu")
+    values = manager.cache("values", 10)
+    values.put("often", 1, 40)
+    values.put("once", 2, 40)
+    for _ in range(3):
+        values.get("often")
+    values.put("new", 3, 40)
+    assert set(values._data) == {"often", "new"}
+
+
+def test_entry_bound_evicts_within_the_cache(manager):
+    values = manager.cache("values", 2)
+    for key in "abc":
+        values.put(key, key)
+    assert set(values._data) == {"b", "c"}
+    assert values.evictions == 1
+
+
+def test_pinned_entry_survives_until_repinned(manager):
+    values = manager.cache("values", 10)
+    values.put("default", 0, 60, pin="default")
+    values.put("other", 1, 60)
+    assert "default" in values._data and "other" not in values._data
+    # Over budget with only pinned entries left: nothing more to evict
+    values.put("big", 2, 200, pin="default")
+    assert set(values._data) == {"big"}
+
+
+def test_get_or_compute_counts_hits_and_misses(manager):
+    values = manager.cache("values", 10)
+    calls = []
+    for _ in range(3):
+        values.get_or_compute("key", lambda: calls.append(1) or "value", size_of=lambda v: 10)
+    stats = values.stats()
+    assert len(calls) == 1
+    assert (stats["hits"], stats["misses"], stats["bytes"]) == (2, 1, 10)
+    assert stats["hit_rate"] == pytest.approx(2 / 3)
+
+
+def test_unknown_policy_is_rejected():
+    with pytest.raises(ValueError, match="Unknown cache policy"):
+        CacheManager(policy="fifo")
+
+
+def test_resources_count_toward_the_budget_and_are_never_evicted(manager):
+    values = manager.cache("values", 10)
+    values.put("a", "a", 40)
+    held = [0]
+    manager.resource("dataset", 4).add(held, 80)
+    manager.enforce_budget()
+    assert len(values) == 0 and values.evictions == 1
+    assert manager.nbytes == 80
+    manager.resource("dataset", 4).release(held)
+    assert manager.nbytes == 0
+
+
+def test_resource_cache_releases_what_streamlit_drops(manager):
+    @resource_cache("squares", 2, lambda value, n: 10 * n)
+    def squares(n):
+        return np.arange(n) ** 2
+
+    for n in (1, 2, 3):
+        squares(n)
+    squares(3)
+    account = manager.resources["squares"]
+    assert len(account) == 2
+    assert account.nbytes == 50
+    assert (account.misses, account.evictions) == (3, 1)
+    squares.clear()
+    assert account.nbytes == 0 and len(account) == 0
+
+
+def test_unshared_size_counts_only_new_or_changed_columns():
+    base = pd.DataFrame({"Region": pd.Categorical(["A", "B"] * 500), "Cost": np.arange(1000.0),
+                         "Id": pd.array([str(i) for i in range(1000)], dtype="string[pyarrow]")})
+    derived = base.assign(Cost=base["Cost"] * 2, Share=np.ones(1000))
+    assert unshared_size(derived, base) == 2 * 8 * 1000
+    assert unshared_size(base[["Region", "Id"]], base) == 0
+
+
+def test_figure_size_follows_its_data():
+    import plotly.graph_objects as go
+    small = figure_size(go.Figure(go.Scatter(x=np.arange(10.0), y=np.arange(10.0))))
+    large = figure_size(go.Figure(go.Scatter(x=np.arange(100_000.0), y=np.arange(100_000.0))))
+    assert large - small == pytest.approx(2 * 8 * 100_000, rel=0.01)
+
+
+def test_estimate_size_walks_objects():
+    class Index:
+        def __init__(self):
+            self.keys = np.zeros(1000)
+            self.names = np.array(["x" * 100] * 10, dtype=object)
+
+    assert estimate_size(Index()) > 8000 + 10 * 100
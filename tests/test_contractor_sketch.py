@@ -0,0 +1,89 @@
+# test_contractor_sketch.py
+# Count-min, heavy-hitter and HyperLogLog estimates against exact counts per
+# region, within the bounds documented in contractor_sketch.py.
+
+import numpy as np
+import pytest
+
+from contractor_sketch import (
+    CMS_DEPTH, CMS_WIDTH, HLL_PRECISION, SKETCH_METRICS, build_cell_sketches, contractor_key,
+    load_cell_sketches, merge_cell_sketches, save_cell_sketches, select_sketch,
+)
+
+CHUNK_ROWS = 2_000
+TOP = 10
+
+
+@pytest.fixture(scope="module")
+def rows(dataset):
+    return dataset[dataset["Region"].notna() & dataset["Year"].notna() & dataset["Contractor"].notna()]
+
+
+# Sketched chunk by chunk and merged, as the store does
+@pytest.fixture(scope="module")
+def cells(rows):
+    merged = None
+    for start in range(0, len(rows), CHUNK_ROWS):
+        merged = merge_cell_sketches(merged, build_cell_sketches(rows.iloc[start:start + CHUNK_ROWS]))
+    return merged
+
+
+@pytest.fixture(scope="module")
+def exact(rows):
+    return rows.assign(Key=rows["Contractor"].map(contractor_key)).groupby(["Region", "Key"]).agg(
+        Projects=("Key", "size"), ContractCost=("ContractCost", "sum"))
+
+
+def regions(dataset):
+    return ["All"] + sorted(dataset["Region"].dropna().unique())
+
+
+def truth(exact, region):
+    cell = exact if region == "All" else exact.xs(region, level="Region")
+    return cell.groupby(level="Key").sum()
+
+
+@pytest.fixture(params=SKETCH_METRICS)
+def metric(request):
+    return request.param
+
+
+def test_count_min_error(dataset, cells, exact, metric):
+    for region in regions(dataset):
+        counts = truth(exact, region)[metric]
+        estimates = select_sketch(cells, region).estimate(list(counts.index), metric)
+        over = (estimates - counts.to_numpy(dtype=float)) / counts.sum()
+        # Never below the true value (up to float rounding of the cost sums)
+        assert over.min() >= -1e-9, region
+        # Within e / CMS_WIDTH of the total with probability 1 - e**-CMS_DEPTH
+        assert (over <= np.e / CMS_WIDTH).mean() >= 1 - np.exp(-CMS_DEPTH), region
+
+
+def test_heavy_hitters_found(dataset, cells, exact, metric):
+    for region in regions(dataset):
+        counts = truth(exact, region)[metric]
+        sketch = select_sketch(cells, region)
+        assert set(counts.nlargest(TOP).index) <= set(sketch.candidates), region
+        # The ranked estimates are off by no more than the count-min error
+        _, estimates = sketch.top(metric, TOP)
+        largest = counts.nlargest(TOP).to_numpy(dtype=float)
+        assert np.all(np.abs(estimates - largest) <= np.e / CMS_WIDTH * counts.sum() + 1e-9), region
+
+
+def test_distinct_count_error(dataset, cells, exact):
+    standard_error = 1.04 / np.sqrt(2 ** HLL_PRECISION)
+    for region in regions(dataset):
+        distinct = len(truth(exact, region))
+        assert abs(select_sketch(cells, region).distinct() - distinct) <= 3 * standard_error * distinct, region
+
+
+def test_save_and_load_keep_estimates(cells, tmp_path):
+    path = str(tmp_path / "contractors.npz")
+    save_cell_sketches(cells, path)
+    loaded = load_cell_sketches(path)
+    assert set(loaded) == set(cells)
+    for cell, sketch in cells.items():
+        assert loaded[cell].candidates == sketch.candidates
+        assert loaded[cell].names == sketch.names
+        np.testing.assert_array_equal(loaded[cell].counters, sketch.counters)
+        np.testing.assert_array_equal(loaded[cell].registers, sketch.registers)
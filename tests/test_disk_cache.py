@@ -0,0 +1,103 @@
+# test_disk_cache.py
+# Hits and misses, TTL, unreadable pickles, eviction with lock files, and
+# how often eviction walks the directory.
+
+import os
+import sys
+import time
+import types
+
+import pytest
+
+import disk_cache
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(disk_cache, "DISK_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(disk_cache, "_evict_state", {"writes": 0, "bytes": 0, "total": None})
+    return tmp_path
+
+
+def cached(value, params=()):
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return value
+    return disk_cache.disk_cached("test", 1, "data", list(params), compute), len(calls)
+
+
+def entry(params=()):
+    return disk_cache.entry_path("test", 1, "data", list(params))
+
+
+def test_second_call_hits():
+    assert cached(42) == (42, 1)
+    assert cached(43) == (42, 0)
+
+
+def test_expired_entry_recomputed():
+    cached(42)
+    os.utime(entry(), (time.time(), time.time() - disk_cache.DISK_CACHE_TTL - 1))
+    assert cached(43) == (43, 1)
+
+
+def test_corrupt_pickle_is_a_miss():
+    cached(42)
+    with open(entry(), "wb") as f:
+        f.write(b"not a pickle")
+    assert cached(43) == (43, 1)
+
+
+def test_pickle_of_removed_code_is_a_miss(monkeypatch):
+    module = types.ModuleType("removed_module")
+
+    class Result:
+        pass
+    Result.__module__, Result.__qualname__ = "removed_module", "Result"
+    module.Result = Result
+    monkeypatch.setitem(sys.modules, "removed_module", module)
+    cached(Result(), params=["class"])
+    cached(Result(), params=["module"])
+
+    # The class is gone (AttributeError), then the whole module (ModuleNotFoundError)
+    del module.Result
+    assert cached(43, params=["class"]) == (43, 1)
+    monkeypatch.delitem(sys.modules, "removed_module")
+    assert cached(44, params=["module"]) == (44, 1)
+
+
+def test_evict_removes_least_recent_entries_and_their_locks():
+    for i in range(3):
+        cached(b"x" * 1_000, params=[i])
+        os.utime(entry([i]), (time.time() - 100 + i, time.time()))
+    assert all(os.path.exists(entry([i]) + ".lock") for i in range(3))
+    size = os.path.getsize(entry([0]))
+    disk_cache.evict(max_bytes=2 * size)
+    assert [os.path.exists(entry([i])) for i in range(3)] == [False, True, True]
+    assert [os.path.exists(entry([i]) + ".lock") for i in range(3)] == [False, True, True]
+
+
+@pytest.mark.skipif(disk_cache.fcntl is None, reason="no file locks on this platform")
+def test_evict_keeps_held_lock():
+    path = entry(["computing"])
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with disk_cache._EntryLock(path):
+        disk_cache.evict()
+        assert os.path.exists(path + ".lock")
+    disk_cache.evict()
+    assert not os.path.exists(path + ".lock")
+
+
+def test_eviction_runs_only_when_due(monkeypatch):
+    walks = []
+    monkeypatch.setattr(disk_cache, "evict", lambda *args: walks.append(1) or 0)
+    for i in range(disk_cache.EVICT_EVERY + 1):
+        cached(i, params=[i])
+    # The first write measures the directory, then every EVICT_EVERY writes
+    assert len(walks) == 2
+
+    monkeypatch.setattr(disk_cache, "DISK_CACHE_BYTES", 1)
+    cached("big", params=["big"])
+    assert len(walks) == 3
@@ -0,0 +1,86 @@
+# test_entities.py
+# Contractor entity resolution: which spellings merge into one firm, which
+# must stay apart (the trade-word guard), renamed firms and joint ventures.
+
+import pandas as pd
+import pytest
+
+from entities import resolve_contractors
+
+
+def resolve(*names):
+    return resolve_contractors(pd.Series(1, index=list(names)))
+
+
+def ids(resolved, *names):
+    return [resolved["aliases"].loc[name, "ContractorId"] for name in names]
+
+
+@pytest.mark.parametrize("names", [
+    ("TRIPLE 8 CONSTRUCTION & SUPPLY, INC.", "TRIPLE 8 CONST. & SUPPLY"),
+    ("ISNAG BUILDERS & DEV'T. CORPORATION", "ISNAG BUILDERS AND DEVELOPMENT CORP"),
+    ("MAC BUILDERS", "MAC BUILDERS CORP."),
+    ("SUNRISE MOUNTAIN BUILDERS", "SUNRISE MOUNTAINS BUILDERS"),
+])
+def test_spellings_merge(names):
+    assert len(set(ids(resolve(*names), *names))) == 1
+
+
+@pytest.mark.parametrize("names", [
+    ("5'S CONSTRUCTION & SUPPLY", "5S DEVELOPMENT CORPORATION"),
+    ("MAC BUILDERS CORP.", "MAC CONSTRUCTION"),
+    ("SUNRISE MOUNTAIN BUILDERS", "SUNRISE VALLEY BUILDERS"),
+])
+def test_different_firms_stay_apart(names):
+    assert len(set(ids(resolve(*names), *names))) == 2
+
+
+def test_former_name_is_an_alias():
+    current = "SUNWEST, INC. (FORMERLY: SUNWEST CONSTRUCTION & DEVELOPMENT CORPORATION)"
+    resolved = resolve(current, "SUNWEST CONSTRUCTION & DEVELOPMENT CORPORATION")
+    assert len(set(ids(resolved, current, "SUNWEST CONSTRUCTION & DEVELOPMENT CORPORATION"))) == 1
+    assert resolved["aliases"].loc[current, "Contractor"] == "SUNWEST, INC."
+    # A former name cut off by the export is not an alias
+    resolved = resolve("ABC CONSTRUCTION (FORMERLY: XYZ BUILD", "XYZ BUILDERS")
+    assert len(set(ids(resolved, "ABC CONSTRUCTION (FORMERLY: XYZ BUILD", "XYZ BUILDERS"))) == 2
+
+
+def test_joint_venture_resolves_member_by_member():
+    names = ["ALPHA CONSTRUCTION / BETA BUILDERS", "BETA BUILDERS CORP. / ALPHA CONST.",
+             "ALPHA CONSTRUCTION", "BETA BUILDERS"]
+    resolved = resolve_contractors(pd.Series([3, 2, 5, 1], index=names))
+    aliases, entities = resolved["aliases"], resolved["entities"]
+    jv, reversed_jv, alpha, beta = ids(resolved, *names)
+    assert jv == reversed_jv and jv.startswith("J")
+    assert set(aliases.loc[names[0], "Members"]) == {alpha, beta}
+    assert entities.loc[jv, "Kind"] == "joint venture"
+    # Joint venture projects are counted apart from their members'
+    assert entities.loc[jv, "Projects"] == 5
+    assert entities.loc[alpha, "Projects"] == 5 and entities.loc[beta, "Projects"] == 1
+    assert resolved["spellings"].loc["ALPHA CONSTRUCTION", "Mentions"] == 8
+
+
+def test_display_name_is_the_most_mentioned_spelling():
+    resolved = resolve_contractors(pd.Series([1, 4], index=["LEGACY CONST. CORP", "LEGACY CONSTRUCTION CORPORATION"]))
+    assert set(resolved["aliases"]["Contractor"]) == {"LEGACY CONSTRUCTION CORPORATION"}
+
+
+def test_export_resolves_every_name(dataset):
+    counts = dataset["Contractor"].value_counts()
+    resolved = resolve_contractors(counts)
+    aliases = resolved["aliases"]
+    assert set(aliases.index) == set(counts.index)
+    assert aliases["Projects"].sum() == dataset["Contractor"].notna().sum()
+    assert resolved["entities"]["Projects"].sum() == aliases["Projects"].sum()
+    assert aliases["ContractorId"].nunique() < len(counts)
+    # Ids do not depend on the order names are seen in
+    shuffled = resolve_contractors(counts.sample(frac=1, random_state=0))["aliases"]
+    pd.testing.assert_series_equal(shuffled["ContractorId"].sort_index(), aliases["ContractorId"].sort_index())
+
+
+def test_export_keeps_trade_guarded_names_apart(dataset):
+    aliases = resolve_contractors(dataset["Contractor"].value_counts())["aliases"]
+    assert aliases.loc["5'S CONSTRUCTION & SUPPLY", "ContractorId"] != aliases.loc[
+        "5S DEVELOPMENT CORPORATION", "ContractorId"]
+    mac = aliases.loc[[name for name in aliases.index if name.startswith("MAC ")], "ContractorId"]
+    assert mac.nunique() == len(mac)
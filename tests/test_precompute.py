@@ -0,0 +1,46 @@
+# test_precompute.py
+# An artifact bundle is served only for the store version it was built on.
+
+import pytest
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+import disk_cache
+import store
+import utils
+from precompute import build_bundle, resolve_bundle
+
+BUNDLE_ROWS = 300
+
+
+@pytest.fixture
+def bundle_dir(raw_dataset, tmp_path, monkeypatch):
+    csv = tmp_path / "export.csv"
+    raw_dataset.head(BUNDLE_ROWS).to_csv(csv, index=False)
+    out = str(tmp_path / "artifacts")
+    build_bundle(str(csv), out, progress=lambda message: None)
+    monkeypatch.setattr(utils, "BUNDLE_DIR", out)
+    monkeypatch.setattr(utils, "STORE_DIR", f"{resolve_bundle(out)}/store")
+    monkeypatch.setattr(disk_cache, "DISK_CACHE_DIR", str(tmp_path / "results"))
+    st.cache_data.clear()
+    st.cache_resource.clear()
+    yield out
+    st.cache_data.clear()
+    st.cache_resource.clear()
+
+
+def test_bundle_served_for_its_store(bundle_dir):
+    bundle = utils.load_bundle()
+    assert bundle is not None
+    assert bundle["manifest"]["store_version"] == store.store_version(utils.STORE_DIR)
+
+
+def test_bundle_dropped_after_append(bundle_dir, raw_dataset):
+    manifest, added, _ = store.append_batch(utils.STORE_DIR, raw_dataset.iloc[BUNDLE_ROWS:BUNDLE_ROWS + 5])
+    assert added == 5
+    assert utils.load_bundle() is None
+
+    # The Analysis tab fits the appended rows live instead of pairing them
+    # with the bundle's labels
+    app = AppTest.from_string("import tab_analysis\ntab_analysis.render()", default_timeout=120).run()
+    assert not app.exception, app.exception[0].value if app.exception else None
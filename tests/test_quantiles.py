@@ -0,0 +1,66 @@
+# test_quantiles.py
+# Sketch percentiles against exact pandas quantiles, per group.
+
+import numpy as np
+import pytest
+
+from quantiles import (
+    PERCENTILES, QUANTILE_COLS, QUANTILE_GROUPS, RANK_ERROR_BOUND, SKETCH_K, QuantileSketch,
+    build_group_sketches, merge_group_sketches, rank_errors,
+)
+
+CHUNK_ROWS = 2_000
+
+
+# Sketched chunk by chunk and merged, as the store does
+@pytest.fixture(scope="module")
+def sketches(dataset):
+    merged = None
+    for start in range(0, len(dataset), CHUNK_ROWS):
+        merged = merge_group_sketches(merged, build_group_sketches(dataset.iloc[start:start + CHUNK_ROWS]))
+    return merged
+
+
+@pytest.mark.parametrize("col", QUANTILE_COLS)
+@pytest.mark.parametrize("by", QUANTILE_GROUPS)
+def test_rank_error_within_bound(dataset, sketches, col, by):
+    errors = rank_errors(dataset, sketches, col, by)
+    worst = errors.loc[errors["RankError"].idxmax()]
+    assert worst["RankError"] <= RANK_ERROR_BOUND, (
+        f"{col} by {by}: {worst[by]} ({worst['Rows']} rows) is {worst['RankError']:.2%} of its rows "
+        f"off at q={worst['Quantile']}")
+
+
+def test_duration_by_type_of_work_is_sketched(dataset, sketches):
+    # Some groups are large enough to be compacted, so the bound is exercised
+    rows = dataset.groupby("TypeOfWork")["DurationDays"].count()
+    large = rows[rows > SKETCH_K]
+    assert len(large)
+    for group, n in large.items():
+        assert len(sketches["DurationDays"]["TypeOfWork"][group]) < n
+
+
+@pytest.mark.parametrize("by", QUANTILE_GROUPS)
+def test_small_groups_are_exact(dataset, sketches, by):
+    errors = rank_errors(dataset, sketches, "ContractCost", by)
+    assert (errors.loc[errors["Rows"] <= SKETCH_K, "RankError"] == 0).all()
+
+
+def test_long_stream_stays_small_and_within_bound():
+    values = np.random.default_rng(7).lognormal(5, 1, 200_000)
+    sketch = QuantileSketch()
+    for start in range(0, len(values), CHUNK_ROWS):
+        sketch.merge(QuantileSketch().update(values[start:start + CHUNK_ROWS]))
+    assert sketch.n == len(values)
+    assert len(sketch) <= 3 * SKETCH_K
+    exact = np.sort(values)
+    for q in list(PERCENTILES.values()) + [0.01, 0.25, 0.75, 0.99]:
+        rank = np.searchsorted(exact, sketch.quantile(q), side="right")
+        assert abs(rank - q * len(values)) / len(values) <= RANK_ERROR_BOUND
+
+
+def test_matches_exact_quantiles_when_whole():
+    values = np.random.default_rng(3).integers(0, 1_000, SKETCH_K).astype(float)
+    sketch = QuantileSketch().update(values)
+    for q in PERCENTILES.values():
+        assert sketch.quantile(q) == np.quantile(values, q, method="inverted_cdf")
@@ -0,0 +1,55 @@
+# test_render_budget.py
+# Each tab's cold render against its time and memory budget (render_budget.py)
+# at every budgeted dataset size. DPWH_BUDGET_TIME_SCALE loosens the time
+# budgets on a slower machine.
+
+import importlib
+
+import pytest
+
+import render_budget
+import utils
+from render_budget import BUDGETS, SECTIONS, budget, check, instrumented, report, synthetic_csv
+
+
+@pytest.fixture(scope="module")
+def data_dir(tmp_path_factory):
+    with pytest.MonkeyPatch.context() as patch:
+        # setup() drops the store and bundle directories for the bundled CSV
+        patch.setattr(utils, "STORE_DIR", utils.STORE_DIR)
+        patch.setattr(utils, "BUNDLE_DIR", utils.BUNDLE_DIR)
+        render_budget.setup()
+        yield str(tmp_path_factory.mktemp("render-budget-data"))
+
+
+@pytest.mark.parametrize("rows", sorted(BUDGETS))
+@pytest.mark.parametrize("tab", list(SECTIONS))
+def test_render_within_budget(data_dir, monkeypatch, tab, rows):
+    monkeypatch.setattr(utils, "DATA_PATH", synthetic_csv(rows, data_dir))
+    with instrumented(tab):
+        result = check(tab, rows)
+    assert result["ok"], "\n" + report(result, breakdown=True)
+
+
+@pytest.mark.parametrize("tab", list(SECTIONS))
+def test_sections_restored_after_measuring(tab):
+    module = importlib.import_module(tab)
+    originals = {name: getattr(module, name) for name in SECTIONS[tab]}
+    with pytest.raises(RuntimeError):
+        with instrumented(tab):
+            assert all(getattr(module, name) is not func for name, func in originals.items())
+            raise RuntimeError("render failed")
+    assert all(getattr(module, name) is func for name, func in originals.items())
+
+
+def test_budget_between_sizes_is_interpolated():
+    low, high = sorted(BUDGETS)[:2]
+    seconds, mb = budget("tab_analysis", (low + high) // 2)
+    assert seconds == pytest.approx((BUDGETS[low]["tab_analysis"][0] + BUDGETS[high]["tab_analysis"][0]) / 2)
+    assert mb == pytest.approx((BUDGETS[low]["tab_analysis"][1] + BUDGETS[high]["tab_analysis"][1]) / 2)
+
+
+@pytest.mark.parametrize("rows", [min(BUDGETS) - 1, max(BUDGETS) + 1])
+def test_budget_outside_sizes_is_rejected(rows):
+    with pytest.raises(ValueError, match="no render budget"):
+        budget("tab_overview", rows)
@@ -0,0 +1,109 @@
+# test_search.py
+# PrefixIndex and TokenIndex matches and ranking against brute force over the
+# bundled export, and the Overview's typeahead value picker.
+
+import numpy as np
+import pandas as pd
+import pytest
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+import utils
+from search import SEARCH_COLUMNS, PrefixIndex, TokenIndex, tokenize
+
+@pytest.mark.parametrize("prefix", ["", "leg", "LEG", "  st. ", "a", "zzz"])
+def test_prefix_matches_most_projects_first(dataset, prefix):
+    counts = dataset["Contractor"].value_counts()
+    index = PrefixIndex(dataset["Contractor"])
+    matches, total = index.matches(prefix, limit=10)
+    expected = counts[[value.casefold().startswith(prefix.strip().casefold()) for value in counts.index]]
+    assert total == len(expected)
+    # Most projects first, ties alphabetically (case-insensitive)
+    expected = sorted(expected.items(), key=lambda item: (-item[1], item[0].casefold()))[:10]
+    assert matches == expected
+
+
+def test_prefix_index_skips_unused_categories(dataset):
+    contractors = dataset["Contractor"].astype("category")
+    index = PrefixIndex(contractors.head(100))
+    assert len(index) == contractors.head(100).nunique()
+    value = contractors.iloc[0]
+    assert index.count(value) == (contractors.head(100) == value).sum()
+    assert index.count("NOT A CONTRACTOR") == 0
+
+
+# Rows where every query word starts a word of some SEARCH_COLUMNS value
+def brute_force(dataset, query):
+    words = [set().union(*(tokenize(v) for v in values if pd.notna(v)))
+             for values in zip(*(dataset[col] for col in SEARCH_COLUMNS))]
+    terms = tokenize(query)
+    return {row for row, tokens in enumerate(words) if all(any(t.startswith(term) for t in tokens) for term in terms)}
+
+
+@pytest.mark.parametrize("query", ["leg const", "LEGACY", "cebu flood", "revetment 22la", "no such words"])
+def test_search_requires_every_word(dataset, query):
+    rows, scores = TokenIndex(dataset).search(query)
+    assert set(rows.tolist()) == brute_force(dataset, query)
+    assert np.all(np.diff(scores) <= 0)
+
+
+def test_rare_and_fully_typed_tokens_rank_first():
+    df = pd.DataFrame({"Contractor": ["CEBU BUILD", "CEBX BUILDERS", "CEBU CORP", "CEBU CORP", "CEBU BUILD"],
+                       "Province": ["LEYTE", "LEYTE", "LEYTE", "CEBU", "BOHOL"]})
+    index = TokenIndex(df, columns=["Contractor", "Province"])
+    # "cebx" is in one row and "cebu" in four: the rare token ranks first
+    rows, _ = index.search("ceb")
+    assert rows[0] == 1 and sorted(rows.tolist()) == [0, 1, 2, 3, 4]
+    # "build" is fully typed, "builders" only started
+    rows, scores = index.search("build")
+    assert rows.tolist() == [0, 4, 1] and scores[1] > scores[2]
+    # Every word is required
+    rows, _ = index.search("cebu build")
+    assert rows.tolist() == [0, 4]
+    # Found in two columns of a row, a token still counts once
+    rows, scores = index.search("cebu corp")
+    assert rows.tolist() == [2, 3] and scores[0] == scores[1]
+
+
+def test_empty_query_matches_nothing(dataset):
+    rows, scores = TokenIndex(dataset).search(" ,. ")
+    assert len(rows) == 0 and len(scores) == 0
+
+
+OVERVIEW = """
+import streamlit as st
+import tab_overview
+st.sidebar.toggle("Apply filters on submit", key="batch_filters")
+tab_overview.display_filters(tab_overview.load_dataset())
+"""
+
+
+@pytest.fixture
+def overview(monkeypatch):
+    monkeypatch.setattr(utils, "STORE_DIR", None)
+    monkeypatch.setattr(utils, "BUNDLE_DIR", None)
+    st.cache_data.clear()
+    st.cache_resource.clear()
+    return AppTest.from_string(OVERVIEW, default_timeout=120)
+
+
+def contractor_options(app):
+    return next(m for m in app.multiselect if m.key == "typeahead_values_Contractor").options
+
+
+@pytest.mark.parametrize("batch", [False, True])
+def test_typeahead_reacts_before_submit(overview, batch):
+    app = overview.run()
+    app.toggle(key="batch_filters").set_value(batch).run()
+    next(s for s in app.selectbox if s.label == "Select column to filter:").select("Contractor")
+    if batch:
+        app.button[0].click()
+    app.run()
+    before = contractor_options(app)
+
+    # Typing narrows the options at once, also in batch mode (no submit)
+    app.text_input(key="typeahead_query_Contractor").input("legacy").run()
+    after = contractor_options(app)
+    assert after != before
+    assert after and all(option.casefold().startswith("legacy") for option in after)
+    assert not app.exception
@@ -0,0 +1,131 @@
+# test_store.py
+# Ingest and append drop the same duplicates on (ContractId, ProjectId, Year),
+# and an append switches the manifest to a complete new state directory.
+
+import json
+import os
+
+import pandas as pd
+import pytest
+
+import store
+from store import ROW_KEY, append_batch, ingest_csv, open_store, store_version
+
+STORE_ROWS = 2_000
+CHUNK_ROWS = 500
+
+
+# Stored rows: the first STORE_ROWS of the export, 40 of them repeated in a
+# later chunk and 10 repeated with no ContractId (kept: nothing to match on)
+@pytest.fixture(scope="module")
+def export(raw_dataset):
+    rows = raw_dataset.head(STORE_ROWS)
+    no_id = rows.head(10).assign(ContractId=None)
+    return pd.concat([rows, rows.iloc[100:140], no_id, no_id], ignore_index=True)
+
+
+@pytest.fixture
+def root(export, tmp_path):
+    csv = tmp_path / "export.csv"
+    export.to_csv(csv, index=False)
+    out = str(tmp_path / "store")
+    ingest_csv(str(csv), out, CHUNK_ROWS)
+    return out
+
+
+def new_projects(raw_dataset, n):
+    rows = raw_dataset.iloc[STORE_ROWS:STORE_ROWS + n]
+    return rows.assign(ContractId=[f"NEW-{i}" for i in range(n)])
+
+
+def stored_rows(root):
+    return pd.concat(store.iter_parts(open_store(root), ROW_KEY), ignore_index=True)
+
+
+def test_ingest_drops_repeated_keys(root):
+    manifest = open_store(root)["manifest"]
+    assert manifest["duplicates"] == 40
+    assert manifest["rows"] == STORE_ROWS + 20
+    rows = stored_rows(root)
+    assert len(rows) == manifest["rows"]
+    assert not rows[rows["ContractId"].notna()].duplicated(ROW_KEY).any()
+    assert rows["ContractId"].isna().sum() == 20
+
+
+def test_ingest_totals_match_the_kept_rows(root, dataset):
+    opened = open_store(root)
+    kept = dataset.head(STORE_ROWS)
+    assert opened["cube"]["Projects"].sum() == opened["manifest"]["rows"]
+    extra = dataset.head(10)["ContractCost"].sum() * 2
+    assert opened["cube"]["ContractCost"].sum() == pytest.approx(kept["ContractCost"].sum() + extra)
+
+
+def test_same_contract_in_another_year_is_kept(root, raw_dataset):
+    tranche = raw_dataset.head(3).assign(FundingYear=raw_dataset.head(3)["FundingYear"] + 1)
+    _, added, dropped = append_batch(root, tranche)
+    assert (added, dropped) == (3, 0)
+
+
+def test_append_drops_stored_and_repeated_rows(root, raw_dataset):
+    fresh = new_projects(raw_dataset, 5)
+    batch = pd.concat([raw_dataset.iloc[200:207], fresh, fresh.head(2),
+                       raw_dataset.head(1).assign(ContractId=None)], ignore_index=True)
+    before = open_store(root)["manifest"]["rows"]
+    manifest, added, dropped = append_batch(root, batch)
+    assert (added, dropped) == (6, 9)
+    assert manifest["rows"] == before + 6
+    assert manifest["batches"][-1]["rows"] == 6 and manifest["batches"][-1]["duplicates"] == 9
+    assert set(stored_rows(root)["ContractId"].dropna()) >= set(fresh["ContractId"])
+
+
+def test_repeated_append_adds_nothing(root, raw_dataset):
+    batch = new_projects(raw_dataset, 5)
+    manifest, _, _ = append_batch(root, batch)
+    again, added, dropped = append_batch(root, batch)
+    assert (added, dropped) == (0, 5)
+    assert again["version"] == manifest["version"]
+    assert again["rows"] == manifest["rows"]
+
+
+def test_append_switches_to_a_new_state(root, raw_dataset):
+    first = open_store(root)
+    previous = first["manifest"]["state"]
+    manifest, _, _ = append_batch(root, new_projects(raw_dataset, 5))
+    assert manifest["version"] != first["manifest"]["version"]
+    assert manifest["state"] == f"state-{manifest['version']}"
+    assert store_version(root) == manifest["version"]
+    # The previous state stays readable for readers that opened it
+    assert os.path.isdir(os.path.join(root, previous))
+    assert open_store(root)["cube"]["Projects"].sum() == manifest["rows"]
+
+    # ...until the next append, which keeps only the last two
+    latest, _, _ = append_batch(root, new_projects(raw_dataset, 10).iloc[5:])
+    states = sorted(entry for entry in os.listdir(root) if entry.startswith("state-"))
+    assert states == sorted([manifest["state"], latest["state"]])
+
+
+def test_failed_append_keeps_the_old_version(root, raw_dataset, monkeypatch):
+    before = open_store(root)["manifest"]
+    write_json = store._write_json
+
+    def crash_on_manifest(path, data):
+        if path.endswith("manifest.json"):
+            raise OSError("disk full")
+        write_json(path, data)
+
+    monkeypatch.setattr(store, "_write_json", crash_on_manifest)
+    with pytest.raises(OSError):
+        append_batch(root, new_projects(raw_dataset, 5))
+    with open(os.path.join(root, "manifest.json")) as f:
+        assert json.load(f) == before
+    opened = open_store(root)
+    assert opened["cube"]["Projects"].sum() == before["rows"]
+
+
+def test_append_touches_only_its_cells(root, raw_dataset):
+    before = open_store(root)["manifest"]["cell_versions"]
+    batch = new_projects(raw_dataset, 1)
+    manifest, _, _ = append_batch(root, batch)
+    changed = {cell for cell, version in manifest["cell_versions"].items() if before.get(cell) != version}
+    row = batch.iloc[0]
+    assert changed == {store.cell_key(row["Region"], float(row["FundingYear"]))}
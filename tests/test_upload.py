@@ -0,0 +1,50 @@
+# test_upload.py
+# Parsing an upload into the shared parquet cache, and evicting old uploads.
+
+import os
+import time
+
+import pandas as pd
+import pytest
+
+import upload
+
+
+@pytest.fixture
+def upload_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(upload, "UPLOAD_CACHE_DIR", str(tmp_path / "uploads"))
+    return tmp_path / "uploads"
+
+
+def test_chunks_with_mixed_types_parse(raw_dataset, upload_dir, monkeypatch):
+    # ContractId reads as numbers in the first chunk and as text in the second
+    raw = raw_dataset.head(400).astype({"ContractId": object})
+    raw["ContractId"] = list(range(200)) + raw["ContractId"].iloc[200:].tolist()
+    monkeypatch.setattr(upload, "PARSE_CHUNK_ROWS", 200)
+    job = {}
+    upload.parse_upload(raw.to_csv(index=False).encode(), "mixed", job)
+    parsed = upload.read_upload("mixed")
+    assert len(parsed) == 400 and job["progress"] == 1.0
+    assert parsed["ContractId"].iloc[0] == "0"
+    assert os.listdir(upload_dir) == ["mixed.parquet"]
+
+
+def test_oldest_uploads_evicted_past_budget(upload_dir, monkeypatch):
+    upload_dir.mkdir()
+    for i, name in enumerate(["old", "mid", "new"]):
+        path = upload_dir / f"{name}.parquet"
+        pd.DataFrame({"x": range(1_000)}).to_parquet(path)
+        os.utime(path, (time.time() - 100 + i, time.time()))
+    size = os.path.getsize(upload_dir / "new.parquet")
+    monkeypatch.setattr(upload.disk_cache, "DISK_CACHE_BYTES", 2 * size)
+    upload.evict_uploads()
+    assert sorted(os.listdir(upload_dir)) == ["mid.parquet", "new.parquet"]
+
+
+def test_expired_uploads_evicted(upload_dir, monkeypatch):
+    upload_dir.mkdir()
+    path = upload_dir / "stale.parquet"
+    pd.DataFrame({"x": [1]}).to_parquet(path)
+    os.utime(path, (time.time(), time.time() - upload.disk_cache.DISK_CACHE_TTL - 1))
+    upload.evict_uploads()
+    assert not upload.is_cached("stale")
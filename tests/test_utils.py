@@ -0,0 +1,57 @@
+# test_utils.py
+# parse_dates against pandas' own fixed-format parsing, including values
+# that fail to parse and missing ones.
+
+import pandas as pd
+import pytest
+
+from utils import DATE_FORMAT, clean_dataset, parse_dates
+
+
+@pytest.mark.parametrize("col", ["StartDate", "ActualCompletionDate"])
+def test_matches_to_datetime(raw_dataset, col):
+    dates, failed = parse_dates(raw_dataset[col])
+    expected = pd.to_datetime(raw_dataset[col], format=DATE_FORMAT, errors="coerce")
+    pd.testing.assert_series_equal(dates, expected, check_dtype=False)
+    assert failed.sum() == (raw_dataset[col].notna() & expected.isna()).sum()
+
+
+@pytest.mark.parametrize("dtype", [object, "string[pyarrow]"])
+def test_unparseable_values_are_flagged(dtype):
+    raw = pd.Series(["10/3/2022", "2022-10-03", None, "13/45/2022", "not a date", "10/3/2022"],
+                    index=[5, 4, 3, 2, 1, 0], dtype=dtype, name="StartDate")
+    dates, failed = parse_dates(raw)
+    assert list(dates.index) == list(raw.index) and dates.name == "StartDate"
+    assert dates[5] == dates[0] == pd.Timestamp(2022, 10, 3)
+    assert dates[[4, 3, 2, 1]].isna().all()
+    # Missing is not a parse failure
+    assert list(failed) == [False, True, False, True, True, False]
+
+
+def test_other_format():
+    dates, failed = parse_dates(pd.Series(["2022-10-03", "10/3/2022"]), date_format="%Y-%m-%d")
+    assert dates[0] == pd.Timestamp(2022, 10, 3) and pd.isna(dates[1])
+    assert list(failed) == [False, True]
+
+
+def test_parsed_dates_pass_through():
+    parsed = pd.Series(pd.to_datetime(["2022-10-03", None]))
+    dates, failed = parse_dates(parsed)
+    assert dates is parsed
+    assert not failed.any()
+
+
+def test_empty_column():
+    dates, failed = parse_dates(pd.Series([], dtype=object))
+    assert len(dates) == 0 and len(failed) == 0
+
+
+def test_clean_dataset_counts_unparseable_dates(raw_dataset):
+    raw = raw_dataset.head(20).copy()
+    raw.loc[raw.index[:3], "StartDate"] = ["soon", "2022-10-03", "31/12/2022"]
+    df = clean_dataset(raw)
+    assert df["StartDate"].iloc[:3].isna().all()
+    assert df["StartDate"].iloc[3:].notna().sum() == raw["StartDate"].iloc[3:].notna().sum()
+    quality = df.attrs["quality"]["columns"]["StartDate"]
+    assert quality["coerced"] == 3
+    assert quality["examples"] == ["soon", "2022-10-03", "31/12/2022"]